@@ -0,0 +1,192 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import instrumentation
+import profiler
+from cache import TranslationCache
+from parallel import translate_parallel
+
+# Пакетная трансляция каталога .cs файлов на пуле процессов.
+# В процессы уходят только пути: каждый сам читает исходник и пишет JS,
+# так что через каналы идут короткие строки, а не тексты программ.
+
+SOURCE_SUFFIX = '.cs'
+TARGET_SUFFIX = '.js'
+
+# Файлы не меньше этого размера делятся по классам между всеми процессами
+# (parallel.translate_parallel), остальные переводятся целиком по одному на процесс
+SPLIT_SIZE = 1024 * 1024
+
+# Кэш трансляции процесса пула (задаётся в init_worker)
+worker_cache = None
+
+
+class FileResult:
+    __slots__ = ('path', 'size', 'error', 'metrics', 'profile')
+
+    def __init__(self, path, size, error=None):
+        # size - длина исходника в байтах, error - текст ошибки или None,
+        # metrics - замеры стадий этого файла (instrumentation.Metrics), если включены,
+        # profile - профиль правил грамматики (profiler.Profile), если включён
+        self.path = path
+        self.size = size
+        self.error = error
+        self.metrics = None
+        self.profile = None
+
+
+class BatchReport:
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.failures = []
+        self.elapsed = 0.0
+        # сумма замеров из всех процессов (пустая, если замеры выключены)
+        self.metrics = instrumentation.Metrics()
+        # сумма профилей правил (пустая, если профилирование выключено)
+        self.profile = profiler.Profile()
+
+    def __str__(self):
+        rate = self.bytes / self.elapsed / 1024 / 1024 if self.elapsed else 0.0
+        return (f"Файлов: {self.files}, ошибок: {len(self.failures)}, "
+                f"{self.bytes / 1024 / 1024:.2f} MB за {self.elapsed:.2f} с ({rate:.2f} MB/с, "
+                f"{self.files / self.elapsed if self.elapsed else 0.0:.0f} файлов/с)")
+
+
+def find_sources(source_dir):
+    # Пары (размер, относительный путь) всех .cs файлов, самые большие первыми:
+    # длинные задания не остаются в хвосте, пока остальные процессы простаивают
+    found = []
+    for directory, _, names in os.walk(source_dir):
+        for name in names:
+            if name.endswith(SOURCE_SUFFIX):
+                path = os.path.join(directory, name)
+                found.append((os.path.getsize(path), os.path.relpath(path, source_dir)))
+    found.sort(reverse=True)
+    return found
+
+
+def target_path(output_dir, relative):
+    return os.path.join(output_dir, relative[:-len(SOURCE_SUFFIX)] + TARGET_SUFFIX)
+
+
+def init_worker(cache_dir, instrument=False, memory=False, profile=False):
+    global worker_cache
+    worker_cache = TranslationCache(cache_dir) if cache_dir is not None else None
+    if instrument:
+        instrumentation.enable(memory)
+    if profile:
+        profiler.install()
+
+
+def translate_file(source_dir, output_dir, relative, jobs=1, executor=None):
+    # Выполняется в процессе пула (или в главном для больших файлов с jobs > 1,
+    # тогда executor - пул, на котором делятся классы всех больших файлов)
+    if not instrumentation.enabled and not profiler.installed:
+        return translate_one(source_dir, output_dir, relative, jobs, executor)
+    # замеры и профиль этого файла собираются отдельно и уходят в главный
+    # процесс вместе с результатом
+    saved_metrics = instrumentation.metrics
+    saved_profile = profiler.profile
+    instrumentation.metrics = instrumentation.Metrics()
+    profiler.profile = profiler.Profile()
+    try:
+        result = translate_one(source_dir, output_dir, relative, jobs, executor)
+        if instrumentation.enabled:
+            result.metrics = instrumentation.metrics
+        if profiler.installed:
+            result.profile = profiler.profile
+    finally:
+        instrumentation.metrics = saved_metrics
+        profiler.profile = saved_profile
+    return result
+
+
+def translate_one(source_dir, output_dir, relative, jobs, executor):
+    # Любая ошибка возвращается, а не поднимается, чтобы один плохой файл не
+    # останавливал остальные
+    size = 0
+    try:
+        with open(os.path.join(source_dir, relative), 'rb') as file:
+            data = file.read()
+        size = len(data)
+        js_code = None
+        if worker_cache is not None:
+            key = worker_cache.key(data)
+            js_code = worker_cache.get(key)
+        if js_code is None:
+            js_code = translate_parallel(data.decode('utf-8'), jobs, executor=executor)
+            if worker_cache is not None:
+                worker_cache.put(key, js_code)
+        target = target_path(output_dir, relative)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'w', encoding='utf-8') as file:
+            file.write(js_code)
+    except ValueError as e:
+        # UnicodeDecodeError тоже ValueError, но это не ошибка лексера
+        if isinstance(e, UnicodeDecodeError):
+            return FileResult(relative, size, f"Ошибка кодировки: {e}")
+        return FileResult(relative, size, f"Лексическая ошибка: {e}")
+    except Exception as e:
+        return FileResult(relative, size, str(e))
+    return FileResult(relative, size)
+
+
+def translate_tree(source_dir, output_dir, jobs=None, cache_dir=None, log=sys.stderr, split_size=SPLIT_SIZE,
+                   instrument=False, memory=False, profile=False):
+    # Транслирует все .cs из source_dir в output_dir с той же структурой
+    # каталогов. Ошибки пишутся в log по мере появления; возвращается BatchReport.
+    # instrument/memory - собрать замеры стадий (instrumentation) в report.metrics,
+    # profile - профиль правил грамматики и обработчиков (profiler) в report.profile.
+    start = time.perf_counter()
+    report = BatchReport()
+    jobs = jobs or os.cpu_count() or 1
+    sources = []
+    large = []
+    for size, relative in find_sources(source_dir):
+        (large if jobs > 1 and size >= split_size else sources).append(relative)
+
+    # Большой файл на одном процессе оставил бы остальные без работы,
+    # поэтому такие файлы по очереди делятся по классам на все процессы
+    # одного общего пула
+    was_enabled = instrumentation.enabled
+    was_installed = profiler.installed
+    init_worker(cache_dir, instrument, memory, profile)
+    try:
+        if large:
+            with ProcessPoolExecutor(jobs) as executor:
+                for relative in large:
+                    add_result(report, translate_file(source_dir, output_dir, relative, jobs, executor), log)
+    finally:
+        if instrument and not was_enabled:
+            instrumentation.disable()
+        if profile and not was_installed:
+            profiler.uninstall()
+
+    # Пачки заметно меньше доли одного процесса: на хвосте работа ещё делится
+    chunk_size = max(1, len(sources) // (jobs * 16))
+    with ProcessPoolExecutor(jobs, initializer=init_worker, initargs=(cache_dir, instrument, memory, profile)) as executor:
+        results = executor.map(
+            translate_file,
+            [source_dir] * len(sources), [output_dir] * len(sources), sources,
+            chunksize=chunk_size,
+        )
+        for result in results:
+            add_result(report, result, log)
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def add_result(report, result, log):
+    report.files += 1
+    report.bytes += result.size
+    if result.metrics is not None:
+        report.metrics.merge(result.metrics)
+    if result.profile is not None:
+        report.profile.merge(result.profile)
+    if result.error is not None:
+        report.failures.append(result)
+        if log is not None:
+            print(f"{result.path}: {result.error}", file=log)
@@ -0,0 +1,893 @@
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+import time
+import tracemalloc
+
+from lexer import Lexer, Token
+from parser import Parser
+from generator import CodeGenerator
+from incremental import IncrementalTranslator
+from translator import translate
+from optimizer import optimize
+from inference import annotate
+from semantic import resolve
+from cache import TranslationCache
+from batch import translate_tree
+from parallel import translate_parallel
+from outline import outline
+import instrumentation
+import profiler
+import scaling
+from corpus import CorpusSettings, generate_program, STRESS_INPUTS, stress_code
+import dump
+
+
+CLASS_TEMPLATE = """
+    public class Sample{index} {{
+        public static void Run{index}(int a, int b) {{
+            int x = a * (b + 3) - 7 / 2;
+            string s = "value \\"{index}\\"";
+            bool flag = !(x < b) && a >= b || x == 3;
+            x += 5;
+            while (x > 0) {{
+                x -= 1;
+                if (x == 2) {{
+                    Console.WriteLine(s + x);
+                }} else {{
+                    x = x % 4;
+                }}
+            }}
+            return;
+        }}
+    }}
+"""
+
+
+def generate_source(size):
+    # Синтетическая программа примерно на size байт
+    parts = ['using System;\n\nnamespace Bench {\n']
+    length = len(parts[0])
+    index = 0
+    while length < size:
+        part = CLASS_TEMPLATE.format(index=index)
+        parts.append(part)
+        length += len(part)
+        index += 1
+    parts.append('}\n')
+    return ''.join(parts)
+
+
+EXPRESSIONS = [
+    'a + b * c - d / e',
+    '(a + b) * (c - d) % 7',
+    '!(a < b) && c >= d || a == 3',
+    '-a * -b + c * (d - (e + 1))',
+    'a * b + c * d + e * a + b * c + d',
+    'x',
+    '42',
+]
+
+
+def generate_expressions(size):
+    # Программа из методов, состоящих почти только из выражений
+    parts = ['namespace Bench {\n    class Expressions {\n']
+    length = len(parts[0])
+    index = 0
+    while length < size:
+        lines = [f'        public static int Method{index}(int a, int b, int c, int d, int e) {{\n']
+        for number, expression in enumerate(EXPRESSIONS * 3):
+            lines.append(f'            int v{number} = {expression};\n')
+        lines.append('            return a + b;\n        }\n')
+        part = ''.join(lines)
+        parts.append(part)
+        length += len(part)
+        index += 1
+    parts.append('    }\n}\n')
+    return ''.join(parts)
+
+
+def count_expressions(code):
+    return code.count(' = ') + code.count('return ')
+
+
+def legacy_tokenize(lexer):
+    # Прежний алгоритм: перекомпиляция и перебор шаблонов на каждой позиции
+    tokens = []
+    position = 0
+    while position < len(lexer.code):
+        match = None
+        for token_type, pattern in lexer.token_specification:
+            match = re.compile(pattern).match(lexer.code, position)
+            if match:
+                value = match.group(0)
+                if token_type == 'ID':
+                    if value in lexer.keywords:
+                        tokens.append(Token('KEYWORD', value))
+                    elif value in lexer.types:
+                        tokens.append(Token('TYPE', value))
+                    else:
+                        tokens.append(Token('ID', value))
+                elif token_type not in {'NEWLINE', 'SKIP', 'COMMENT'}:
+                    tokens.append(Token(token_type, value))
+                break
+        position = match.end(0)
+    return tokens
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_lexer(args):
+    for megabytes in args.sizes:
+        code = generate_source(int(megabytes * 1024 * 1024))
+        tokens, elapsed = measure(Lexer(code).tokenize)
+        print(f'{megabytes:6.2f} MB  scanner: {len(tokens) / elapsed:12,.0f} tokens/s  ({elapsed:.2f} s)')
+        if not args.skip_legacy:
+            legacy, legacy_elapsed = measure(legacy_tokenize, Lexer(code))
+            assert [(t.type, t.value) for t in legacy] == [(t.type, t.value) for t in tokens]
+            print(f'{megabytes:6.2f} MB  legacy:  {len(legacy) / legacy_elapsed:12,.0f} tokens/s  ({legacy_elapsed:.2f} s)'
+                  f'  x{legacy_elapsed / elapsed:.1f}')
+
+
+def bench_stream(args):
+    # Пиковая память потокового лексера не должна зависеть от размера файла
+    for megabytes in args.sizes:
+        with tempfile.TemporaryFile('w+', encoding='utf-8') as source:
+            source.write(generate_source(int(megabytes * 1024 * 1024)))
+            source.seek(0)
+            tracemalloc.start()
+            count = sum(1 for _ in Lexer(source).iter_tokens())
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        print(f'{megabytes:6.2f} MB  {count:10,} tokens  peak {peak / 1024:10,.0f} KB')
+
+
+def traced_peak(function, *args):
+    tracemalloc.start()
+    result = function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, peak
+
+
+def bench_tokens(args):
+    # Память списка объектов Token против компактного TokenBuffer
+    for megabytes in args.sizes:
+        code = generate_source(int(megabytes * 1024 * 1024))
+        tokens, list_peak = traced_peak(Lexer(code).tokenize)
+        count = len(tokens)
+        del tokens
+        buffer, buffer_peak = traced_peak(Lexer(code).tokenize_buffer)
+        assert len(buffer) == count
+        print(f'{megabytes:6.2f} MB  {count:10,} tokens  list: {list_peak / 2**20:8.1f} MB'
+              f'  buffer: {buffer_peak / 2**20:8.1f} MB  ({list_peak / count:.0f} vs {buffer_peak / count:.1f} B/token)')
+
+
+def bench_parser(args):
+    for megabytes in args.sizes:
+        code = generate_expressions(int(megabytes * 1024 * 1024))
+        tokens = Lexer(code).tokenize()
+        best = min(measure(Parser(tokens).parse)[1] for _ in range(args.repeat))
+        expressions = count_expressions(code)
+        print(f'{megabytes:6.2f} MB  {len(tokens) / best:12,.0f} tokens/s  '
+              f'{expressions / best:10,.0f} expressions/s  ({best:.2f} s)')
+
+
+def count_nodes(tree):
+    count = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.children)
+    return count
+
+
+def bench_ast(args):
+    # Память, которую занимает готовое дерево (токены построены заранее и не учитываются)
+    for megabytes in args.sizes:
+        code = generate_source(int(megabytes * 1024 * 1024))
+        tokens = Lexer(code).tokenize()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        tree = Parser(tokens).parse()
+        size = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        nodes = count_nodes(tree)
+        print(f'{megabytes:6.2f} MB  {nodes:10,} nodes  AST {size / 2**20:8.1f} MB  {size / nodes:6.1f} B/node')
+
+
+def bench_generator(args):
+    for megabytes in args.sizes:
+        code = generate_source(int(megabytes * 1024 * 1024))
+        tree = Parser(Lexer(code).tokenize_buffer()).parse()
+        nodes = count_nodes(tree)
+        best = min(measure(CodeGenerator().generate, tree)[1] for _ in range(args.repeat))
+        print(f'{megabytes:6.2f} MB  {nodes:10,} nodes  {nodes / best:12,.0f} nodes/s  ({best:.2f} s)')
+
+
+def wide_class(methods):
+    body = ''.join(f'public static void Run{index}(int a) {{ int x = a * 2; x += {index}; Console.WriteLine(x); }} '
+                   for index in range(methods))
+    return f'namespace Wide {{ class Many {{ {body}public static void Main() {{ Run0(1); }} }} }}'
+
+
+def deep_class(depth):
+    return stress_code('if (x) { x = 1; ' * depth + '}' * depth)
+
+
+def bench_emitter(args):
+    # Генерация в строку и потоком в файл: широкий класс и глубоко вложенные блоки
+    cases = [(f'wide  {args.methods:,} methods', wide_class(args.methods)),
+             (f'deep  {args.depth:,} levels', deep_class(args.depth))]
+    for name, code in cases:
+        tree = Parser(Lexer(code).tokenize_buffer()).parse()
+        js_code, elapsed = measure(CodeGenerator().generate, tree)
+        string_peak = traced_peak(CodeGenerator().generate, tree)[1]
+        with tempfile.TemporaryFile('w+', encoding='utf-8') as target:
+            file_elapsed = measure(CodeGenerator().generate, tree, target)[1]
+            target.seek(0)
+            file_peak = traced_peak(CodeGenerator().generate, tree, target)[1]
+            assert target.tell() == len(js_code.encode('utf-8'))
+        print(f'{name:24} {len(js_code) / 2**20:8.1f} MB of JS  string: {elapsed:6.2f} s  peak {string_peak / 2**20:7.1f} MB'
+              f'  file: {file_elapsed:6.2f} s  peak {file_peak / 2**20:7.1f} MB')
+
+
+class FirstByteSink:
+    # Выходной поток, который запоминает момент первой записи и не хранит текст
+    def __init__(self):
+        self.first = None
+        self.size = 0
+
+    def write(self, text):
+        if self.first is None and text:
+            self.first = time.perf_counter()
+        self.size += len(text)
+
+
+def staged_translate(source, out):
+    code = source.read()
+    tree = Parser(Lexer(code).tokenize()).parse()
+    out.write(CodeGenerator().generate(tree))
+
+
+def bench_pipeline(args):
+    # Время до первого байта JS и пиковая память: стадии по очереди против конвейера
+    for megabytes in args.sizes:
+        with tempfile.TemporaryFile('w+', encoding='utf-8') as source:
+            source.write(generate_source(int(megabytes * 1024 * 1024)))
+            for name, function in (('staged', staged_translate), ('pipeline', translate)):
+                source.seek(0)
+                sink = FirstByteSink()
+                start = time.perf_counter()
+                function(source, sink)
+                elapsed = time.perf_counter() - start
+                source.seek(0)
+                peak = traced_peak(function, source, FirstByteSink())[1]
+                print(f'{megabytes:6.2f} MB  {name:8}  first byte {(sink.first - start) * 1000:9.1f} ms  '
+                      f'total {elapsed:6.2f} s  peak {peak / 2**20:8.1f} MB')
+
+
+def bench_optimizer(args):
+    # Скорость прохода оптимизации и размер JS с ним и без него
+    for megabytes in args.sizes:
+        code = generate_source(int(megabytes * 1024 * 1024))
+        plain = CodeGenerator().generate(Parser(Lexer(code).tokenize_buffer()).parse())
+        tree = Parser(Lexer(code).tokenize_buffer()).parse()
+        nodes = count_nodes(tree)
+        _, elapsed = measure(optimize, tree)
+        optimized = CodeGenerator().generate(tree)
+        print(f'{megabytes:6.2f} MB  {nodes:10,} nodes  pass {nodes / elapsed:12,.0f} nodes/s  ({elapsed:.2f} s)  '
+              f'JS {len(plain):12,} -> {len(optimized):12,} chars  ({1 - len(optimized) / len(plain):.1%} smaller)')
+
+
+def nested_scopes(depth):
+    # Каждый блок объявляет свою переменную и читает самую внешнюю:
+    # при поиске по цепочке областей это стоило бы O(depth) на обращение
+    body = 'int v0 = 1; '
+    for level in range(1, depth):
+        body += f'if (v0 > 0) {{ int v{level} = v0 + {level}; '
+    body += '}' * (depth - 1)
+    return f'namespace Scopes {{ class Deep {{ static void Main() {{ {body} }} }} }}'
+
+
+def bench_semantic(args):
+    # Время разрешения имён на узел должно оставаться постоянным
+    # и с ростом программы, и с ростом вложенности областей видимости
+    for megabytes in args.sizes:
+        tree = Parser(Lexer(generate_source(int(megabytes * 1024 * 1024))).tokenize_buffer()).parse()
+        nodes = count_nodes(tree)
+        unresolved, elapsed = measure(resolve, tree)
+        print(f'{megabytes:6.2f} MB  {nodes:10,} nodes  {elapsed / nodes * 1e9:8.0f} ns/node  '
+              f'({elapsed:.2f} s, unresolved {len(unresolved)})')
+    for depth in args.depths:
+        tree = Parser(Lexer(nested_scopes(depth)).tokenize_buffer()).parse()
+        nodes = count_nodes(tree)
+        unresolved, elapsed = measure(resolve, tree)
+        print(f'scope depth {depth:7,}  {nodes:10,} nodes  {elapsed / nodes * 1e9:8.0f} ns/node  '
+              f'({elapsed:.2f} s, unresolved {len(unresolved)})')
+
+
+NUMERIC_LOOPS = {
+    'int hash': 'int i = 0; int hash = 7; while (i < {n}) {{ hash = hash * 31 + i; i += 1; }} Console.WriteLine(hash);',
+    'int division': 'int i = 0; int total = 0; while (i < {n}) {{ total += i / 3 - i % 5; i += 1; }} Console.WriteLine(total);',
+    'float sum': 'int i = 0; float total = 0.0f; while (i < {n}) {{ total += 0.1f; i += 1; }} Console.WriteLine(total);',
+}
+
+
+def run_node(js_code):
+    # Методы классов в выводе объявлены через function; для запуска в node
+    # они превращаются в статические методы класса
+    runnable = js_code.replace('  function ', '  static ')
+    with tempfile.NamedTemporaryFile('w', suffix='.js', delete=False) as script:
+        script.write(runnable)
+    try:
+        start = time.perf_counter()
+        result = subprocess.run(['node', script.name], capture_output=True, text=True, check=True)
+        return result.stdout.strip(), time.perf_counter() - start
+    finally:
+        os.unlink(script.name)
+
+
+def bench_numeric(args):
+    # Сгенерированный JS на числовых циклах: без типов и с типами C#
+    if shutil.which('node') is None:
+        print('node не найден')
+        return
+    for name, body in NUMERIC_LOOPS.items():
+        code = stress_code(body.format(n=args.iterations))
+        for label, typed in (('untyped', False), ('typed', True)):
+            output, elapsed = run_node(translate(code, typed=typed))
+            print(f'{name:14} {label:8} {elapsed:6.2f} s  result {output}')
+
+
+def profile_calls(function):
+    # Число вызовов Python-функций и максимальная глубина стека во время function()
+    stats = {'calls': 0, 'depth': 0, 'max_depth': 0}
+
+    def profiler(frame, event, arg):
+        if event == 'call':
+            stats['calls'] += 1
+            stats['depth'] += 1
+            stats['max_depth'] = max(stats['max_depth'], stats['depth'])
+        elif event == 'return':
+            stats['depth'] -= 1
+
+    sys.setprofile(profiler)
+    try:
+        function()
+    finally:
+        sys.setprofile(None)
+    # сам function() тоже учтён
+    return stats['calls'] - 1, stats['max_depth'] - 1
+
+
+def bench_expressions(args):
+    for text in EXPRESSIONS:
+        tokens = Lexer(text).tokenize()
+        parse = lambda: Parser(tokens).expression()
+        calls, depth = profile_calls(parse)
+        elapsed = min(timeit.repeat(parse, number=args.number, repeat=5)) / args.number
+        print(f'{text:36} {calls:4} calls  depth {depth:3}  {elapsed * 1e6:8.2f} us')
+
+
+def bench_stress(args):
+    # Все стадии должны проходить на глубине вложенности в десятки тысяч даже
+    # с маленьким лимитом рекурсии: стек Python не зависит от глубины дерева.
+    # Текст print_tree и JS растёт квадратично с глубиной вложенности блоков
+    # (отступы), поэтому они проверяются на отдельной глубине --output-depth.
+    limit = sys.getrecursionlimit()
+    for name, body in STRESS_INPUTS.items():
+        start = time.perf_counter()
+        sys.setrecursionlimit(args.recursion_limit)
+        try:
+            tree = Parser(Lexer(stress_code(body(args.depth))).tokenize_buffer()).parse()
+            repr(tree)
+            optimize(tree)
+            annotate(tree)
+            tree = Parser(Lexer(stress_code(body(args.output_depth))).tokenize_buffer()).parse()
+            tree.print_tree()
+            js_code = CodeGenerator().generate(tree)
+        finally:
+            sys.setrecursionlimit(limit)
+        print(f'{name:16} depth {args.depth:7,} / {args.output_depth:7,}  ok  {len(js_code):12,} chars of JS  '
+              f'({time.perf_counter() - start:.2f} s)')
+
+
+def bench_editor(args):
+    # Задержка одного нажатия клавиши в редакторе: вставка символов в середину метода
+    sample = generate_source(100000)
+    code = generate_source(int(args.lines * len(sample) / sample.count('\n')))
+    lines = code.count('\n')
+    translator = IncrementalTranslator()
+    _, full = measure(translator.update, code)
+    position = code.index('x += 5;', len(code) // 2) + len('x += 5')
+    timings = []
+    for _ in range(args.keystrokes):
+        code = code[:position] + '1' + code[position:]
+        position += 1
+        timings.append(measure(translator.update, code)[1])
+    timings.sort()
+    print(f'{lines:,} lines  full translation {full * 1000:8.1f} ms  keystroke median '
+          f'{timings[len(timings) // 2] * 1000:6.2f} ms  max {timings[-1] * 1000:6.2f} ms  '
+          f'(full rebuilds: {translator.full_runs - 1})')
+
+
+def bench_cache(args):
+    # Повторная сборка неизменённого дерева файлов должна стоить примерно
+    # столько же, сколько чтение и хеширование этих файлов
+    sample = generate_source(args.file_size)
+    directory = tempfile.mkdtemp()
+    try:
+        paths = []
+        for index in range(args.files):
+            path = os.path.join(directory, f'File{index}.cs')
+            with open(path, 'w') as file:
+                file.write(sample.replace('Sample', f'File{index}Sample'))
+            paths.append(path)
+        cache_directory = os.path.join(directory, 'cache')
+
+        def build():
+            cache = TranslationCache(cache_directory)
+            for path in paths:
+                cache.translate_file(path)
+            return cache.stats
+
+        def hash_only():
+            cache = TranslationCache(cache_directory)
+            for path in paths:
+                with open(path, 'rb') as file:
+                    cache.key(file.read())
+
+        cold_stats, cold = measure(build)
+        warm_stats, warm = measure(build)
+        _, hashing = measure(hash_only)
+        print(f'{args.files:,} files x {args.file_size:,} chars')
+        print(f'  cold build  {cold:8.3f} s  {cold_stats}')
+        print(f'  warm build  {warm:8.3f} s  {warm_stats}')
+        print(f'  read+hash   {hashing:8.3f} s  (warm / hash {warm / hashing:.2f}x, cold / warm {cold / warm:.0f}x)')
+    finally:
+        shutil.rmtree(directory)
+
+
+def bench_batch(args):
+    # Пропускная способность пакетной трансляции по числу процессов;
+    # относительно первого значения --jobs; на N ядрах ускорение должно быть близко к N
+    sample = generate_source(args.file_size)
+    directory = tempfile.mkdtemp()
+    try:
+        source_dir = os.path.join(directory, 'src')
+        for index in range(args.files):
+            package = os.path.join(source_dir, f'package{index % 10}')
+            os.makedirs(package, exist_ok=True)
+            with open(os.path.join(package, f'File{index}.cs'), 'w') as file:
+                file.write(sample.replace('Sample', f'File{index}Sample'))
+        baseline = None
+        for jobs in args.jobs:
+            report = translate_tree(source_dir, os.path.join(directory, f'out{jobs}'), jobs)
+            baseline = baseline or report.elapsed
+            print(f'{jobs:3} jobs  {report}  speedup {baseline / report.elapsed:.2f}x')
+    finally:
+        shutil.rmtree(directory)
+
+
+def bench_split(args):
+    # Один большой файл: последовательная трансляция против деления по классам.
+    # JS обязан совпадать побайтно.
+    code = generate_source(int(args.size * 1024 * 1024))
+    expected, sequential = measure(translate, code)
+    print(f'{args.size:6.2f} MB  sequential {sequential:7.2f} s')
+    for jobs in args.jobs:
+        js_code, elapsed = measure(translate_parallel, code, jobs)
+        status = 'identical' if js_code == expected else 'DIFFERENT'
+        print(f'{jobs:3} jobs  {elapsed:7.2f} s  speedup {sequential / elapsed:5.2f}x  {status}')
+
+
+def bench_outline(args):
+    # Полный разбор против ленивого (тела методов пропущены по скобкам)
+    # и outline(), который тела даже не токенизирует
+    for megabytes in args.sizes:
+        code = generate_source(int(megabytes * 1024 * 1024))
+        tree, full = measure(lambda: Parser(Lexer(code).tokenize_buffer()).parse())
+        lazy_tree, lazy = measure(lambda: Parser(Lexer(code).tokenize_buffer(), lazy=True).parse())
+        items, fast = measure(outline, code)
+        status = 'identical' if CodeGenerator().generate(lazy_tree) == CodeGenerator().generate(tree) else 'DIFFERENT'
+        print(f'{megabytes:6.2f} MB  full parse {full:6.2f} s  lazy parse {lazy:6.2f} s ({full / lazy:4.1f}x)  '
+              f'outline {fast:6.2f} s ({full / fast:4.1f}x)  lazy JS {status}')
+
+
+async def server_client(path, source, requests, latencies):
+    reader, writer = await asyncio.open_unix_connection(path, limit=1 << 24)
+    for index in range(requests):
+        request = {'jsonrpc': '2.0', 'id': index, 'method': 'translate', 'params': {'source': source}}
+        start = time.perf_counter()
+        writer.write(json.dumps(request).encode() + b'\n')
+        answer = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - start)
+        if 'result' not in answer:
+            raise RuntimeError(answer)
+    writer.close()
+    await writer.wait_closed()
+
+
+async def server_load(path, source, clients, requests):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(server_client(path, source, requests, latencies) for _ in range(clients)))
+    return latencies, time.perf_counter() - start
+
+
+async def server_shutdown(path):
+    reader, writer = await asyncio.open_unix_connection(path)
+    writer.write(b'{"jsonrpc": "2.0", "id": 0, "method": "shutdown"}\n')
+    await reader.readline()
+    writer.close()
+
+
+def bench_server(args):
+    # Нагрузочный тест сервера на Unix-сокете против запуска процесса на каждый файл
+    source = generate_source(args.file_size)
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'server.sock')
+        source_path = os.path.join(directory, 'file.cs')
+        with open(source_path, 'w') as file:
+            file.write(source)
+        script = os.path.dirname(os.path.abspath(__file__))
+
+        cold = []
+        for _ in range(5):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, os.path.join(script, 'main.py'), source_path],
+                           stdout=subprocess.DEVNULL, check=True)
+            cold.append(time.perf_counter() - start)
+        print(f'new process per file   {sorted(cold)[2] * 1000:8.1f} ms median')
+
+        process = subprocess.Popen([sys.executable, os.path.join(script, 'cli.py'), 'serve',
+                                    '--socket', path, '-j', str(args.jobs)])
+        while not os.path.exists(path):
+            if process.poll() is not None:
+                raise RuntimeError('сервер не запустился')
+            time.sleep(0.05)
+        for clients in args.clients:
+            latencies, elapsed = asyncio.run(server_load(path, source, clients, args.requests))
+            latencies.sort()
+            print(f'server, {clients:3} clients  p50 {latencies[len(latencies) // 2] * 1000:6.2f} ms  '
+                  f'p99 {latencies[int(len(latencies) * 0.99)] * 1000:6.2f} ms  '
+                  f'{len(latencies) / elapsed:8.0f} requests/s')
+        asyncio.run(server_shutdown(path))
+        status = process.wait(timeout=30)
+        print(f'shutdown: exit code {status}, socket removed: {not os.path.exists(path)}')
+    finally:
+        shutil.rmtree(directory)
+
+
+def bench_instrumentation(args):
+    # Цена замеров: выключенные должны быть незаметны, включённые - дёшевы,
+    # tracemalloc заметно замедляет всё и включается отдельно
+    code = generate_source(int(args.size * 1024 * 1024))
+    modes = (('disabled', None), ('enabled', False), ('enabled + memory', True))
+    baseline = None
+    for name, memory in modes:
+        if memory is not None:
+            instrumentation.enable(memory)
+        try:
+            elapsed = min(measure(translate, code)[1] for _ in range(args.repeat))
+        finally:
+            instrumentation.disable()
+        baseline = baseline or elapsed
+        print(f'{name:18} {elapsed:7.3f} s  ({elapsed / baseline - 1:+.1%})')
+    print(instrumentation.metrics.to_json_lines(), end='')
+
+
+def bench_profile(args):
+    # Цена профилировщика правил и таблица правил на синтетической программе;
+    # --output - стеки для flamegraph.pl / speedscope
+    code = generate_source(int(args.size * 1024 * 1024))
+    baseline = min(measure(translate, code)[1] for _ in range(args.repeat))
+    profiler.install()
+    try:
+        profiled = []
+        for _ in range(args.repeat):
+            profiler.reset()
+            profiled.append(measure(translate, code)[1])
+    finally:
+        profiler.uninstall()
+    elapsed = min(profiled)
+    print(f'без профиля {baseline:7.3f} s, с профилем {elapsed:7.3f} s ({elapsed / baseline - 1:+.1%})')
+    print(profiler.profile.report(args.top), end='')
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(profiler.profile.collapsed())
+
+
+SUITE_STAGES = ('lex', 'parse', 'generate')
+SUITE_SIZES = (0.1, 0.5, 2)
+
+
+def suite_run(code):
+    # Одна трансляция по отдельным стадиям; сборка мусора между запусками
+    gc.collect()
+    tokens, lex = measure(Lexer(code).tokenize_buffer)
+    tree, parse = measure(Parser(tokens).parse)
+    _, generate = measure(CodeGenerator().generate, tree)
+    return {'lex': lex, 'parse': parse, 'generate': generate}
+
+
+def bench_suite(args):
+    # Лексер, парсер и генератор отдельно на детерминированном корпусе
+    # (corpus.generate_program) нескольких размеров. Результаты - JSON;
+    # с --baseline лучшие времена сравниваются с сохранённой базовой линией
+    # (минимум меньше медианы страдает от соседних процессов), и замедление
+    # больше --threshold считается регрессией (код выхода 1). --save-baseline
+    # пишет результаты в свой файл, поэтому можно сравнить с прежней базовой
+    # линией и сразу сохранить новую.
+    # Корпус - программы размером --sizes (число классов подбирается под размер)
+    # либо одна программа из ровно --classes классов.
+    settings = CorpusSettings(methods=args.methods, statements=args.statements,
+                              expression_depth=args.expression_depth, nesting=args.nesting,
+                              parameters=args.parameters)
+    if args.classes is not None:
+        settings.classes = args.classes
+        programs = [generate_program(args.seed, settings)]
+    else:
+        programs = (generate_program(args.seed, settings, size=int(megabytes * 1024 * 1024))
+                    for megabytes in args.sizes or SUITE_SIZES)
+    results = []
+    for code in programs:
+        megabytes = len(code) / 1024 / 1024
+        runs = [suite_run(code) for _ in range(args.repeat)]
+        for stage in SUITE_STAGES:
+            times = sorted(run[stage] for run in runs)
+            median = times[len(times) // 2]
+            results.append({
+                'size': len(code),
+                'stage': stage,
+                'median_seconds': median,
+                'min_seconds': times[0],
+                'mb_per_second': len(code) / median / 1024 / 1024,
+            })
+            print(f'{megabytes:6.2f} MB  {stage:9} {median:8.3f} s  ({len(code) / median / 1024 / 1024:6.2f} MB/s)')
+    # при --sizes число классов задаёт размер, а не settings.classes
+    used = [name for name in CorpusSettings.__slots__ if name != 'classes' or args.classes is not None]
+    document = {
+        'python': platform.python_version(),
+        'seed': args.seed,
+        'settings': {name: getattr(settings, name) for name in used},
+        'repeat': args.repeat,
+        'results': results,
+    }
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(document, file, indent=2)
+
+    regressions = 0
+    if args.baseline is not None:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+        if baseline['settings'] != document['settings'] or baseline['seed'] != document['seed']:
+            print('предупреждение: корпус базовой линии собран с другими настройками')
+        saved = {(result['size'], result['stage']): result for result in baseline['results']}
+        for result in results:
+            before = saved.get((result['size'], result['stage']))
+            if before is None:
+                print(f"{result['size']:10,} {result['stage']:9} нет в базовой линии")
+                continue
+            ratio = result['min_seconds'] / before['min_seconds']
+            regression = ratio > 1 + args.threshold
+            regressions += regression
+            print(f"{result['size']:10,} {result['stage']:9} {before['min_seconds']:8.3f} -> "
+                  f"{result['min_seconds']:8.3f} s  {ratio - 1:+7.1%}{'  РЕГРЕССИЯ' if regression else ''}")
+    if args.save_baseline is not None:
+        with open(args.save_baseline, 'w', encoding='utf-8') as file:
+            json.dump(document, file, indent=2)
+    if regressions:
+        print(f'регрессий: {regressions}')
+        sys.exit(1)
+
+
+def bench_scaling(args):
+    # Линейность стадий (scaling.sweep) на входах N, 2N, 4N, 8N; стадия с
+    # показателем больше --limit во всех --attempts попытках - нелинейная (код выхода 1)
+    failures = 0
+    for shape, stage, times, exponent in scaling.sweep(args.shapes, args.stages, args.scale, args.repeat,
+                                                       args.attempts, args.limit):
+        failed = exponent > args.limit
+        failures += failed
+        print(f'{shape:15} {stage:11} ' + '  '.join(f'{elapsed * 1000:8.2f}' for elapsed in times)
+              + f' ms   k = {exponent:5.2f}{"  НЕЛИНЕЙНО" if failed else ""}')
+    if failures:
+        print(f'нелинейных стадий: {failures}')
+        sys.exit(1)
+
+
+def bench_dump(args):
+    # Время, размер и пиковая память выгрузки AST в файл по форматам против
+    # print_tree, который строит весь текст в памяти, и время загрузки.
+    # Время - отдельным запуском без tracemalloc.
+    for megabytes in args.sizes:
+        tree = scaling.parse_source(generate_source(int(megabytes * 1024 * 1024)))
+        text, elapsed = measure(tree.print_tree)
+        del text
+        text, peak = traced_peak(tree.print_tree)
+        print(f'{megabytes:6.2f} MB  print_tree {elapsed:7.3f} s  {len(text) / 1024:10,.0f} KB  peak {peak / 1024:10,.0f} KB')
+        del text
+        with tempfile.TemporaryDirectory() as directory:
+            for name in dump.DUMPERS:
+                path = os.path.join(directory, f'tree.{name}')
+                binary = name == 'binary'
+                mode, encoding = ('b', None) if binary else ('', 'utf-8')
+                with open(path, 'w' + mode, encoding=encoding) as out:
+                    elapsed = measure(dump.dump, tree, out, name)[1]
+                with open(path, 'w' + mode, encoding=encoding) as out:
+                    peak = traced_peak(dump.dump, tree, out, name)[1]
+                line = (f'{megabytes:6.2f} MB  {name:10} {elapsed:7.3f} s  {os.path.getsize(path) / 1024:10,.0f} KB  '
+                        f'peak {peak / 1024:10,.0f} KB')
+                if name in dump.LOADERS:
+                    with open(path, 'r' + mode, encoding=encoding) as source:
+                        loaded, load_elapsed = measure(dump.load, source, name)
+                    assert repr(loaded) == repr(tree)
+                    line += f'  load {load_elapsed:7.3f} s'
+                print(line)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Замеры производительности транслятора')
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    lexer_parser = commands.add_parser('lexer', help='скорость лексического анализа')
+    lexer_parser.add_argument('--sizes', type=float, nargs='+', default=[1, 4])
+    lexer_parser.add_argument('--skip-legacy', action='store_true')
+    lexer_parser.set_defaults(handler=bench_lexer)
+
+    stream_parser = commands.add_parser('stream', help='пиковая память потокового лексера')
+    stream_parser.add_argument('--sizes', type=float, nargs='+', default=[1, 4, 16])
+    stream_parser.set_defaults(handler=bench_stream)
+
+    tokens_parser = commands.add_parser('tokens', help='память хранения токенов')
+    tokens_parser.add_argument('--sizes', type=float, nargs='+', default=[1, 4])
+    tokens_parser.set_defaults(handler=bench_tokens)
+
+    parser_parser = commands.add_parser('parser', help='скорость синтаксического анализа выражений')
+    parser_parser.add_argument('--sizes', type=float, nargs='+', default=[1])
+    parser_parser.add_argument('--repeat', type=int, default=3)
+    parser_parser.set_defaults(handler=bench_parser)
+
+    ast_parser = commands.add_parser('ast', help='память синтаксического дерева')
+    ast_parser.add_argument('--sizes', type=float, nargs='+', default=[1, 4])
+    ast_parser.set_defaults(handler=bench_ast)
+
+    generator_parser = commands.add_parser('generator', help='скорость генерации JS')
+    generator_parser.add_argument('--sizes', type=float, nargs='+', default=[1])
+    generator_parser.add_argument('--repeat', type=int, default=5)
+    generator_parser.set_defaults(handler=bench_generator)
+
+    emitter_parser = commands.add_parser('emitter', help='генерация широких и глубоких классов в строку и в файл')
+    emitter_parser.add_argument('--methods', type=int, default=100000)
+    emitter_parser.add_argument('--depth', type=int, default=3000)
+    emitter_parser.set_defaults(handler=bench_emitter)
+
+    pipeline_parser = commands.add_parser('pipeline', help='время до первого байта и память конвейера')
+    pipeline_parser.add_argument('--sizes', type=float, nargs='+', default=[1, 4, 16])
+    pipeline_parser.set_defaults(handler=bench_pipeline)
+
+    optimizer_parser = commands.add_parser('optimizer', help='проход свёртки констант')
+    optimizer_parser.add_argument('--sizes', type=float, nargs='+', default=[1])
+    optimizer_parser.set_defaults(handler=bench_optimizer)
+
+    semantic_parser = commands.add_parser('semantic', help='разрешение имён: время на узел по размеру и глубине')
+    semantic_parser.add_argument('--sizes', type=float, nargs='+', default=[1, 2, 4, 8])
+    semantic_parser.add_argument('--depths', type=int, nargs='+', default=[1000, 4000, 16000])
+    semantic_parser.set_defaults(handler=bench_semantic)
+
+    numeric_parser = commands.add_parser('numeric', help='скорость сгенерированного JS на числовых циклах (node)')
+    numeric_parser.add_argument('--iterations', type=int, default=100000000)
+    numeric_parser.set_defaults(handler=bench_numeric)
+
+    expressions_parser = commands.add_parser('expressions', help='вызовы и время разбора одного выражения')
+    expressions_parser.add_argument('--number', type=int, default=2000)
+    expressions_parser.set_defaults(handler=bench_expressions)
+
+    stress_parser = commands.add_parser('stress', help='глубоко вложенные программы')
+    stress_parser.add_argument('--depth', type=int, default=20000)
+    stress_parser.add_argument('--output-depth', type=int, default=3000)
+    stress_parser.add_argument('--recursion-limit', type=int, default=200)
+    stress_parser.set_defaults(handler=bench_stress)
+
+    editor_parser = commands.add_parser('editor', help='задержка нажатия клавиши в редакторе')
+    editor_parser.add_argument('--lines', type=int, default=10000)
+    editor_parser.add_argument('--keystrokes', type=int, default=50)
+    editor_parser.set_defaults(handler=bench_editor)
+
+    cache_parser = commands.add_parser('cache', help='холодная и тёплая сборка через кэш на диске')
+    cache_parser.add_argument('--files', type=int, default=2000)
+    cache_parser.add_argument('--file-size', type=int, default=5000)
+    cache_parser.set_defaults(handler=bench_cache)
+
+    batch_parser = commands.add_parser('batch', help='пакетная трансляция каталога на пуле процессов')
+    batch_parser.add_argument('--files', type=int, default=400)
+    batch_parser.add_argument('--file-size', type=int, default=20000)
+    batch_parser.add_argument('--jobs', type=int, nargs='+', default=[1, 2, 4, 8])
+    batch_parser.set_defaults(handler=bench_batch)
+
+    split_parser = commands.add_parser('split', help='один большой файл, разделённый по классам между процессами')
+    split_parser.add_argument('--size', type=float, default=4)
+    split_parser.add_argument('--jobs', type=int, nargs='+', default=[2, 4, 8])
+    split_parser.set_defaults(handler=bench_split)
+
+    outline_parser = commands.add_parser('outline', help='ленивый разбор тел методов и outline()')
+    outline_parser.add_argument('--sizes', type=float, nargs='+', default=[1, 4])
+    outline_parser.set_defaults(handler=bench_outline)
+
+    server_parser = commands.add_parser('server', help='нагрузочный тест сервера JSON-RPC')
+    server_parser.add_argument('--file-size', type=int, default=2000)
+    server_parser.add_argument('--jobs', type=int, default=2)
+    server_parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 32])
+    server_parser.add_argument('--requests', type=int, default=200)
+    server_parser.set_defaults(handler=bench_server)
+
+    instrumentation_parser = commands.add_parser('instrumentation', help='цена замеров по стадиям')
+    instrumentation_parser.add_argument('--size', type=float, default=1)
+    instrumentation_parser.add_argument('--repeat', type=int, default=3)
+    instrumentation_parser.set_defaults(handler=bench_instrumentation)
+
+    profile_parser = commands.add_parser('profile', help='профиль правил грамматики и обработчиков генератора')
+    profile_parser.add_argument('--size', type=float, default=1)
+    profile_parser.add_argument('--repeat', type=int, default=3)
+    profile_parser.add_argument('--top', type=int, default=20)
+    profile_parser.add_argument('--output', default=None)
+    profile_parser.set_defaults(handler=bench_profile)
+
+    suite_parser = commands.add_parser('suite', help='стадии на синтетическом корпусе, JSON и сравнение с базовой линией')
+    corpus_size = suite_parser.add_mutually_exclusive_group()
+    corpus_size.add_argument('--sizes', type=float, nargs='+', default=None,
+                             help=f'размеры программ, MB; число классов подбирается под размер '
+                                  f'(по умолчанию {" ".join(map(str, SUITE_SIZES))})')
+    corpus_size.add_argument('--classes', type=int, default=None, help='одна программа из стольких классов')
+    suite_parser.add_argument('--repeat', type=int, default=5)
+    suite_parser.add_argument('--seed', type=int, default=0)
+    suite_parser.add_argument('--methods', type=int, default=5)
+    suite_parser.add_argument('--statements', type=int, default=12)
+    suite_parser.add_argument('--expression-depth', type=int, default=3)
+    suite_parser.add_argument('--nesting', type=int, default=3)
+    suite_parser.add_argument('--parameters', type=int, default=3, help='наибольшее число параметров метода')
+    suite_parser.add_argument('--output', default=None, help='файл JSON с результатами')
+    suite_parser.add_argument('--baseline', default=None, help='файл JSON базовой линии для сравнения')
+    suite_parser.add_argument('--save-baseline', default=None, metavar='FILE',
+                              help='записать результаты как базовую линию в FILE (можно вместе с --baseline)')
+    suite_parser.add_argument('--threshold', type=float, default=0.15, help='допустимое замедление лучшего времени')
+    suite_parser.set_defaults(handler=bench_suite)
+
+    scaling_parser = commands.add_parser('scaling', help='показатель степени роста времени каждой стадии')
+    scaling_parser.add_argument('--shapes', nargs='+', choices=list(scaling.SHAPES), default=None)
+    scaling_parser.add_argument('--stages', nargs='+', choices=list(scaling.STAGES), default=None)
+    scaling_parser.add_argument('--scale', type=float, default=1, help='множитель базового размера входов')
+    scaling_parser.add_argument('--repeat', type=int, default=scaling.REPEAT)
+    scaling_parser.add_argument('--attempts', type=int, default=scaling.ATTEMPTS)
+    scaling_parser.add_argument('--limit', type=float, default=scaling.LIMIT,
+                                help='наибольший допустимый показатель степени')
+    scaling_parser.set_defaults(handler=bench_scaling)
+
+    dump_parser = commands.add_parser('dump', help='потоковая выгрузка и загрузка AST по форматам')
+    dump_parser.add_argument('--sizes', type=float, nargs='+', default=[1, 4])
+    dump_parser.set_defaults(handler=bench_dump)
+
+    args = arg_parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+import instrumentation
+import optimizer
+import inference
+from lexer import Lexer
+from parser import Parser
+from generator import CodeGenerator
+from translator import translate
+
+# Кэш результатов трансляции на диске. Ключ - хеш текста программы вместе с
+# отпечатком версии транслятора, так что изменённый файл или изменённый
+# транслятор просто дают другой ключ и старые записи доживают до вытеснения.
+# Записи - файлы <каталог>/<2 символа ключа>/<ключ>.js (и .ast с деревом).
+# Запись атомарна (временный файл в том же каталоге + os.replace), поэтому
+# несколько процессов могут работать с одним каталогом одновременно: читатель
+# видит либо старый файл, либо новый целиком. Порядок вытеснения LRU задаётся
+# временем изменения файла, которое обновляется при каждом попадании.
+
+# Модули, от которых зависит результат трансляции
+SOURCE_MODULES = (
+    'lexer.py', 'parser.py', 'nodes.py', 'generator.py',
+    'optimizer.py', 'inference.py', 'semantic.py', 'translator.py',
+)
+
+# После вытеснения занято не больше этой доли лимита, чтобы не чистить на каждой записи
+EVICTION_TARGET = 0.9
+
+
+def translator_fingerprint():
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in SOURCE_MODULES:
+        with open(os.path.join(directory, name), 'rb') as file:
+            digest.update(name.encode())
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+class CacheStats:
+    __slots__ = ('hits', 'misses', 'writes', 'evictions')
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __repr__(self):
+        return (f"CacheStats(hits={self.hits}, misses={self.misses}, writes={self.writes}, "
+                f"evictions={self.evictions})")
+
+
+class TranslationCache:
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, optimize=True, store_ast=False, typed=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # optimize и typed - те же флаги, что у translator.translate
+        self.optimize = optimize
+        self.typed = typed
+        # с store_ast рядом с JS сохраняется pickle дерева (load_ast)
+        self.store_ast = store_ast
+        self.stats = CacheStats()
+        os.makedirs(directory, exist_ok=True)
+        # store_ast тоже в ключе: иначе запись без .ast, сделанная кэшем без
+        # store_ast, давала бы попадание, и load_ast возвращал бы None
+        self.salt = f'{translator_fingerprint()}:{int(optimize)}{int(typed)}{int(store_ast)}:'.encode()
+        # занятый объём известен после первого обхода каталога, дальше считается по записям
+        self.size = None
+
+    def key(self, data):
+        # data - текст программы в байтах
+        digest = hashlib.sha256(self.salt)
+        digest.update(data)
+        return digest.hexdigest()
+
+    def path(self, key, suffix='.js'):
+        return os.path.join(self.directory, key[:2], key + suffix)
+
+    @instrumentation.instrumented('cache')
+    def get(self, key):
+        # JS по ключу или None; попадание продлевает жизнь записи
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as file:
+                js_code = file.read().decode('utf-8')
+            os.utime(path)
+        except FileNotFoundError:
+            # запись могла быть вытеснена другим процессом между open и utime
+            self.stats.misses += 1
+            instrumentation.count('misses')
+            return None
+        self.stats.hits += 1
+        instrumentation.count('hits')
+        return js_code
+
+    def load_ast(self, key):
+        try:
+            with open(self.path(key, '.ast'), 'rb') as file:
+                return pickle.load(file)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, js_code, tree=None):
+        added = self.write_atomic(self.path(key), js_code.encode('utf-8'))
+        if tree is not None:
+            try:
+                data = pickle.dumps(tree, pickle.HIGHEST_PROTOCOL)
+            except RecursionError:
+                # pickle рекурсивен; очень глубокое дерево остаётся без копии на диске
+                data = None
+            if data is not None:
+                added += self.write_atomic(self.path(key, '.ast'), data)
+        self.stats.writes += 1
+        if self.size is not None:
+            self.size += added
+        if self.size is None or self.size > self.max_bytes:
+            self.evict()
+
+    def write_atomic(self, path, data):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                file.write(data)
+            os.replace(temporary, path)
+        except BaseException:
+            try:
+                os.remove(temporary)
+            except FileNotFoundError:
+                pass
+            raise
+        return len(data)
+
+    def entries(self):
+        # Записи кэша: (mtime, размер, пути файлов) на каждый ключ. JS и дерево
+        # одного ключа - одна запись: время берётся у .js (его продлевает get),
+        # пути идут в порядке .js, .ast, чтобы запись пропадала для get первой
+        records = {}
+        for directory in os.scandir(self.directory):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                key, suffix = os.path.splitext(entry.name)
+                if suffix not in ('.js', '.ast'):
+                    continue
+                try:
+                    info = entry.stat()
+                except FileNotFoundError:
+                    continue
+                record = records.get(key)
+                if record is None:
+                    record = records[key] = [None, 0, []]
+                if suffix == '.js':
+                    record[0] = info.st_mtime
+                    record[2].insert(0, entry.path)
+                else:
+                    record[2].append(entry.path)
+                    if record[0] is None:
+                        # дерево без JS (запись оборвалась) вытесняется по своему времени
+                        record[0] = info.st_mtime
+                record[1] += info.st_size
+        return [tuple(record) for record in records.values()]
+
+    def remove(self, paths):
+        # True, если JS записи удалён этим вызовом, а не другим процессом
+        removed = False
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # уже удалил другой процесс
+                continue
+            removed = removed or path.endswith('.js')
+        return removed
+
+    def evict(self):
+        entries = self.entries()
+        size = sum(entry[1] for entry in entries)
+        if size > self.max_bytes:
+            limit = self.max_bytes * EVICTION_TARGET
+            entries.sort()
+            for _, entry_size, paths in entries:
+                if size <= limit:
+                    break
+                if self.remove(paths):
+                    self.stats.evictions += 1
+                size -= entry_size
+        self.size = size
+
+    def clear(self):
+        for _, _, paths in self.entries():
+            self.remove(paths)
+        self.size = 0
+
+    def translate(self, source):
+        # source - текст программы (str или bytes)
+        data = source.encode('utf-8') if isinstance(source, str) else source
+        key = self.key(data)
+        js_code = self.get(key)
+        if js_code is not None:
+            return js_code
+        if self.store_ast:
+            js_code, tree = self.translate_tree(data.decode('utf-8'))
+        else:
+            js_code, tree = translate(data.decode('utf-8'), optimize=self.optimize, typed=self.typed), None
+        self.put(key, js_code, tree)
+        return js_code
+
+    def translate_tree(self, source):
+        # Полное дерево нужно для сохранения, поэтому здесь без конвейера translate
+        tree = Parser(Lexer(source).tokenize_buffer()).parse()
+        if self.optimize:
+            optimizer.optimize(tree)
+        if self.typed:
+            inference.annotate(tree)
+        return CodeGenerator(typed=self.typed).generate(tree), tree
+
+    def translate_file(self, path):
+        with open(path, 'rb') as file:
+            return self.translate(file.read())
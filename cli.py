@@ -0,0 +1,87 @@
+import sys
+import argparse
+from batch import translate_tree
+import profiler
+import server
+import dump
+from lexer import Lexer
+from parser import Parser
+
+# Команды без окна: batch, serve и dump. Модуль не импортирует tkinter, поэтому
+# работает на машинах сборки без Tk; inteface.py передаёт их сюда же.
+
+def parseArguments():
+    argParser = argparse.ArgumentParser(description='Транслятор C# -> JavaScript. Без команды (python inteface.py) открывается окно редактора')
+    commands = argParser.add_subparsers(dest='command')
+    batchParser = commands.add_parser('batch', help='перевести все .cs файлы каталога без окна')
+    batchParser.add_argument('source', help='каталог с .cs файлами')
+    batchParser.add_argument('output', help='каталог для .js файлов (структура повторяет исходную)')
+    batchParser.add_argument('-j', '--jobs', type=int, default=None, help='число процессов (по умолчанию - все ядра)')
+    batchParser.add_argument('--cache', default=None, help='каталог кэша трансляции')
+    batchParser.add_argument('--metrics', default=None, help='файл для замеров стадий (время, память, счётчики)')
+    batchParser.add_argument('--metrics-format', choices=('json', 'prometheus'), default='json',
+                             help='JSON lines или текстовый формат Prometheus')
+    batchParser.add_argument('--memory', action='store_true', help='мерить пик памяти стадий (медленнее)')
+    batchParser.add_argument('--profile', default=None,
+                             help='профиль правил грамматики: стеки для flamegraph в файл, таблица правил на экран')
+    serveParser = commands.add_parser('serve', help='сервер JSON-RPC для сборки: stdin/stdout или Unix-сокет')
+    serveParser.add_argument('--socket', default=None, help='путь Unix-сокета (по умолчанию - stdin/stdout)')
+    serveParser.add_argument('-j', '--jobs', type=int, default=None, help='число процессов (по умолчанию - все ядра)')
+    serveParser.add_argument('--timeout', type=float, default=10.0, help='лимит времени запроса, с')
+    serveParser.add_argument('--max-size', type=int, default=4 * 1024 * 1024, help='лимит размера исходника, символов')
+    dumpParser = commands.add_parser('dump', help='выгрузить AST файла: текст, JSON по узлу на строку или двоичный')
+    dumpParser.add_argument('source', help='.cs файл')
+    dumpParser.add_argument('-f', '--format', choices=tuple(dump.DUMPERS), default='text')
+    dumpParser.add_argument('-o', '--output', default=None, help='файл для AST (по умолчанию - stdout)')
+    return argParser.parse_args()
+
+def runBatch(args):
+    profile = args.profile is not None or profiler.installed
+    report = translate_tree(args.source, args.output, args.jobs, args.cache,
+                            instrument=args.metrics is not None, memory=args.memory, profile=profile)
+    print(report)
+    if profile:
+        # профиль процессов пула - к профилю этого процесса (и TRANSLATOR_PROFILE)
+        profiler.profile.merge(report.profile)
+    if args.profile is not None:
+        profiler.write(args.profile, sys.stdout, limit=30)
+    if args.metrics is not None:
+        with open(args.metrics, 'w', encoding='utf-8') as file:
+            if args.metrics_format == 'json':
+                file.write(report.metrics.to_json_lines())
+            else:
+                file.write(report.metrics.to_prometheus())
+    sys.exit(1 if report.failures else 0)
+
+def runDump(args):
+    try:
+        with open(args.source, encoding='utf-8') as source:
+            tree = Parser(Lexer(source).tokenize_buffer()).parse()
+    except ValueError as e:
+        sys.exit(f"Лексическая ошибка: {e}")
+    except SyntaxError as e:
+        sys.exit(str(e))
+    binary = args.format == 'binary'
+    if args.output is None:
+        dump.dump(tree, sys.stdout.buffer if binary else sys.stdout, args.format)
+    else:
+        with open(args.output, 'wb' if binary else 'w', encoding=None if binary else 'utf-8') as out:
+            dump.dump(tree, out, args.format)
+    sys.exit()
+
+def run(args):
+    # Выполняет команду и завершает процесс
+    profiler.from_environment()
+    if args.command == 'batch':
+        runBatch(args)
+    if args.command == 'dump':
+        runDump(args)
+    if args.command == 'serve':
+        server.serve(args.socket, args.jobs, args.timeout, args.max_size)
+        sys.exit()
+
+if __name__ == '__main__':
+    args = parseArguments()
+    if args.command is None:
+        sys.exit('Укажите команду: batch, serve или dump (окно редактора - python inteface.py)')
+    run(args)
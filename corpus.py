@@ -0,0 +1,248 @@
+import random
+
+# Детерминированный генератор корректных программ на C# в пределах грамматики
+# parser.py: классы, методы с параметрами, объявления и присваивания, вывод,
+# вызовы методов своего класса, if / else if / else, while, do-while, return.
+# Одинаковые seed и настройки дают один и тот же текст. Переменные объявляются
+# до использования и видны только в своём блоке, поэтому semantic.resolve
+# не находит неразрешённых имён.
+
+VALUE_TYPES = ('int', 'int', 'int', 'double', 'bool', 'string')
+RETURN_TYPES = ('void', 'int', 'int', 'bool')
+NUMERIC_OPERATORS = ('+', '+', '-', '*', '/', '%')
+COMPARISONS = ('<', '>', '<=', '>=', '==', '!=')
+COMPOUND_OPERATORS = ('+=', '-=', '*=')
+WORDS = ('alpha', 'beta', 'gamma', 'delta', 'value', 'total', 'x = ', 'tab\\t', 'quote \\"q\\"')
+INDENT = '    '
+
+
+class CorpusSettings:
+    __slots__ = ('classes', 'methods', 'statements', 'expression_depth', 'nesting', 'parameters')
+
+    def __init__(self, classes=10, methods=5, statements=12, expression_depth=3, nesting=3, parameters=3):
+        # methods и statements - на класс и на метод; expression_depth - сколько
+        # уровней операторов в выражении; nesting - глубина вложенных блоков;
+        # parameters - наибольшее число параметров метода. classes не действует,
+        # если generate_program получает size
+        self.classes = classes
+        self.methods = methods
+        self.statements = statements
+        self.expression_depth = expression_depth
+        self.nesting = nesting
+        self.parameters = parameters
+
+    def __repr__(self):
+        return f"CorpusSettings({', '.join(f'{name}={getattr(self, name)}' for name in self.__slots__)})"
+
+
+class MethodWriter:
+    # Тело одного метода: открытые блоки - явный стек, поэтому глубина
+    # вложенности не ограничена глубиной рекурсии Python
+    def __init__(self, rng, settings, methods, return_type, parameters):
+        self.rng = rng
+        self.settings = settings
+        # (имя, тип возврата, типы параметров) методов класса для вызовов
+        self.methods = methods
+        self.return_type = return_type
+        # видимые переменные по типам: для каждого открытого блока - свой список
+        self.scopes = [list(parameters)]
+        self.counter = 0
+        self.lines = []
+
+    def variables(self, value_type):
+        return [name for scope in self.scopes for name, kind in scope if kind == value_type]
+
+    def numeric(self, depth, value_type='int'):
+        # Числовое выражение не глубже depth уровней операторов
+        rng = self.rng
+        if depth <= 0 or rng.random() < 0.25:
+            names = self.variables(value_type) or (self.variables('int') if value_type == 'double' else [])
+            if names and rng.random() < 0.6:
+                return rng.choice(names)
+            if value_type == 'double':
+                return f'{rng.randint(0, 99)}.{rng.randint(0, 9)}'
+            return str(rng.randint(0, 999))
+        if rng.random() < 0.1:
+            operand = self.numeric(depth - 1, value_type)
+            # '--x' в JS - декремент, поэтому вложенный минус берётся в скобки
+            return f'-{operand}' if operand[0].isalnum() else f'-({operand})'
+        operator = rng.choice(NUMERIC_OPERATORS)
+        left = self.numeric(depth - 1, value_type)
+        # делитель - ненулевая константа
+        right = str(rng.randint(1, 9)) if operator in ('/', '%') else self.numeric(depth - 1, value_type)
+        if rng.random() < 0.3:
+            return f'({left} {operator} {right})'
+        return f'{left} {operator} {right}'
+
+    def boolean(self, depth):
+        rng = self.rng
+        if depth <= 0:
+            names = self.variables('bool')
+            if names and rng.random() < 0.5:
+                return rng.choice(names)
+            return rng.choice(('true', 'false'))
+        choice = rng.random()
+        if choice < 0.5:
+            return f'{self.numeric(depth - 1)} {rng.choice(COMPARISONS)} {self.numeric(depth - 1)}'
+        if choice < 0.65:
+            return f'!({self.boolean(depth - 1)})'
+        return f'{self.boolean(depth - 1)} {rng.choice(("&&", "||"))} {self.boolean(depth - 1)}'
+
+    def string(self, depth):
+        rng = self.rng
+        names = self.variables('string')
+        head = rng.choice(names) if names and rng.random() < 0.5 else f'"{rng.choice(WORDS)}"'
+        if depth <= 0 or rng.random() < 0.3:
+            return head
+        return f'{head} + ({self.numeric(depth - 1)})'
+
+    def value(self, value_type, depth):
+        if value_type == 'bool':
+            return self.boolean(depth)
+        if value_type == 'string':
+            return self.string(depth)
+        return self.numeric(depth, value_type)
+
+    def add(self, line):
+        self.lines.append(INDENT * (len(self.scopes) + 2) + line)
+
+    def statement(self):
+        rng = self.rng
+        depth = self.settings.expression_depth
+        choice = rng.random()
+        assignable = [(name, kind) for scope in self.scopes for name, kind in scope]
+        if choice < 0.35 or not assignable:
+            value_type = rng.choice(VALUE_TYPES)
+            name = f'{value_type[0]}{self.counter}'
+            self.counter += 1
+            self.add(f'{value_type} {name} = {self.value(value_type, depth)};')
+            self.scopes[-1].append((name, value_type))
+        elif choice < 0.55:
+            name, value_type = rng.choice(assignable)
+            self.add(f'{name} = {self.value(value_type, depth)};')
+        elif choice < 0.7:
+            names = self.variables('int')
+            if names:
+                self.add(f'{rng.choice(names)} {rng.choice(COMPOUND_OPERATORS)} {self.numeric(depth)};')
+            else:
+                self.add(f'Console.WriteLine({self.numeric(depth)});')
+        elif choice < 0.85:
+            self.add(f'Console.WriteLine({self.value(rng.choice(VALUE_TYPES), depth)});')
+        else:
+            name, _, parameter_types = rng.choice(self.methods)
+            arguments = ', '.join(self.value(kind, depth - 1) for kind in parameter_types)
+            self.add(f'{name}({arguments});')
+
+    def open_block(self):
+        rng = self.rng
+        depth = self.settings.expression_depth
+        kind = rng.choice(('if', 'if', 'while', 'do'))
+        if kind == 'do':
+            self.add('do {')
+        else:
+            self.add(f'{kind} ({self.boolean(depth)}) {{')
+        # вид блока и число операторов в нём (пустые блоки не закрываются)
+        self.scopes.append([])
+        return [kind, 0]
+
+    def close_block(self, block):
+        rng = self.rng
+        depth = self.settings.expression_depth
+        self.scopes.pop()
+        kind = block[0]
+        if kind == 'do':
+            self.add(f'}} while ({self.boolean(depth)});')
+            return None
+        if kind in ('if', 'else if') and rng.random() < 0.4:
+            # ветка else / else if открывает новый блок вместо закрытого
+            self.scopes.append([])
+            if rng.random() < 0.5:
+                self.lines.append(INDENT * (len(self.scopes) + 1) + f'}} else if ({self.boolean(depth)}) {{')
+                return ['else if', 0]
+            self.lines.append(INDENT * (len(self.scopes) + 1) + '} else {')
+            return ['else', 0]
+        self.add('}')
+        return None
+
+    def body(self):
+        rng = self.rng
+        settings = self.settings
+        blocks = []
+        for _ in range(settings.statements):
+            choice = rng.random()
+            if blocks and blocks[-1][1] and choice < 0.2:
+                block = self.close_block(blocks.pop())
+                if block is not None:
+                    blocks.append(block)
+            elif len(blocks) < settings.nesting and choice < 0.4:
+                blocks.append(self.open_block())
+                continue
+            self.statement()
+            if blocks:
+                blocks[-1][1] += 1
+        while blocks:
+            block = blocks.pop()
+            if not block[1]:
+                self.statement()
+            block = self.close_block(block)
+            if block is not None:
+                self.statement()
+                block[1] += 1
+                blocks.append(block)
+        if self.return_type == 'void':
+            self.add('return;')
+        else:
+            self.add(f'return {self.value(self.return_type, settings.expression_depth)};')
+        return self.lines
+
+
+def class_source(rng, settings, index):
+    methods = []
+    for number in range(settings.methods):
+        parameter_types = [rng.choice(VALUE_TYPES) for _ in range(rng.randint(0, settings.parameters))]
+        methods.append((f'Method{index}_{number}', rng.choice(RETURN_TYPES), parameter_types))
+    lines = [f'{INDENT}public class Class{index} {{']
+    for name, return_type, parameter_types in methods:
+        parameters = [(f'p{position}', kind) for position, kind in enumerate(parameter_types)]
+        modifiers = rng.choice(('public static', 'private', 'public', 'static'))
+        signature = ', '.join(f'{kind} {parameter}' for parameter, kind in parameters)
+        lines.append(f'{INDENT * 2}{modifiers} {return_type} {name}({signature}) {{')
+        lines.extend(MethodWriter(rng, settings, methods, return_type, parameters).body())
+        lines.append(f'{INDENT * 2}}}')
+    lines.append(f'{INDENT}}}')
+    return '\n'.join(lines) + '\n'
+
+
+def generate_program(seed=0, settings=None, size=None):
+    # Программа из settings.classes классов; с size число классов задаёт
+    # размер, а не settings.classes: их столько, чтобы текст был не короче
+    # size символов
+    settings = settings or CorpusSettings()
+    rng = random.Random(seed)
+    parts = ['using System;\n\nnamespace Corpus {\n']
+    length = len(parts[0])
+    index = 0
+    while (length < size) if size is not None else (index < settings.classes):
+        part = class_source(rng, settings, index)
+        parts.append(part)
+        length += len(part)
+        index += 1
+    parts.append('}\n')
+    return ''.join(parts)
+
+
+# Вырожденные входы: вложенность и цепочки операторов глубиной n. На них
+# проверяется, что стадии не рекурсивны (тесты и benchmark.py stress)
+STRESS_INPUTS = {
+    'nested if': lambda n: 'if (x) { ' * n + 'x = 1; ' + '} ' * n,
+    'nested while': lambda n: 'while (x) { ' * n + 'x -= 1; ' + '} ' * n,
+    'nested do': lambda n: 'do { ' * n + 'x -= 1; ' + '} while (x); ' * n,
+    'else if chain': lambda n: 'if (x) { x = 1; } ' + 'else if (x) { x = 2; } ' * n,
+    'operator chain': lambda n: 'x = 1' + ' + x' * n + ';',
+    'nested parens': lambda n: 'x = ' + '(' * n + 'x' + ')' * n + ';',
+    'unary chain': lambda n: 'b = ' + '!' * n + 'true;',
+}
+
+
+def stress_code(body):
+    return f'namespace Stress {{ class Deep {{ static void Main() {{ {body} }} }} }}'
@@ -0,0 +1,382 @@
+import json
+from json.encoder import encode_basestring
+
+from nodes import (
+    Program, LibraryImport, Namespace, Class, Method, VariableDeclaration, Assignment,
+    CompoundAssignment, ExpressionStatement, Output, Return, Block, ElseBlock, If, While,
+    DoWhile, MethodCall, BinaryOperation, UnaryOperation, Variable, Number, String, Boolean,
+)
+
+# Выгрузка AST потоком в writer (любой объект с write) и загрузка обратно.
+# Обход итеративный, узлы пишутся в прямом порядке, а вывод копится кусками
+# и сбрасывается, поэтому ни текст всего дерева, ни копия дерева в памяти
+# не строятся. Форматы:
+#   text   - отступы как у Node.print_tree (для чтения глазами, не загружается)
+#   json   - JSON по узлу на строку: {"type": ..., поля узла, "children": число детей}
+#   binary - сжатая запись: типы и числа в varint, строки - через таблицу,
+#            которая пополняется по ходу записи
+# Поля, проставляемые проходами (ctype, symbol, constant), не сохраняются:
+# после загрузки их восстанавливают inference.annotate и semantic.resolve.
+
+# Тип узла -> (поля со значениями, сборка узла из значений полей и детей)
+LAYOUT = {
+    'Program': ((), lambda fields, children: Program(children)),
+    'LibraryImport': (('name',), lambda fields, children: LibraryImport(fields[0])),
+    'Namespace': (('name',), lambda fields, children: Namespace(fields[0], children)),
+    'Class': (('name', 'modifiers'), lambda fields, children: Class(fields[0], fields[1], children)),
+    'Method': (
+        ('name', 'modifiers', 'parameters', 'return_type', 'parameter_types'),
+        lambda fields, children: Method(fields[0], fields[1], fields[2], fields[3], children, fields[4]),
+    ),
+    'VariableDeclaration': (
+        ('var_type', 'name'),
+        lambda fields, children: VariableDeclaration(fields[0], fields[1], children[0] if children else None),
+    ),
+    'Assignment': (('variable',), lambda fields, children: Assignment(fields[0], children[0])),
+    'CompoundAssignment': (
+        ('variable', 'operator'),
+        lambda fields, children: CompoundAssignment(fields[0], fields[1], children[0]),
+    ),
+    'ExpressionStatement': ((), lambda fields, children: ExpressionStatement(children[0])),
+    'Output': ((), lambda fields, children: Output(children[0])),
+    'Return': ((), lambda fields, children: Return(children[0] if children else None)),
+    'Block': ((), lambda fields, children: Block(children)),
+    'ElseBlock': ((), lambda fields, children: ElseBlock(children)),
+    'If': ((), lambda fields, children: If(children[0], children[1], children[2] if len(children) > 2 else None)),
+    'While': ((), lambda fields, children: While(children[0], children[1])),
+    'DoWhile': ((), lambda fields, children: DoWhile(children[0], children[1])),
+    'MethodCall': (('name',), lambda fields, children: MethodCall(fields[0], children)),
+    'BinaryOperation': (('operator',), lambda fields, children: BinaryOperation(fields[0], children[0], children[1])),
+    'UnaryOperation': (('operator',), lambda fields, children: UnaryOperation(fields[0], children[0])),
+    'Variable': (('name',), lambda fields, children: Variable(fields[0])),
+    'Number': (('value',), lambda fields, children: Number(fields[0])),
+    'String': (('value',), lambda fields, children: String(fields[0])),
+    'Boolean': (('value',), lambda fields, children: Boolean(fields[0])),
+}
+
+# Поля-списки строк; остальные поля - строка или None
+LIST_FIELDS = frozenset({'modifiers', 'parameters', 'parameter_types'})
+
+# Допустимое число детей (наименьшее, наибольшее) для узлов с фиксированными
+# детьми; у остальных (Program, Block, MethodCall, ...) детей сколько угодно.
+# Сборщики LAYOUT обращаются к детям по номеру и рассчитывают на эти границы
+CHILD_COUNTS = {
+    'LibraryImport': (0, 0),
+    'VariableDeclaration': (0, 1),
+    'Assignment': (1, 1),
+    'CompoundAssignment': (1, 1),
+    'ExpressionStatement': (1, 1),
+    'Output': (1, 1),
+    'Return': (0, 1),
+    'If': (2, 3),
+    'While': (2, 2),
+    'DoWhile': (2, 2),
+    'BinaryOperation': (2, 2),
+    'UnaryOperation': (1, 1),
+    'Variable': (0, 0),
+    'Number': (0, 0),
+    'String': (0, 0),
+    'Boolean': (0, 0),
+}
+
+# Какие узлы могут быть детьми: множество типов для всех детей или кортеж
+# множеств по позициям. Сборщики LAYOUT не проверяют типы, а генератор упал бы
+# на чужом узле не ValueError, а AttributeError далеко от места ошибки
+EXPRESSIONS = frozenset({'MethodCall', 'BinaryOperation', 'UnaryOperation', 'Variable', 'Number', 'String', 'Boolean'})
+STATEMENTS = frozenset({
+    'VariableDeclaration', 'Assignment', 'CompoundAssignment', 'ExpressionStatement', 'Output', 'Return',
+    'If', 'While', 'DoWhile', 'MethodCall',
+})
+BLOCK = frozenset({'Block'})
+CHILD_TYPES = {
+    'Program': frozenset({'LibraryImport', 'Namespace'}),
+    'Namespace': frozenset({'Class'}),
+    'Class': frozenset({'Method'}),
+    'Method': STATEMENTS,
+    'Block': STATEMENTS,
+    'ElseBlock': STATEMENTS,
+    'MethodCall': EXPRESSIONS,
+    'VariableDeclaration': EXPRESSIONS,
+    'Assignment': EXPRESSIONS,
+    'CompoundAssignment': EXPRESSIONS,
+    'ExpressionStatement': EXPRESSIONS,
+    'Output': EXPRESSIONS,
+    'Return': EXPRESSIONS,
+    'If': (EXPRESSIONS, BLOCK, frozenset({'ElseBlock'})),
+    'While': (EXPRESSIONS, BLOCK),
+    'DoWhile': (BLOCK, EXPRESSIONS),
+    'BinaryOperation': EXPRESSIONS,
+    'UnaryOperation': EXPRESSIONS,
+}
+
+# Номера типов в двоичном формате; новые типы добавляются только в конец
+TYPE_CODES = tuple(LAYOUT)
+TYPE_NUMBERS = {name: code for code, name in enumerate(TYPE_CODES)}
+
+BINARY_MAGIC = b'CSAST\x01'
+# Сколько накопить перед записью в writer (строк текста / байт)
+FLUSH_LINES = 4096
+FLUSH_BYTES = 64 * 1024
+
+
+def walk(tree, level=0):
+    # (узел, глубина, дети) в прямом порядке без рекурсии
+    stack = [(tree, level)]
+    while stack:
+        node, depth = stack.pop()
+        children = node.children
+        yield node, depth, children
+        for index in range(len(children) - 1, -1, -1):
+            stack.append((children[index], depth + 1))
+
+
+def dump_text(tree, out, level=0):
+    # Тот же текст, что у Node.print_tree
+    lines = []
+    for node, depth, _ in walk(tree, level):
+        lines.append(f"{'  ' * depth}Node({node.type}, {node.value})\n")
+        if len(lines) >= FLUSH_LINES:
+            out.write(''.join(lines))
+            lines.clear()
+    out.write(''.join(lines))
+
+
+def json_value(value):
+    # Значение поля: строка, None или список строк
+    if value is None:
+        return 'null'
+    if value.__class__ is list:
+        return '[' + ', '.join(map(json_value, value)) + ']'
+    return encode_basestring(value)
+
+
+def dump_json(tree, out):
+    # Строки собираются вручную: json.dumps словаря на каждый узел в разы медленнее
+    lines = []
+    for node, _, children in walk(tree):
+        parts = [f'{{"type": "{node.type}"']
+        for field in LAYOUT[node.type][0]:
+            parts.append(f', "{field}": {json_value(getattr(node, field))}')
+        parts.append(f', "children": {len(children)}}}\n')
+        lines.append(''.join(parts))
+        if len(lines) >= FLUSH_LINES:
+            out.write(''.join(lines))
+            lines.clear()
+    out.write(''.join(lines))
+
+
+def write_varint(buffer, number):
+    while number > 0x7f:
+        buffer.append(number & 0x7f | 0x80)
+        number >>= 7
+    buffer.append(number)
+
+
+def dump_binary(tree, out):
+    # out - двоичный writer. Строка пишется как varint: 0 - None, 1 - новая
+    # строка (длина и UTF-8 следом, получает следующий номер), k - строка k - 2
+    strings = {}
+    buffer = bytearray(BINARY_MAGIC)
+
+    def write_string(text):
+        if text is None:
+            buffer.append(0)
+            return
+        number = strings.get(text)
+        if number is not None:
+            write_varint(buffer, number + 2)
+            return
+        strings[text] = len(strings)
+        data = text.encode('utf-8')
+        buffer.append(1)
+        write_varint(buffer, len(data))
+        buffer.extend(data)
+
+    for node, _, children in walk(tree):
+        fields = LAYOUT[node.type][0]
+        write_varint(buffer, TYPE_NUMBERS[node.type])
+        write_varint(buffer, len(children))
+        for field in fields:
+            value = getattr(node, field)
+            if field in LIST_FIELDS:
+                write_varint(buffer, len(value))
+                for item in value:
+                    write_string(item)
+            else:
+                write_string(value)
+        if len(buffer) >= FLUSH_BYTES:
+            out.write(bytes(buffer))
+            buffer.clear()
+    out.write(bytes(buffer))
+
+
+class TreeBuilder:
+    # Сборка дерева из узлов в прямом порядке с числом детей: открытые узлы
+    # лежат на явном стеке, узел создаётся, когда собраны все его дети
+    def __init__(self):
+        self.stack = []
+        self.root = None
+
+    def add(self, node_type, fields, count):
+        if node_type not in LAYOUT:
+            raise ValueError(f"Неизвестный тип узла: {node_type}")
+        if self.root is not None:
+            raise ValueError("Данные после конца дерева")
+        if count.__class__ is not int or count < 0:
+            raise ValueError(f"Неверное число детей узла {node_type}: {count!r}")
+        limits = CHILD_COUNTS.get(node_type)
+        if limits is not None and not limits[0] <= count <= limits[1]:
+            raise ValueError(f"У узла {node_type} не может быть {count} детей")
+        stack = self.stack
+        if stack:
+            # новый узел - следующий ребёнок ближайшего незаконченного узла
+            parent_type, _, _, siblings = stack[-1]
+            allowed = CHILD_TYPES[parent_type]
+            if allowed.__class__ is tuple:
+                allowed = allowed[len(siblings)]
+            if node_type not in allowed:
+                raise ValueError(f"Узел {node_type} не может быть ребёнком {parent_type} "
+                                 f"на месте {len(siblings) + 1}")
+        stack.append((node_type, fields, count, []))
+        while stack and len(stack[-1][3]) == stack[-1][2]:
+            node_type, fields, _, children = stack.pop()
+            node = LAYOUT[node_type][1](fields, children)
+            if stack:
+                stack[-1][3].append(node)
+            else:
+                self.root = node
+
+    def result(self):
+        if self.root is None:
+            raise ValueError("Дерево оборвано")
+        return self.root
+
+
+def is_string(value):
+    return value is None or value.__class__ is str
+
+
+def json_field(record, field):
+    if field not in record:
+        raise ValueError(f"Нет поля {field} у узла {record['type']}")
+    value = record[field]
+    if field in LIST_FIELDS:
+        if value.__class__ is not list or not all(map(is_string, value)):
+            raise ValueError(f"Поле {field} узла {record['type']} должно быть списком строк")
+    elif not is_string(value):
+        raise ValueError(f"Поле {field} узла {record['type']} должно быть строкой")
+    return value
+
+
+def load_json(lines):
+    # lines - текстовый файл или любая последовательность строк dump_json.
+    # Любая ошибка в данных - ValueError
+    builder = TreeBuilder()
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if record.__class__ is not dict:
+            raise ValueError(f"Узел должен быть объектом JSON: {line.strip()[:80]}")
+        node_type = record.get('type')
+        if node_type.__class__ is not str or node_type not in LAYOUT:
+            raise ValueError(f"Неизвестный тип узла: {node_type}")
+        if 'children' not in record:
+            raise ValueError(f"Нет числа детей у узла {node_type}")
+        fields = [json_field(record, field) for field in LAYOUT[node_type][0]]
+        builder.add(node_type, fields, record['children'])
+    return builder.result()
+
+
+class BinaryReader:
+    # Чтение varint и строк из bytes или двоичного файла кусками по FLUSH_BYTES
+    def __init__(self, source):
+        self.file = None if isinstance(source, (bytes, bytearray, memoryview)) else source
+        self.data = bytes(source) if self.file is None else b''
+        self.position = 0
+
+    def refill(self):
+        chunk = self.file.read(FLUSH_BYTES) if self.file is not None else b''
+        if not chunk:
+            raise ValueError("Двоичный AST оборван")
+        self.data = self.data[self.position:] + chunk
+        self.position = 0
+
+    def at_end(self):
+        if self.position < len(self.data):
+            return False
+        if self.file is None:
+            return True
+        chunk = self.file.read(FLUSH_BYTES)
+        if not chunk:
+            return True
+        self.data = chunk
+        self.position = 0
+        return False
+
+    def read_bytes(self, size):
+        while len(self.data) - self.position < size:
+            self.refill()
+        start = self.position
+        self.position += size
+        return self.data[start:self.position]
+
+    def read_varint(self):
+        number = 0
+        shift = 0
+        while True:
+            if self.position >= len(self.data):
+                self.refill()
+            byte = self.data[self.position]
+            self.position += 1
+            number |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return number
+            shift += 7
+
+
+def load_binary(source):
+    # source - bytes или двоичный файл, записанный dump_binary
+    reader = BinaryReader(source)
+    if reader.read_bytes(len(BINARY_MAGIC)) != BINARY_MAGIC:
+        raise ValueError("Это не двоичный AST (неверная сигнатура)")
+    strings = []
+
+    def read_string():
+        number = reader.read_varint()
+        if number == 0:
+            return None
+        if number == 1:
+            strings.append(reader.read_bytes(reader.read_varint()).decode('utf-8'))
+            return strings[-1]
+        if number - 2 >= len(strings):
+            raise ValueError(f"Ссылка на строку {number - 2}, а в таблице их {len(strings)}")
+        return strings[number - 2]
+
+    builder = TreeBuilder()
+    while builder.root is None or not reader.at_end():
+        code = reader.read_varint()
+        if code >= len(TYPE_CODES):
+            raise ValueError(f"Неизвестный код типа узла: {code}")
+        node_type = TYPE_CODES[code]
+        count = reader.read_varint()
+        fields = []
+        for field in LAYOUT[node_type][0]:
+            if field in LIST_FIELDS:
+                fields.append([read_string() for _ in range(reader.read_varint())])
+            else:
+                fields.append(read_string())
+        builder.add(node_type, fields, count)
+    return builder.result()
+
+
+DUMPERS = {'text': dump_text, 'json': dump_json, 'binary': dump_binary}
+LOADERS = {'json': load_json, 'binary': load_binary}
+
+
+def dump(tree, out, format='text'):
+    DUMPERS[format](tree, out)
+
+
+def load(source, format='json'):
+    return LOADERS[format](source)
@@ -1,108 +1,338 @@
+import io
+import struct
+from types import GeneratorType
 from parser import Parser
+from nodes import NODE_CLASSES, Number
+from instrumentation import instrumented, count_output
 
 indent = 2
+# Сколько кусков копится перед записью в файл
+FLUSH_CHUNKS = 4096
+# Арифметика, результат которой зависит от типа операндов
+ARITHMETIC_OPERATORS = frozenset({'+', '-', '*', '/', '%'})
+INT_TRUNCATED = frozenset({'+', '-', '/'})
 
 class CodeGenerator:
     mainFlag = False
     nameMainClass = ''
-
-    def generate(self, node):
+    # класс узла -> обработчик(генератор, узел, отступ), объявленный в самом
+    # классе: методы visit_<тип> и register()
+    own_handlers = {}
+    # те же обработчики с учётом базовых классов по MRO - по этой таблице идёт
+    # обход. Пересобирается для класса и всех подклассов при каждом register(),
+    # поэтому порядок регистрации и создания подклассов не важен.
+    handlers = {}
+
+    def __init__(self, cache=None, typed=False):
+        # cache: словарь узел Method -> готовый JS, общий для нескольких запусков.
+        # typed: дерево размечено inference.annotate, и JS повторяет арифметику
+        # C# (|0, Math.imul, Math.fround). Без него типы не используются вовсе,
+        # даже собственные типы литералов и объявлений.
+        self.cache = cache
+        self.typed = typed
+        self.indents = Indents()
+        self.set_output(None)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.own_handlers = collect_handlers(cls)
+        cls.handlers = resolve_handlers(cls)
+
+    @classmethod
+    def register(cls, node_class):
+        # Декоратор для обработчиков новых или переопределяемых видов узлов:
+        #   @CodeGenerator.register(MyNode)
+        #   def visit_my_node(generator, node, depth): ...
+        # node_class - класс узла или имя типа из nodes.NODE_CLASSES.
+        # Обработчик возвращает строку либо является генератором, который пишет
+        # свой текст через generator.write и отдаёт (дочерний узел, отступ)
+        # там, где должен стоять код этого узла.
+        if isinstance(node_class, str):
+            node_class = NODE_CLASSES[node_class]
+
+        def decorator(function):
+            cls.own_handlers[node_class] = function
+            refresh_handlers(cls)
+            return function
+        return decorator
+
+    def set_output(self, out):
+        # Куда идут куски JS: None - во внутренний список, который склеивает visit,
+        # список - прямо в него, иначе в объект с методом write (файл, io.StringIO),
+        # который получает текст порциями по FLUSH_CHUNKS кусков
+        if isinstance(out, list):
+            self.chunks = out
+            self.out = None
+        else:
+            self.chunks = []
+            self.out = out
+        self.write = self.chunks.append
+        self.captures = 0
+
+    def flush(self):
+        if self.out is not None and not self.captures and self.chunks:
+            self.out.write(''.join(self.chunks))
+            self.chunks.clear()
+
+    @instrumented('generator', count_output)
+    def generate(self, node, out=None):
         try:
-            code = self.pre_order(node)
+            code = self.pre_order(node, out=out)
             return code
         except Exception as e:
             raise Exception(f"Ошибка при генерации кода: {e}")
             return ''
 
-    def pre_order(self, node, depth=0):
-        code = self.visit(node, depth)
+    def pre_order(self, node, depth=0, out=None):
+        # Без out возвращает JS строкой; с out пишет в него и возвращает None
+        target = io.StringIO() if out is None else out
+        self.set_output(target)
+        self.emit(node, depth)
         # code += self.visit(self.mainNode, 0)
         if self.mainFlag:
-            code += f'\n{self.nameMainClass}Main()'
-        return code
+            self.write(f'\n{self.nameMainClass}Main()')
+        self.flush()
+        if out is None:
+            return target.getvalue()
+        return None
 
     def visit(self, node, depth):
-        method_name = f'visit_{node.type}'
-        visitor = getattr(self, method_name, self.generic_visit)
-        return visitor(node, depth)
+        # JS одного узла строкой
+        start = self.begin_capture()
+        self.emit(node, depth)
+        code = self.end_capture(start)
+        self.chunks.pop()
+        return code
+
+    def begin_capture(self):
+        # Пока захват открыт, куски не сбрасываются в out: их можно склеить
+        self.captures += 1
+        return len(self.chunks)
+
+    def end_capture(self, start):
+        chunks = self.chunks
+        code = ''.join(chunks[start:])
+        chunks[start:] = [code]
+        self.captures -= 1
+        return code
+
+    def emit(self, node, depth):
+        # Обход без рекурсии: обработчик с дочерними узлами - генератор, который
+        # пишет свой текст через self.write и отдаёт (узел, отступ) там, где
+        # должен стоять код дочернего узла. Генераторы лежат на явном стеке,
+        # поэтому глубина дерева не ограничена стеком Python. Каждый кусок
+        # текста пишется один раз, без склейки строк на каждом уровне.
+        handlers = self.handlers
+        write = self.write
+        chunks = self.chunks
+        out = self.out
+        result = self.dispatch(node, depth)
+        if type(result) is not GeneratorType:
+            write(result)
+            return
+        stack = [result]
+        while stack:
+            try:
+                child, child_depth = next(stack[-1])
+            except StopIteration:
+                stack.pop()
+                if out is not None and len(chunks) >= FLUSH_CHUNKS:
+                    self.flush()
+                continue
+            handler = handlers.get(child.__class__)
+            if handler is None:
+                result = self.generic_visit(child, child_depth)
+            else:
+                result = handler(self, child, child_depth)
+            if type(result) is GeneratorType:
+                stack.append(result)
+                if out is not None and len(chunks) >= FLUSH_CHUNKS:
+                    self.flush()
+            else:
+                write(result)
+
+    def dispatch(self, node, depth):
+        handler = self.handlers.get(node.__class__)
+        if handler is None:
+            return self.generic_visit(node, depth)
+        return handler(self, node, depth)
 
     def generic_visit(self, node, depth):
         raise Exception(f'Нет visit_{node.type} метода')
 
 
     def visit_Output(self, node, depth):
-        code = f'{depth * " "}console.log({self.visit(node.children[0], depth)})'
-        return code
+        write = self.write
+        write(f'{self.indents[depth]}console.log(')
+        yield node.expression, depth
+        write(')')
 
     def visit_Program(self, node, depth):
-        code = '\n'.join(self.visit(child, depth) for child in node.children)
-        return code
+        write = self.write
+        for index, child in enumerate(node.items):
+            if index:
+                write('\n')
+            yield child, depth
 
     def visit_LibraryImport(self, node, depth):
-        return f'// Imported library: {node.value}'
+        return f'// Imported library: {node.name}'
 
     def visit_Namespace(self, node, depth):
-        code = '\n'.join(self.visit(child, depth) for child in node.children)
-        return code
+        write = self.write
+        for index, child in enumerate(node.classes):
+            if index:
+                write('\n')
+            yield child, depth
 
     def visit_Class(self, node, depth):
-        name = node.value['name']
+        write = self.write
+        name = node.name
         isChanged = self.mainFlag
-        code = f'class {name} {{'
-        for child in node.children:
-            code += f'\n{self.visit(child, depth + indent)}'
-        code += f'\n}}'
+        write(f'class {name} {{')
+        for child in node.methods:
+            write('\n')
+            yield child, depth + indent
+        write('\n}')
 
         if self.mainFlag != isChanged:
             self.nameMainClass += f'{name}.'
-        
-        return code
 
     def visit_Method(self, node, depth):
-        name = node.value['name']
+        write = self.write
+        name = node.name
 
         if (name == "Main"):
             self.mainFlag = True
 
-        parameters = ', '.join(node.value['parameters'])
-        code = f'{depth * " "}function {name}({parameters}) {{'
-        for child in node.children:
-            code += f'\n{self.visit(child, depth + indent)}'
-        code += f'\n{depth * " "}}}'
-        return code
+        cache = self.cache
+        if cache is not None:
+            if node in cache:
+                write(cache[node])
+                return
+            start = self.begin_capture()
+
+        parameters = ', '.join(node.parameters)
+        write(f'{self.indents[depth]}function {name}({parameters}) {{')
+        for child in node.body:
+            write('\n')
+            yield child, depth + indent
+        write(f'\n{self.indents[depth]}}}')
+        if cache is not None:
+            cache[node] = self.end_capture(start)
 
     def visit_VariableDeclaration(self, node, depth):
-        name = node.value['name']
-        value = self.visit(node.children[0], depth) if node.children else ''
-        return f'{depth * " "}let {name} = {value};'
+        write = self.write
+        keyword = 'const' if node.constant else 'let'
+        write(f'{self.indents[depth]}{keyword} {node.name} = ')
+        initializer = node.initializer
+        if initializer is None:
+            pass
+        elif self.typed and rounds_to_float(node.var_type, initializer):
+            write('Math.fround(')
+            yield initializer, depth
+            write(')')
+        else:
+            yield initializer, depth
+        write(';')
 
     def visit_Assignment(self, node, depth):
-        variable = node.value['variable']
-        value = self.visit(node.children[0], depth)
-        return f'{depth * " "}{variable} = {value};'
+        write = self.write
+        write(f'{self.indents[depth]}{node.variable} = ')
+        if self.typed and rounds_to_float(node.ctype, node.expression):
+            write('Math.fround(')
+            yield node.expression, depth
+            write(')')
+        else:
+            yield node.expression, depth
+        write(';')
 
     def visit_CompoundAssignment(self, node, depth):
-        variable = node.value["variable"]
-        operator = node.value["operator"]
-        value = self.visit(node.children[0], depth)
-        return f'{depth * " "}{variable} {operator} {value};'
+        # x op= e для int и float раскрывается в x = x op e с тем же приведением,
+        # что и у бинарной операции
+        write = self.write
+        variable = node.variable
+        operator = node.operator[0]
+        ctype = node.ctype if self.typed else None
+        spaces = self.indents[depth]
+        if ctype == 'int' and operator == '*':
+            write(f'{spaces}{variable} = Math.imul({variable}, ')
+            yield node.expression, depth
+            write(');')
+        elif ctype == 'int' and operator in INT_TRUNCATED:
+            write(f'{spaces}{variable} = {variable} {operator} ')
+            yield node.expression, depth
+            write(' | 0;')
+        elif ctype == 'float' and operator in ARITHMETIC_OPERATORS:
+            write(f'{spaces}{variable} = Math.fround({variable} {operator} ')
+            yield node.expression, depth
+            write(');')
+        else:
+            write(f'{spaces}{variable} {node.operator} ')
+            yield node.expression, depth
+            write(';')
 
     def visit_BinaryOperation(self, node, depth):
-        left = self.visit(node.children[0], depth)
-        right = self.visit(node.children[1], depth)
-        operator = node.value
-        return f'({left} {operator} {right})'
+        # int: сложение, вычитание и деление обрезаются до 32 бит через |0,
+        # умножение - Math.imul (точное произведение может не влезть в double);
+        # float: результат округляется Math.fround
+        write = self.write
+        operator = node.operator
+        ctype = node.ctype if self.typed else None
+        if ctype == 'int' and operator == '*':
+            write('Math.imul(')
+            yield node.left, depth
+            write(', ')
+            yield node.right, depth
+            write(')')
+        elif ctype == 'int' and operator in INT_TRUNCATED:
+            write('(')
+            yield node.left, depth
+            write(f' {operator} ')
+            yield node.right, depth
+            write(' | 0)')
+        elif ctype == 'float' and operator in ARITHMETIC_OPERATORS:
+            write('Math.fround(')
+            yield node.left, depth
+            write(f' {operator} ')
+            yield node.right, depth
+            write(')')
+        else:
+            write('(')
+            yield node.left, depth
+            write(f' {operator} ')
+            yield node.right, depth
+            write(')')
 
     def visit_UnaryOperation(self, node, depth):
-        operand = self.visit(node.children[0], depth)
-        operator = node.value
-        return f'{operator}{operand}'
+        operand = node.operand
+        if self.typed and node.operator == '-' and node.ctype == 'int' and operand.__class__ is not Number:
+            # -(-2147483648) в C# снова -2147483648
+            write = self.write
+            write('(-')
+            yield operand, depth
+            write(' | 0)')
+        else:
+            self.write(node.operator)
+            yield operand, depth
 
     def visit_Variable(self, node, depth):
-        return node.value
+        return node.name
 
     def visit_Number(self, node, depth):
-        return node.value
+        # У float-литерала суффикс f в JS недопустим; с типами значение, которое
+        # не представимо во float точно, округляется так же, как в C#
+        value = node.value
+        if value.endswith('f'):
+            value = value[:-1]
+            if not self.typed:
+                return value
+            try:
+                exact = struct.unpack('f', struct.pack('f', float(value)))[0] == float(value)
+            except OverflowError:
+                exact = False
+            if not exact:
+                return f'Math.fround({value})'
+        return value
 
     def visit_String(self, node, depth):
         return node.value
@@ -111,45 +341,117 @@ class CodeGenerator:
         return node.value
 
     def visit_If(self, node, depth):
-        condition = self.visit(node.children[0], depth)
-        then_branch = self.visit(node.children[1], depth)
-        if len(node.children) > 2:
-            else_branch = self.visit(node.children[2], depth)
-            return f'{depth * " "}if ({condition}) {{\n{then_branch}\n{depth * " "}}} else {{\n{else_branch}\n{depth * " "}}}'
-        else:
-            return f'{depth * " "}if ({condition}) {{\n{then_branch}\n{depth * " "}}}'
+        write = self.write
+        spaces = self.indents[depth]
+        write(f'{spaces}if (')
+        yield node.condition, depth
+        write(') {\n')
+        yield node.then_block, depth
+        if node.else_block is not None:
+            write(f'\n{spaces}}} else {{\n')
+            yield node.else_block, depth
+        write(f'\n{spaces}}}')
 
     def visit_Block(self, node, depth):
-        code = ''
-        for child in node.children:
-            code += f'{self.visit(child, depth + indent)}\n'
-        return code.rstrip()
+        # Операторы через перевод строки; код оператора не оканчивается
+        # пробельными символами, так что это совпадает с прежним rstrip()
+        write = self.write
+        for index, child in enumerate(node.statements):
+            if index:
+                write('\n')
+            yield child, depth + indent
 
     def visit_ElseBlock(self, node, depth):
-        return self.visit_Block(node, depth)
+        yield from self.visit_Block(node, depth)
 
     def visit_Return(self, node, depth):
-        if node.children:
-            value = self.visit(node.children[0], depth)
-            return f'{depth * " "}return {value};'
+        if node.expression is not None:
+            write = self.write
+            write(f'{self.indents[depth]}return ')
+            yield node.expression, depth
+            write(';')
         else:
-            return f'{depth * " "}return;'
+            self.write(f'{self.indents[depth]}return;')
 
     def visit_DoWhile(self, node, depth):
-        body = self.visit(node.children[0], depth + indent)
-        condition = self.visit(node.children[1], depth)
-        return f'{depth * " "}do {{\n{body}\n{depth * " "}}} while ({condition});'
+        write = self.write
+        spaces = self.indents[depth]
+        write(f'{spaces}do {{\n')
+        yield node.body, depth + indent
+        write(f'\n{spaces}}} while (')
+        yield node.condition, depth
+        write(');')
 
     def visit_While(self, node, depth):
-        condition = self.visit(node.children[0], depth)
-        body = self.visit(node.children[1], depth + indent)
-        return f'{depth * " "}while ({condition}) {{\n{body}\n{depth * " "}}}'
+        write = self.write
+        spaces = self.indents[depth]
+        write(f'{spaces}while (')
+        yield node.condition, depth
+        write(') {\n')
+        yield node.body, depth + indent
+        write(f'\n{spaces}}}')
 
     def visit_MethodCall(self, node, depth):
-        method_name = node.value
-        arguments = ', '.join(self.visit(arg, depth) for arg in node.children)
-        return f'{depth * " "}{method_name}({arguments});'
+        write = self.write
+        write(f'{self.indents[depth]}{node.name}(')
+        for index, arg in enumerate(node.arguments):
+            if index:
+                write(', ')
+            yield arg, depth
+        write(');')
 
     def visit_ExpressionStatement(self, node, depth):
-        expr = self.visit(node.children[0], depth)
-        return f'{depth * " "}{expr};'
+        write = self.write
+        write(self.indents[depth])
+        yield node.expression, depth
+        write(';')
+
+
+def rounds_to_float(target_type, expression):
+    # Неявное приведение C# к float (например, int -> float) округляет значение
+    return target_type == 'float' and expression.ctype not in ('float', None)
+
+
+class Indents(dict):
+    # Строки отступов, создаются один раз для каждой глубины
+    def __missing__(self, depth):
+        spaces = self[depth] = ' ' * depth
+        return spaces
+
+
+def collect_handlers(cls):
+    handlers = {}
+    for name, function in vars(cls).items():
+        node_class = NODE_CLASSES.get(name[len('visit_'):]) if name.startswith('visit_') else None
+        if node_class is not None:
+            handlers[node_class] = function
+    return handlers
+
+
+# (класс, обработчик) -> обработчик, которым он подменяется в таблице handlers.
+# Ставит profiler.install: так обработчики классов, созданных и
+# зарегистрированных во время профилирования, тоже попадают в профиль
+handler_wrapper = None
+
+
+def resolve_handlers(cls):
+    # Собственные обработчики классов MRO: ближайший к cls перекрывает дальние
+    handlers = {}
+    for klass in reversed(cls.__mro__):
+        handlers.update(vars(klass).get('own_handlers', {}))
+    if handler_wrapper is not None:
+        return {node_class: handler_wrapper(cls, handler) for node_class, handler in handlers.items()}
+    return handlers
+
+
+def refresh_handlers(cls):
+    # Пересобирает handlers класса и всех его подклассов
+    stack = [cls]
+    while stack:
+        klass = stack.pop()
+        klass.handlers = resolve_handlers(klass)
+        stack.extend(klass.__subclasses__())
+
+
+CodeGenerator.own_handlers = collect_handlers(CodeGenerator)
+CodeGenerator.handlers = resolve_handlers(CodeGenerator)
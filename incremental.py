@@ -0,0 +1,209 @@
+from bisect import bisect_right
+
+import optimizer
+import inference
+import semantic
+from lexer import Lexer
+from parser import Parser
+from generator import CodeGenerator
+from prescan import scan_spans
+
+# Размер блока при поиске общего начала и конца двух текстов
+BLOCK = 4096
+
+
+def common_prefix_length(a, b):
+    # Сравнение блоками (memcmp внутри интерпретатора), затем посимвольно
+    limit = min(len(a), len(b))
+    position = 0
+    while position + BLOCK <= limit and a[position:position + BLOCK] == b[position:position + BLOCK]:
+        position += BLOCK
+    while position < limit and a[position] == b[position]:
+        position += 1
+    return position
+
+
+def common_suffix_length(a, b, limit):
+    length = 0
+    end_a = len(a)
+    end_b = len(b)
+    while length + BLOCK <= limit and a[end_a - length - BLOCK:end_a - length] == b[end_b - length - BLOCK:end_b - length]:
+        length += BLOCK
+    while length < limit and a[end_a - length - 1] == b[end_b - length - 1]:
+        length += 1
+    return length
+
+
+def main_prefix(class_node):
+    for method in class_node.methods:
+        if method.name == 'Main':
+            return f"{class_node.name}."
+    return ''
+
+
+class IncrementalTranslator:
+    # Хранит текст, дерево и JS последней удачной трансляции. Если правка
+    # целиком попала внутрь одного метода, заново разбирается только этот
+    # метод, перегенерируется только его класс, а JS остальных классов берётся
+    # из прошлого запуска.
+    # Участок метода - от его первого токена до первого токена следующего
+    # участка, поэтому пробелы и комментарии после метода тоже принадлежат ему.
+    def __init__(self, optimize=True, typed=True):
+        # optimize - пропускать дерево через optimizer.optimize, typed - размечать
+        # типы inference.annotate и генерировать по ним (как у translator.translate)
+        self.optimize = optimize
+        self.typed = typed
+        self.source = None
+        self.tree = None
+        self.code = ''
+        self.cache = {}
+        # JS верхнего уровня так, как его склеивают visit_Program/visit_Namespace:
+        # импорт, класс или пустой namespace на элемент, плюс префикс вызова Main
+        self.parts = []
+        self.main_prefixes = []
+        # необъявленные имена (semantic.Unresolved) каждого элемента parts
+        self.part_problems = []
+        # участки методов: смещения в тексте, класс, номер метода, элемент parts
+        self.starts = []
+        self.ends = []
+        self.owners = []
+        # сдвиг смещений участков после pending_segment, ещё не применённый к starts/ends
+        self.pending_segment = None
+        self.pending_delta = 0
+        self.full_runs = 0
+        self.patched_runs = 0
+
+    def update(self, source):
+        if self.tree is None or not self.patch(source):
+            self.rebuild(source)
+        return self.code
+
+    @property
+    def problems(self):
+        # Необъявленные имена последней удачной трансляции в порядке текста
+        return [problem for problems in self.part_problems for problem in problems]
+
+    def analyze(self, node):
+        # Разметка типов (если typed) и поиск необъявленных имён в одном элементе
+        # parts - по классу или объявлению верхнего уровня, как в translator.translate
+        if not self.typed:
+            return semantic.resolve(node)
+        problems = []
+        inference.annotate(node, problems)
+        return problems
+
+    def rebuild(self, source):
+        tokens = Lexer(source).tokenize_buffer()
+        tree = Parser(tokens).parse()
+        if self.optimize:
+            optimizer.optimize(tree)
+        cache = {}
+        parts = []
+        main_prefixes = []
+        part_problems = []
+        classes = []
+        for child in tree.items:
+            if child.type == 'Namespace' and child.classes:
+                for class_node in child.classes:
+                    classes.append((class_node, len(parts)))
+                    part_problems.append(self.analyze(class_node))
+                    parts.append(CodeGenerator(cache, self.typed).visit(class_node, 0))
+                    main_prefixes.append(main_prefix(class_node))
+            else:
+                part_problems.append(self.analyze(child))
+                parts.append(CodeGenerator(cache, self.typed).visit(child, 0))
+                main_prefixes.append('')
+
+        starts = []
+        ends = []
+        owners = []
+        token_starts = tokens.starts
+        spans = [span for namespace in scan_spans(tokens) for span in namespace.children]
+        for (class_node, part), class_span in zip(classes, spans):
+            for index, method_span in enumerate(class_span.children):
+                starts.append(token_starts[method_span.first])
+                following = method_span.last + 1
+                ends.append(token_starts[following] if following < len(tokens) else len(source))
+                owners.append((class_node, index, part))
+
+        self.source = source
+        self.tree = tree
+        self.cache = cache
+        self.parts = parts
+        self.main_prefixes = main_prefixes
+        self.part_problems = part_problems
+        self.starts = starts
+        self.ends = ends
+        self.owners = owners
+        self.pending_segment = None
+        self.pending_delta = 0
+        self.assemble()
+        self.full_runs += 1
+
+    def assemble(self):
+        code = '\n'.join(self.parts)
+        main = next(filter(None, self.main_prefixes), None)
+        if main is not None:
+            code += f'\n{main}Main()'
+        self.code = code
+
+    def apply_pending(self):
+        if self.pending_segment is not None:
+            delta = self.pending_delta
+            for following in range(self.pending_segment + 1, len(self.starts)):
+                self.starts[following] += delta
+                self.ends[following] += delta
+            self.pending_segment = None
+            self.pending_delta = 0
+
+    def patch(self, source):
+        old = self.source
+        if source == old:
+            return True
+        prefix = common_prefix_length(old, source)
+        suffix = common_suffix_length(old, source, min(len(old), len(source)) - prefix)
+        old_end = len(old) - suffix
+        new_end = len(source) - suffix
+
+        # набор текста в одном методе не трогает смещения остальных участков
+        segment = self.pending_segment
+        if segment is None or not self.starts[segment] <= prefix <= self.ends[segment]:
+            self.apply_pending()
+            segment = bisect_right(self.starts, prefix) - 1
+        if segment < 0 or old_end > self.ends[segment]:
+            return False
+        delta = new_end - old_end
+        end = self.ends[segment] + delta
+
+        # Лексер видит весь текст: токен или комментарий, выходящий за границу
+        # участка, означает, что правка затронула соседей
+        try:
+            lexer = Lexer(source)
+            tokens = lexer.tokenize_buffer(self.starts[segment], end)
+            if lexer.current_position != end:
+                return False
+            parser = Parser(tokens)
+            method = parser.method_declaration()
+        except (SyntaxError, ValueError):
+            return False
+        if parser.next_token() is not None:
+            return False
+        if self.optimize:
+            optimizer.optimize(method)
+
+        class_node, index, part = self.owners[segment]
+        self.cache.pop(class_node.methods[index], None)
+        class_node.methods[index] = method
+        # вызовы соседних методов проверяются только в области видимости класса,
+        # поэтому заново разбирается класс, а не один метод
+        self.part_problems[part] = self.analyze(class_node)
+        self.parts[part] = CodeGenerator(self.cache, self.typed).visit(class_node, 0)
+        self.main_prefixes[part] = main_prefix(class_node)
+
+        self.ends[segment] = end
+        self.pending_segment = segment
+        self.pending_delta += delta
+        self.source = source
+        self.assemble()
+        self.patched_runs += 1
+        return True
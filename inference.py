@@ -0,0 +1,63 @@
+from nodes import (
+    VariableDeclaration, Assignment, CompoundAssignment, BinaryOperation, UnaryOperation, Variable,
+)
+from semantic import resolve
+from instrumentation import instrumented
+
+# Вывод типов C# для выражений по объявленным типам переменных и параметров.
+# Генератор по ним выбирает JS, который считает так же, как C#: |0 и Math.imul
+# для int, Math.fround для float, const для переменных без повторных присваиваний.
+# Неизвестный тип - None, для таких выражений JS остаётся прежним.
+
+# Числовые типы в порядке неявного расширения
+NUMERIC_TYPES = {'int': 0, 'float': 1, 'double': 2}
+BOOL_OPERATORS = frozenset({'==', '!=', '<', '>', '<=', '>=', '&&', '||'})
+
+
+def binary_type(operator, left, right):
+    if operator in BOOL_OPERATORS:
+        return 'bool'
+    if operator == '+' and 'string' in (left, right):
+        return 'string'
+    if operator in ('&', '|'):
+        return left if left == right and left in ('int', 'bool') else None
+    if left in NUMERIC_TYPES and right in NUMERIC_TYPES:
+        return left if NUMERIC_TYPES[left] >= NUMERIC_TYPES[right] else right
+    return None
+
+
+def symbol_type(symbol):
+    # Тип есть только у переменных; имя метода или класса в выражении его не даёт
+    if symbol is not None and symbol.kind in ('parameter', 'local'):
+        return symbol.ctype
+    return None
+
+
+@instrumented('inference')
+def annotate(node, problems=None):
+    # node - Program, Namespace, Class или Method; дерево размечается на месте.
+    # Имена сначала связываются с символами (semantic.resolve), затем типы
+    # поднимаются от листьев к корню на явном стеке. Необъявленные имена
+    # (semantic.Unresolved), найденные по дороге, дописываются в problems.
+    unresolved = resolve(node)
+    if problems is not None:
+        problems.extend(unresolved)
+    stack = [(node, False)]
+    while stack:
+        current, visited = stack.pop()
+        cls = current.__class__
+        if visited:
+            if cls is BinaryOperation:
+                current.ctype = binary_type(current.operator, current.left.ctype, current.right.ctype)
+            else:
+                current.ctype = 'bool' if current.operator == '!' else current.operand.ctype
+            continue
+        if cls is Variable or cls is Assignment or cls is CompoundAssignment:
+            current.ctype = symbol_type(current.symbol)
+        elif cls is VariableDeclaration:
+            symbol = current.symbol
+            current.constant = current.initializer is not None and symbol is not None and not symbol.assignments
+        elif cls is BinaryOperation or cls is UnaryOperation:
+            stack.append((current, True))
+        stack.extend((child, False) for child in current.children)
+    return node
@@ -0,0 +1,312 @@
+import contextlib
+import functools
+import json
+import time
+import tracemalloc
+
+# Замеры по стадиям транслятора: время (настенное и процессорное), пик памяти
+# tracemalloc и счётчики (токены, узлы, символы JS, попадания в кэш).
+# Выключено по умолчанию; тогда обёрнутая стадия стоит одну проверку флага.
+# Каждая завершённая стадия попадает в metrics и передаётся функциям из hooks.
+# Metrics можно сливать (merge) - так пакетная трансляция собирает замеры
+# из процессов пула.
+# Стадии вкладываются друг в друга (parallel -> translate -> parser -> lexer),
+# поэтому у каждой есть полное время и собственное (self_*) - без вложенных
+# стадий. Складывать по стадиям можно только собственное время; у вложенной
+# стадии в выгрузке перечислены стадии, внутри которых она шла (parents).
+
+enabled = False
+trace_memory = False
+# функции hook(record), вызываются после каждой стадии
+hooks = []
+# стадии, которые выполняются сейчас (вложенные - в конце)
+active = []
+started_tracing = False
+
+
+class StageRecord:
+    __slots__ = ('name', 'wall', 'cpu', 'peak', 'counters', 'base', 'top',
+                 'started_wall', 'started_cpu', 'child_wall', 'child_cpu', 'parent')
+
+    def __init__(self, name):
+        self.name = name
+        self.wall = 0.0
+        self.cpu = 0.0
+        # начало текущего куска и время вложенных стадий
+        self.started_wall = 0.0
+        self.started_cpu = 0.0
+        self.child_wall = 0.0
+        self.child_cpu = 0.0
+        # имя стадии, внутри которой шла эта, или None
+        self.parent = None
+        # пик памяти сверх занятой на входе в стадию, байт (0 без trace_memory)
+        self.peak = 0
+        self.counters = {}
+        # абсолютные значения tracemalloc: на входе и наибольшее за стадию
+        self.base = 0
+        self.top = 0
+
+    def add(self, counter, value=1):
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def __repr__(self):
+        return f"StageRecord({self.name}, {self.wall:.6f}, {self.cpu:.6f}, {self.peak}, {self.counters})"
+
+
+class StageTotals:
+    __slots__ = ('calls', 'wall', 'cpu', 'self_wall', 'self_cpu', 'peak', 'counters', 'parents')
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.self_wall = 0.0
+        self.self_cpu = 0.0
+        self.peak = 0
+        self.counters = {}
+        self.parents = set()
+
+    def add_counters(self, counters):
+        for counter, value in counters.items():
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+
+class Metrics:
+    # Суммы по стадиям: вызовы, время, наибольший пик памяти, счётчики
+    def __init__(self):
+        self.stages = {}
+
+    def totals(self, name):
+        totals = self.stages.get(name)
+        if totals is None:
+            totals = self.stages[name] = StageTotals()
+        return totals
+
+    def add(self, record):
+        totals = self.totals(record.name)
+        totals.calls += 1
+        totals.wall += record.wall
+        totals.cpu += record.cpu
+        totals.self_wall += record.wall - record.child_wall
+        totals.self_cpu += record.cpu - record.child_cpu
+        totals.peak = max(totals.peak, record.peak)
+        totals.add_counters(record.counters)
+        if record.parent is not None:
+            totals.parents.add(record.parent)
+
+    def merge(self, other):
+        for name, source in other.stages.items():
+            totals = self.totals(name)
+            totals.calls += source.calls
+            totals.wall += source.wall
+            totals.cpu += source.cpu
+            totals.self_wall += source.self_wall
+            totals.self_cpu += source.self_cpu
+            totals.peak = max(totals.peak, source.peak)
+            totals.add_counters(source.counters)
+            totals.parents |= source.parents
+
+    def clear(self):
+        self.stages = {}
+
+    def to_json_lines(self):
+        lines = []
+        for name, totals in self.stages.items():
+            line = {
+                'stage': name,
+                'calls': totals.calls,
+                'wall_seconds': totals.wall,
+                'cpu_seconds': totals.cpu,
+                'self_wall_seconds': totals.self_wall,
+                'self_cpu_seconds': totals.self_cpu,
+                'peak_bytes': totals.peak,
+                'counters': totals.counters,
+                'parents': sorted(totals.parents),
+            }
+            lookups = totals.counters.get('hits', 0) + totals.counters.get('misses', 0)
+            if lookups:
+                line['hit_rate'] = totals.counters.get('hits', 0) / lookups
+            lines.append(json.dumps(line, ensure_ascii=False) + '\n')
+        return ''.join(lines)
+
+    def to_prometheus(self, prefix='translator'):
+        # Текстовый формат Prometheus; время и вызовы - counter, пик памяти - gauge
+        series = (
+            ('stage_calls_total', 'counter', 'Вызовы стадии', lambda totals: totals.calls),
+            ('stage_wall_seconds_total', 'counter', 'Настенное время стадии', lambda totals: totals.wall),
+            ('stage_cpu_seconds_total', 'counter', 'Процессорное время стадии', lambda totals: totals.cpu),
+            ('stage_self_wall_seconds_total', 'counter', 'Настенное время стадии без вложенных стадий',
+             lambda totals: totals.self_wall),
+            ('stage_self_cpu_seconds_total', 'counter', 'Процессорное время стадии без вложенных стадий',
+             lambda totals: totals.self_cpu),
+            ('stage_peak_bytes', 'gauge', 'Наибольший пик памяти стадии (tracemalloc)', lambda totals: totals.peak),
+        )
+        lines = []
+        for metric, kind, help_text, value in series:
+            lines.append(f'# HELP {prefix}_{metric} {help_text}\n')
+            lines.append(f'# TYPE {prefix}_{metric} {kind}\n')
+            for name, totals in self.stages.items():
+                lines.append(f'{prefix}_{metric}{{stage="{name}"}} {value(totals)}\n')
+        lines.append(f'# HELP {prefix}_stage_events_total Счётчики стадии (токены, узлы, символы, попадания в кэш)\n')
+        lines.append(f'# TYPE {prefix}_stage_events_total counter\n')
+        for name, totals in self.stages.items():
+            for counter, value in totals.counters.items():
+                lines.append(f'{prefix}_stage_events_total{{stage="{name}",counter="{counter}"}} {value}\n')
+        return ''.join(lines)
+
+
+metrics = Metrics()
+
+
+def enable(memory=False):
+    # memory - мерить пик памяти через tracemalloc (замедляет работу в разы)
+    global enabled, trace_memory, started_tracing
+    enabled = True
+    trace_memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        started_tracing = True
+
+
+def disable():
+    global enabled, trace_memory, started_tracing
+    enabled = False
+    trace_memory = False
+    if started_tracing:
+        tracemalloc.stop()
+        started_tracing = False
+
+
+def begin(name):
+    record = StageRecord(name)
+    if trace_memory:
+        current, peak = tracemalloc.get_traced_memory()
+        # сброс пика ниже затрёт пик внешней стадии: он сохраняется заранее
+        if active:
+            parent = active[-1]
+            parent.top = max(parent.top, peak)
+        tracemalloc.reset_peak()
+        record.base = record.top = current
+    resume(record)
+    return record
+
+
+def end(record):
+    pause(record)
+    if trace_memory:
+        record.top = max(record.top, tracemalloc.get_traced_memory()[1])
+        record.peak = record.top - record.base
+        if active:
+            parent = active[-1]
+            parent.top = max(parent.top, record.top)
+
+
+def part(name):
+    # Стадия, которая идёт кусками вперемешку с другими (при потоковой
+    # трансляции лексер, парсер и генератор): каждый кусок - resume/pause,
+    # запись публикуется (publish) один раз после последнего куска.
+    # Пик памяти у таких стадий не меряется.
+    return StageRecord(name)
+
+
+def resume(record):
+    if active:
+        record.parent = active[-1].name
+    active.append(record)
+    record.started_wall = time.perf_counter()
+    record.started_cpu = time.process_time()
+
+
+def pause(record):
+    cpu = time.process_time() - record.started_cpu
+    wall = time.perf_counter() - record.started_wall
+    record.cpu += cpu
+    record.wall += wall
+    active.pop()
+    if active:
+        parent = active[-1]
+        parent.child_wall += wall
+        parent.child_cpu += cpu
+
+
+def publish(record):
+    metrics.add(record)
+    for hook in hooks:
+        hook(record)
+
+
+def count(counter, value=1):
+    # Счётчик текущей стадии (например, попадания в кэш внутри translate)
+    if active:
+        active[-1].add(counter, value)
+
+
+@contextlib.contextmanager
+def stage(name):
+    # with stage('имя') as record: ... - замер произвольного участка кода;
+    # record - None, когда замеры выключены
+    if not enabled:
+        yield None
+        return
+    record = begin(name)
+    try:
+        yield record
+    except BaseException:
+        end(record)
+        record.add('errors')
+        publish(record)
+        raise
+    end(record)
+    publish(record)
+
+
+def instrumented(name, counters=None):
+    # Декоратор стадии. counters(record, result) дописывает счётчики по
+    # результату; вызывается после остановки часов, чтобы подсчёт не
+    # попадал во время стадии.
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            record = begin(name)
+            try:
+                result = function(*args, **kwargs)
+            except BaseException:
+                end(record)
+                record.add('errors')
+                publish(record)
+                raise
+            end(record)
+            if counters is not None:
+                counters(record, result)
+            publish(record)
+            return result
+        return wrapper
+    return decorator
+
+
+def count_tokens(record, tokens):
+    record.add('tokens', len(tokens))
+
+
+def count_nodes(record, tree):
+    # Отложенные тела методов (Parser(lazy=True)) не разбираются ради подсчёта
+    nodes = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        nodes += 1
+        if getattr(node, 'lazy_body', None) is None:
+            stack.extend(node.children)
+    record.add('nodes', nodes)
+
+
+def count_unresolved(record, unresolved):
+    record.add('unresolved', len(unresolved))
+
+
+def count_output(record, code):
+    # генерация в файл возвращает None - тогда размер неизвестен
+    if isinstance(code, str):
+        record.add('output_chars', len(code))
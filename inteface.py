@@ -1,55 +1,109 @@
-from tkinter import *
-import sys
-import argparse
-from lexer import Lexer
-from parser import Parser
-from generator import CodeGenerator
+import multiprocessing
+from incremental import IncrementalTranslator
+import profiler
+import cli
+
+# Пауза после последнего нажатия перед запуском трансляции и период опроса результатов (~60 кадров/с)
+DEBOUNCE_MS = 150
+POLL_MS = 16
+# Сколько необъявленных имён перечислять в строке состояния
+SHOWN_PROBLEMS = 3
+
+def describeProblems(problems):
+    if not problems:
+        return 'ОК'
+    shown = '; '.join(str(problem) for problem in problems[:SHOWN_PROBLEMS])
+    more = f' и ещё {len(problems) - SHOWN_PROBLEMS}' if len(problems) > SHOWN_PROBLEMS else ''
+    return f'ОК, предупреждения: {shown}{more}'
+
+def translate(translator, code):
+    # js_code - None, если трансляция не удалась
+    js_code = None
 
-def onChangeText(var, index, mode):
-    code = sv.get()
-
-    if text1.compare("end-1c", "==", "1.0"):   
-        label3['text'] = 'Ожидание ввода...'
-        return
-
-    errorMessage = 'ОК'
-    js_code = ''
-
-    lexer = Lexer(code)
     try:
-        tokens = lexer.tokenize()
+        js_code = translator.update(code)
+        errorMessage = describeProblems(translator.problems)
     except ValueError as e:
         errorMessage = f"Лексическая ошибка: {e}"
     except Exception as e:
-        errorMessage = e
-
-    text2.delete(1.0, END)
-    label3['text'] = errorMessage
-    if (errorMessage != 'ОК'): return
-
-    parser_obj = Parser(tokens)
+        errorMessage = str(e)
+
+    return js_code, errorMessage
+
+def worker(connection):
+    # Отдельный процесс: трансляция и сборка мусора не останавливают цикл Tk.
+    # Состояние IncrementalTranslator живёт здесь между заданиями.
+    translator = IncrementalTranslator()
+    while True:
+        generation, code = connection.recv()
+        js_code, errorMessage = translate(translator, code)
+        connection.send((generation, js_code, errorMessage))
+
+def startWorker():
+    # Процесс трансляции; запускается заново, если умер (убит, кончилась память)
+    global connection, workerProcess, busy
+    connection, workerConnection = multiprocessing.Pipe()
+    workerProcess = multiprocessing.Process(target=worker, args=(workerConnection,), daemon=True)
+    workerProcess.start()
+    # своя копия конца процесса закрывается, чтобы его смерть давала EOF в connection
+    workerConnection.close()
+    busy = False
+
+def dispatchJob():
+    # В работе не больше одного задания; пока оно идёт, новые правки
+    # заменяют друг друга в pendingJob, и в процесс уходит только последняя
+    global pendingJob, busy
+    if not busy and pendingJob is not None:
+        connection.send(pendingJob)
+        pendingJob = None
+        busy = True
+
+def submit(generation, code):
+    global pendingJob, debounceId
+    debounceId = None
+    pendingJob = (generation, code)
+    dispatchJob()
+
+def pollResults():
+    # Результаты забираются в главном потоке Tk; устаревшие (текст уже изменён) отбрасываются
+    global busy
     try:
-        ast = parser_obj.parse()
-        if ast is None:
-            errorMessage = "Синтаксический анализ завершился с ошибками."
-    except Exception as e:
-        errorMessage = e
+        while connection.poll():
+            generation, js_code, errorMessage = connection.recv()
+            busy = False
+            if generation != currentGeneration:
+                continue
+            text2.delete(1.0, END)
+            label3['text'] = errorMessage
+            if js_code is not None:
+                text2.insert(END, js_code)
+    except (EOFError, OSError):
+        pass
+    if not workerProcess.is_alive():
+        # Задание, на котором процесс умер, не повторяется (иначе он умрёт снова);
+        # следующая правка уйдёт уже в новый процесс
+        exitCode = workerProcess.exitcode
+        lostJob = busy
+        startWorker()
+        if lostJob:
+            label3['text'] = f'Процесс трансляции завершился (код {exitCode}) и перезапущен'
+    dispatchJob()
+    root.after(POLL_MS, pollResults)
 
-    text2.delete(1.0, END)
-    label3['text'] = errorMessage
-    if (errorMessage != 'ОК'): return
-
-    generator = CodeGenerator()
-    try:
-        js_code = generator.generate(ast)
-    except Exception as e:
-        errorMessage = e
+def onChangeText(var, index, mode):
+    global currentGeneration, debounceId
+    code = sv.get()
+    currentGeneration += 1
+    if debounceId is not None:
+        root.after_cancel(debounceId)
+        debounceId = None
 
-    text2.delete(1.0, END)
-    label3['text'] = errorMessage
-    if (errorMessage != 'ОК'): return
+    if text1.compare("end-1c", "==", "1.0"):
+        label3['text'] = 'Ожидание ввода...'
+        return
 
-    text2.insert(END, js_code)
+    label3['text'] = 'Трансляция...'
+    debounceId = root.after(DEBOUNCE_MS, submit, currentGeneration, code)
 
 def typingText(event):
     sv.set(text1.get(1.0, END))
@@ -63,31 +117,46 @@ def copyText():
     root.clipboard_clear()
     root.clipboard_append(text2.get(1.0, END))
 
-root = Tk()
+if __name__ == '__main__':
+    args = cli.parseArguments()
+    if args.command is not None:
+        cli.run(args)
+    profiler.from_environment()
+
+    # tkinter нужен только окну: команды cli.run работают и без Tk
+    from tkinter import *
+
+    startWorker()
+    currentGeneration = 0
+    debounceId = None
+    pendingJob = None
+
+    root = Tk()
 
-sv = StringVar()
-sv.trace_add('write', onChangeText)
+    sv = StringVar()
+    sv.trace_add('write', onChangeText)
 
-label1 = Label(text="C#")
-label1.grid(row=0, column=0, sticky=W, padx=10, pady=4)
+    label1 = Label(text="C#")
+    label1.grid(row=0, column=0, sticky=W, padx=10, pady=4)
 
-button1 = Button(text='Paste', width=10, command=pasteText)
-button1.grid(row=0, column=1, sticky=E, padx=2)
+    button1 = Button(text='Paste', width=10, command=pasteText)
+    button1.grid(row=0, column=1, sticky=E, padx=2)
 
-text1 = Text(width=60, height=30)
-text1.bind('<KeyRelease>', typingText)
-text1.grid(row=1, column=0, columnspan=2, padx=2)
+    text1 = Text(width=60, height=30)
+    text1.bind('<KeyRelease>', typingText)
+    text1.grid(row=1, column=0, columnspan=2, padx=2)
 
-label2 = Label(text="JavaScript")
-label2.grid(row=0, column=2, sticky=W, padx=10, pady=4)
+    label2 = Label(text="JavaScript")
+    label2.grid(row=0, column=2, sticky=W, padx=10, pady=4)
 
-button2 = Button(text='Copy', width=10, command=copyText)
-button2.grid(row=0, column=3, sticky=E, padx=2)
+    button2 = Button(text='Copy', width=10, command=copyText)
+    button2.grid(row=0, column=3, sticky=E, padx=2)
 
-text2 = Text(width=60, height=30)
-text2.grid(row=1, column=2, columnspan=2, padx=2)
+    text2 = Text(width=60, height=30)
+    text2.grid(row=1, column=2, columnspan=2, padx=2)
 
-label3 = Label(text='Ожидание ввода...')
-label3.grid(row=2, column=0, columnspan=4, sticky=W, pady=4)
+    label3 = Label(text='Ожидание ввода...')
+    label3.grid(row=2, column=0, columnspan=4, sticky=W, pady=4)
 
-root.mainloop()
+    root.after(POLL_MS, pollResults)
+    root.mainloop()
@@ -1,59 +1,277 @@
+import codecs
 import re
+import sys
+from array import array
+from enum import IntEnum
+from itertools import islice
+
+from instrumentation import instrumented, count_tokens
+
+
+# Типы токенов - малые целые: парсер сравнивает их вместо строк
+class TokenKind(IntEnum):
+    OUTPUT = 0
+    NUMBER = 1
+    STRING = 2
+    CHAR = 3
+    ID = 4
+    KEYWORD = 5
+    TYPE = 6
+    OP = 7
+    DELIM = 8
+    MISMATCH = 9
+
+    def __str__(self):
+        return self.name
+
+    __format__ = object.__format__
+
+
+TOKEN_KINDS = tuple(TokenKind)
+TOKEN_TYPES = tuple(kind.name for kind in TokenKind)
+TOKEN_CODES = {kind.name: kind for kind in TokenKind}
+
+# Значения этих типов берутся из конечного набора лексем и интернируются
+INTERNED_KINDS = frozenset({TokenKind.KEYWORD, TokenKind.TYPE, TokenKind.OP, TokenKind.DELIM})
+
 
 class Token:
-    def __init__(self, type, value):
-        self.type = type
+    __slots__ = ('kind', 'value')
+
+    def __init__(self, kind, value):
+        # kind - TokenKind или имя типа
+        self.kind = kind if isinstance(kind, TokenKind) else TokenKind[kind]
         self.value = value
 
+    @property
+    def type(self):
+        return TOKEN_TYPES[self.kind]
+
     def __repr__(self):
         return f"Token({self.type}, '{self.value}')"
 
 
 class Lexer:
-    def __init__(self, code):
+    keywords = {'public', 'private', 'static', 'return', 'if', 'else', 'do', 'while', 'for', 'using', 'namespace', 'true', 'false'}
+    types = {'class', 'int', 'float', 'double', 'string', 'char', 'bool', 'void'}
+
+    # Определение токенов и их регулярных выражений
+    token_specification = [
+        ('OUTPUT', r'Console.WriteLine|Console.Write'),
+        ('NUMBER', r'\d+(\.\d+)?(f)?'),            # Числа (целые и с плавающей точкой)
+        ('STRING', r'"(\\.|[^"\\])*"'),        # Строки с поддержкой escape-последовательностей
+        ('CHAR', r"'(\\.|[^'\\])'"),           # Символы с поддержкой escape-последовательностей
+        ('ID', r'[A-Za-z_][A-Za-z0-9_]*'),     # Идентификаторы и ключевые слова
+        ('COMMENT', r'//.*|/\*[\s\S]*?\*/'),   # Комментарии (до OP, иначе '/' съедается как оператор)
+        ('OP', r'(\+=|-=|\*=|/=|%=|==|!=|<=|>=|&&|\|\||[+\-*/%<>=!&|\.])'),    # Операторы, включая точку
+        ('DELIM', r'[;,\(\)\{\}]'),            # Разделители
+        ('SKIP', r'[ \t]+'),                   # Пробелы и табуляции
+        ('NEWLINE', r'\n'),                    # Новая строка
+        ('MISMATCH', r'.'),                    # Любой другой символ
+    ]
+
+    # Единое регулярное выражение с именованными группами, компилируется один раз.
+    # Альтернативы перебираются слева направо, как и отдельные шаблоны раньше.
+    master_pattern = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, pattern in token_specification))
+
+    # Сколько символов после начала токена нужно видеть, чтобы выбор альтернативы
+    # не зависел от границы блока ('Console.WriteLine', '12.5f' и т.п.)
+    lookahead = 32
+
+    def __init__(self, code, chunk_size=1 << 16, encoding='utf-8'):
+        # code - строка, текстовый/бинарный файл или mmap
         self.code = code
+        self.chunk_size = chunk_size
+        self.encoding = encoding
         self.tokens = []
         self.current_position = 0
-        self.keywords = {'public', 'private', 'static', 'return', 'if', 'else', 'do', 'while', 'for', 'using', 'namespace', 'true', 'false'}
-        self.types = {'class', 'int', 'float', 'double', 'string', 'char', 'bool', 'void'}
-
-        # Определение токенов и их регулярных выражений
-        self.token_specification = [
-            ('OUTPUT', r'Console.WriteLine|Console.Write'),
-            ('NUMBER', r'\d+(\.\d+)?(f)?'),            # Числа (целые и с плавающей точкой)
-            ('STRING', r'"(\\.|[^"\\])*"'),        # Строки с поддержкой escape-последовательностей
-            ('CHAR', r"'(\\.|[^'\\])'"),           # Символы с поддержкой escape-последовательностей
-            ('ID', r'[A-Za-z_][A-Za-z0-9_]*'),     # Идентификаторы и ключевые слова
-            ('OP', r'(\+=|-=|\*=|/=|%=|==|!=|<=|>=|&&|\|\||[+\-*/%<>=!&|\.])'),    # Операторы, включая точку
-            ('DELIM', r'[;,\(\)\{\}]'),            # Разделители
-            ('SKIP', r'[ \t]+'),                   # Пробелы и табуляции
-            ('COMMENT', r'//.*|/\*[\s\S]*?\*/'),   # Комментарии
-            ('NEWLINE', r'\n'),                    # Новая строка
-            ('MISMATCH', r'.'),                    # Любой другой символ
-        ]
 
+    @instrumented('lexer', count_tokens)
     def tokenize(self):
-        while self.current_position < len(self.code):
-            match = None
-            for token_type, pattern in self.token_specification:
-                regex = re.compile(pattern)
-                match = regex.match(self.code, self.current_position)
-                if match:
-                    value = match.group(0)
-                    if token_type == 'ID':
-                        if value in self.keywords:
-                            self.tokens.append(Token('KEYWORD', value))
-                        elif value in self.types:
-                            self.tokens.append(Token('TYPE', value))
-                        else:
-                            self.tokens.append(Token('ID', value))
-                    elif token_type == 'NEWLINE':
-                        pass  # Игнорируем новые строки
-                    elif token_type != 'SKIP' and token_type != 'COMMENT':  # Пропускаем пробелы и комментарии
-                        self.tokens.append(Token(token_type, value))
+        self.tokens.extend(self.iter_tokens())
+        return self.tokens
+
+    def iter_tokens(self):
+        keywords = self.keywords
+        types = self.types
+        intern = sys.intern
+        kinds = TOKEN_CODES
+        keyword_kind = TokenKind.KEYWORD
+        type_kind = TokenKind.TYPE
+        id_kind = TokenKind.ID
+        lookahead = self.lookahead
+        match = self.master_pattern.match
+        buffer = ''
+        position = 0
+        for chunk, final in self.read_chunks():
+            buffer = buffer[position:] + chunk
+            self.current_position += position
+            position = 0
+            end = len(buffer)
+            while position < end:
+                m = match(buffer, position)
+                if m is None:
+                    raise ValueError(f"Неожиданный символ: {buffer[position]}")
+                token_type = m.lastgroup
+                if not final and self.needs_more(buffer, position, m, token_type, end - lookahead):
                     break
-            if match:
-                self.current_position = match.end(0)  # Переход к следующему символу
+                if token_type == 'ID':
+                    value = m.group()
+                    if value in keywords:
+                        yield Token(keyword_kind, intern(value))
+                    elif value in types:
+                        yield Token(type_kind, intern(value))
+                    else:
+                        yield Token(id_kind, value)
+                elif token_type == 'OP' or token_type == 'DELIM':
+                    yield Token(kinds[token_type], intern(m.group()))
+                elif token_type != 'SKIP' and token_type != 'NEWLINE' and token_type != 'COMMENT':  # Пропускаем пробелы, переводы строк и комментарии
+                    yield Token(kinds[token_type], m.group())
+                position = m.end()
+        self.current_position += position
+
+    @instrumented('lexer', count_tokens)
+    def tokenize_buffer(self, start=0, end=None):
+        # Компактный вариант tokenize(): коды типов и смещения в исходном тексте.
+        # start/end ограничивают участок; последний токен может выйти за end,
+        # тогда current_position окажется больше end.
+        code = self.code
+        if not isinstance(code, str):
+            code = ''.join(chunk for chunk, _ in self.read_chunks())
+        buffer = TokenBuffer(code)
+        kinds = buffer.kinds
+        starts = buffer.starts
+        ends = buffer.ends
+        keyword_code = TokenKind.KEYWORD
+        type_code = TokenKind.TYPE
+        id_code = TokenKind.ID
+        skipped = {'SKIP', 'NEWLINE', 'COMMENT'}
+        keywords = self.keywords
+        types = self.types
+        match = self.master_pattern.match
+        position = start
+        if end is None:
+            end = len(code)
+        while position < end:
+            m = match(code, position)
+            if m is None:
+                raise ValueError(f"Неожиданный символ: {code[position]}")
+            token_type = m.lastgroup
+            token_end = m.end()
+            if token_type == 'ID':
+                value = m.group()
+                kinds.append(keyword_code if value in keywords else type_code if value in types else id_code)
+            elif token_type in skipped:
+                position = token_end
+                continue
             else:
-                raise ValueError(f"Неожиданный символ: {self.code[self.current_position]}")
-        return self.tokens
+                kinds.append(TOKEN_CODES[token_type])
+            starts.append(position)
+            ends.append(token_end)
+            position = token_end
+        self.current_position = position
+        return buffer
+
+    @staticmethod
+    def needs_more(buffer, position, match, token_type, limit):
+        # Токен может продолжаться в следующем блоке: близко к концу буфера
+        # или незакрытые строка/символ/многострочный комментарий
+        if position > limit or match.end() > limit:
+            return True
+        first = buffer[position]
+        if first == '"':
+            return token_type != 'STRING'
+        if first == "'":
+            return token_type != 'CHAR'
+        if first == '/' and buffer.startswith('/*', position):
+            return token_type != 'COMMENT'
+        return False
+
+    def read_chunks(self):
+        # Пары (текст, последний ли блок); строка отдаётся целиком без копирования
+        if isinstance(self.code, str):
+            yield self.code, True
+            return
+        decoder = None
+        while True:
+            data = self.code.read(self.chunk_size)
+            if isinstance(data, (bytes, bytearray)):
+                if decoder is None:
+                    decoder = codecs.getincrementaldecoder(self.encoding)()
+                text = decoder.decode(data, final=not data)
+            else:
+                text = data
+            if not data:
+                yield text, True
+                return
+            yield text, False
+
+
+class TokenStream:
+    # Последовательность токенов, которая читает итератор по мере обращения
+    # и отбрасывает давно пройденные токены, так что память не растёт с размером входа
+    def __init__(self, iterator, window=4096):
+        self.iterator = iter(iterator)
+        self.window = window
+        self.buffer = []
+        self.offset = 0
+
+    def __getitem__(self, index):
+        position = index - self.offset
+        buffer = self.buffer
+        if position >= len(buffer):
+            if position < 0:
+                raise IndexError(f"Токен {index} уже освобождён")
+            # догружается пачкой, чтобы не звать итератор на каждое обращение
+            if position >= 2 * self.window:
+                del buffer[:position - self.window]
+                self.offset += position - self.window
+                position = self.window
+            buffer.extend(islice(self.iterator, position - len(buffer) + self.window))
+            if position >= len(buffer):
+                raise IndexError(index)
+        elif position < 0:
+            raise IndexError(f"Токен {index} уже освобождён")
+        return buffer[position]
+
+
+class TokenBuffer:
+    # Токены в виде трёх массивов (тип, начало, конец) поверх исходного текста.
+    # Значение вырезается из текста только при обращении к токену.
+    def __init__(self, source):
+        self.source = source
+        offset_type = 'I' if len(source) < 1 << 32 else 'Q'
+        self.kinds = array('B')
+        self.starts = array(offset_type)
+        self.ends = array(offset_type)
+        self.cached_index = -1
+        self.cached_token = None
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        # Парсер много раз подряд спрашивает один и тот же токен
+        if index == self.cached_index:
+            return self.cached_token
+        kind = TOKEN_KINDS[self.kinds[index]]
+        value = self.source[self.starts[index]:self.ends[index]]
+        token = Token(kind, sys.intern(value) if kind in INTERNED_KINDS else value)
+        self.cached_index = index
+        self.cached_token = token
+        return token
+
+    def extend(self, other):
+        # Дописывает токены другого буфера над тем же текстом
+        self.kinds.extend(other.kinds)
+        self.starts.extend(other.starts)
+        self.ends.extend(other.ends)
+
+    def type_at(self, index):
+        return TOKEN_KINDS[self.kinds[index]]
+
+    def value_at(self, index):
+        return self.source[self.starts[index]:self.ends[index]]
+
+    def span(self, index):
+        return self.starts[index], self.ends[index]
@@ -1,7 +1,15 @@
+import sys
 from lexer import Lexer
-from parser111 import Parser
-from parser111 import Node
+from parser import Parser
+from parser import Node
 from generator import CodeGenerator
+from translator import translate
+from semantic import resolve
+from dump import dump_text
+import profiler
+
+# TRANSLATOR_PROFILE=файл - профиль правил грамматики и обработчиков генератора
+profiler.from_environment()
 
 code = """
 using System;
@@ -28,22 +36,39 @@ namespace Hello {
 }
 """
 
+# --verbose: печатать все токены и repr дерева (на больших входах это
+# мегабайты вывода, поэтому по умолчанию выключено)
+verbose = '--verbose' in sys.argv[1:]
+arguments = [argument for argument in sys.argv[1:] if argument != '--verbose']
+
+if arguments:
+    # Файл транслируется конвейером: текст читается блоками, а JS каждого
+    # класса печатается сразу после его разбора
+    with open(arguments[0], encoding='utf-8') as source:
+        translate(source, sys.stdout)
+    print()
+    sys.exit()
+
 # Лексический анализ
 lexer = Lexer(code)
 tokens = lexer.tokenize()
-i = 0
-for token in tokens:
-    print(i, token)
-    i += 1
+if verbose:
+    for i, token in enumerate(tokens):
+        print(i, token)
 
 # Ситаксический анализ
 parser = Parser(tokens)
 result = parser.parse()
-print(result)
-print(type(result))
-# Получаем текстовое представление дерева
-tree_representation = result.print_tree()
-print(tree_representation)
+
+# Семантический анализ: имена, которые нигде не объявлены
+for problem in resolve(result):
+    print(problem)
+if verbose:
+    print(result)
+    print(type(result))
+# Текстовое представление дерева пишется в stdout по мере обхода
+dump_text(result, sys.stdout)
+print()
 
 
 # генератор кода
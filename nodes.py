@@ -0,0 +1,402 @@
+# Узлы AST. У каждого вида узла свой класс со __slots__ и именованными полями;
+# свойства children и value воспроизводят прежний общий Node(type, children, value),
+# поэтому print_tree, repr и обход по children работают как раньше.
+
+
+class Node:
+    __slots__ = ()
+    type = None
+    value = None
+    children = ()
+    # Тип C# выражения ('int', 'float', ...), проставляется проходом inference.annotate
+    ctype = None
+
+    def __repr__(self):
+        # Строится без рекурсии, чтобы не упираться в глубину вложенности
+        parts = []
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                parts.append(item)
+                continue
+            parts.append(f"Node({item.type}, {item.value}, [")
+            stack.append("])")
+            children = item.children
+            for index in range(len(children) - 1, -1, -1):
+                stack.append(children[index])
+                if index:
+                    stack.append(", ")
+        return ''.join(parts)
+
+    def print_tree(self, level=0):
+        lines = []
+        stack = [(self, level)]
+        while stack:
+            node, depth = stack.pop()
+            lines.append(f"{'  ' * depth}Node({node.type}, {node.value})\n")
+            stack.extend((child, depth + 1) for child in reversed(node.children))
+        return ''.join(lines)
+
+
+class Program(Node):
+    __slots__ = ('items',)
+    type = 'Program'
+
+    def __init__(self, items):
+        self.items = items
+
+    @property
+    def children(self):
+        return self.items
+
+
+class LibraryImport(Node):
+    __slots__ = ('name',)
+    type = 'LibraryImport'
+
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def value(self):
+        return self.name
+
+
+class Namespace(Node):
+    __slots__ = ('name', 'classes')
+    type = 'Namespace'
+
+    def __init__(self, name, classes):
+        self.name = name
+        self.classes = classes
+
+    @property
+    def value(self):
+        return self.name
+
+    @property
+    def children(self):
+        return self.classes
+
+
+class Class(Node):
+    __slots__ = ('name', 'modifiers', 'methods')
+    type = 'Class'
+
+    def __init__(self, name, modifiers, methods):
+        self.name = name
+        self.modifiers = modifiers
+        self.methods = methods
+
+    @property
+    def value(self):
+        return {"name": self.name, "modifiers": self.modifiers}
+
+    @property
+    def children(self):
+        return self.methods
+
+
+class Method(Node):
+    __slots__ = ('name', 'modifiers', 'parameters', 'return_type', 'statements', 'parameter_types', 'lazy_body')
+    type = 'Method'
+
+    def __init__(self, name, modifiers, parameters, return_type, body, parameter_types=None):
+        # body - список операторов или отложенное тело (parser.LazyBody),
+        # которое разбирается при первом обращении к body
+        self.name = name
+        self.modifiers = modifiers
+        self.parameters = parameters
+        self.return_type = return_type
+        self.parameter_types = parameter_types if parameter_types is not None else [None] * len(parameters)
+        self.body = body
+
+    @property
+    def body(self):
+        if self.lazy_body is not None:
+            self.statements = self.lazy_body.parse()
+            self.lazy_body = None
+        return self.statements
+
+    @body.setter
+    def body(self, body):
+        if isinstance(body, list):
+            self.statements = body
+            self.lazy_body = None
+        else:
+            self.statements = None
+            self.lazy_body = body
+
+    @property
+    def value(self):
+        return {"name": self.name, "modifiers": self.modifiers, "parameters": self.parameters, "return_type": self.return_type}
+
+    @property
+    def children(self):
+        return self.body
+
+
+class VariableDeclaration(Node):
+    __slots__ = ('var_type', 'name', 'initializer', 'constant', 'symbol')
+    type = 'VariableDeclaration'
+
+    def __init__(self, var_type, name, initializer=None):
+        self.var_type = var_type
+        self.name = name
+        self.initializer = initializer
+        # переменной больше ничего не присваивается (проставляет inference.annotate)
+        self.constant = False
+        # semantic.Symbol объявленной переменной (проставляет semantic.resolve)
+        self.symbol = None
+
+    @property
+    def value(self):
+        return {"type": self.var_type, "name": self.name}
+
+    @property
+    def children(self):
+        return [self.initializer] if self.initializer is not None else []
+
+
+class Assignment(Node):
+    __slots__ = ('variable', 'expression', 'ctype', 'symbol')
+    type = 'Assignment'
+
+    def __init__(self, variable, expression):
+        self.variable = variable
+        self.expression = expression
+        # тип переменной и её semantic.Symbol
+        self.ctype = None
+        self.symbol = None
+
+    @property
+    def value(self):
+        return {"variable": self.variable}
+
+    @property
+    def children(self):
+        return [self.expression]
+
+
+class CompoundAssignment(Node):
+    __slots__ = ('variable', 'operator', 'expression', 'ctype', 'symbol')
+    type = 'CompoundAssignment'
+
+    def __init__(self, variable, operator, expression):
+        self.variable = variable
+        self.operator = operator
+        self.expression = expression
+        # тип переменной и её semantic.Symbol
+        self.ctype = None
+        self.symbol = None
+
+    @property
+    def value(self):
+        return {"variable": self.variable, "operator": self.operator}
+
+    @property
+    def children(self):
+        return [self.expression]
+
+
+class ExpressionStatement(Node):
+    __slots__ = ('expression',)
+    type = 'ExpressionStatement'
+
+    def __init__(self, expression):
+        self.expression = expression
+
+    @property
+    def children(self):
+        return [self.expression]
+
+
+class Output(Node):
+    __slots__ = ('expression',)
+    type = 'Output'
+
+    def __init__(self, expression):
+        self.expression = expression
+
+    @property
+    def children(self):
+        return [self.expression]
+
+
+class Return(Node):
+    __slots__ = ('expression',)
+    type = 'Return'
+
+    def __init__(self, expression=None):
+        self.expression = expression
+
+    @property
+    def children(self):
+        return [self.expression] if self.expression is not None else []
+
+
+class Block(Node):
+    __slots__ = ('statements',)
+    type = 'Block'
+
+    def __init__(self, statements):
+        self.statements = statements
+
+    @property
+    def children(self):
+        return self.statements
+
+
+class ElseBlock(Block):
+    __slots__ = ()
+    type = 'ElseBlock'
+
+
+class If(Node):
+    __slots__ = ('condition', 'then_block', 'else_block')
+    type = 'If'
+
+    def __init__(self, condition, then_block, else_block=None):
+        self.condition = condition
+        self.then_block = then_block
+        self.else_block = else_block
+
+    @property
+    def children(self):
+        if self.else_block is None:
+            return [self.condition, self.then_block]
+        return [self.condition, self.then_block, self.else_block]
+
+
+class While(Node):
+    __slots__ = ('condition', 'body')
+    type = 'While'
+
+    def __init__(self, condition, body):
+        self.condition = condition
+        self.body = body
+
+    @property
+    def children(self):
+        return [self.condition, self.body]
+
+
+class DoWhile(Node):
+    __slots__ = ('body', 'condition')
+    type = 'DoWhile'
+
+    def __init__(self, body, condition):
+        self.body = body
+        self.condition = condition
+
+    @property
+    def children(self):
+        return [self.body, self.condition]
+
+
+class MethodCall(Node):
+    __slots__ = ('name', 'arguments')
+    type = 'MethodCall'
+
+    def __init__(self, name, arguments):
+        self.name = name
+        self.arguments = arguments
+
+    @property
+    def value(self):
+        return self.name
+
+    @property
+    def children(self):
+        return self.arguments
+
+
+class BinaryOperation(Node):
+    __slots__ = ('operator', 'left', 'right', 'ctype')
+    type = 'BinaryOperation'
+
+    def __init__(self, operator, left, right):
+        self.operator = operator
+        self.left = left
+        self.right = right
+        self.ctype = None
+
+    @property
+    def value(self):
+        return self.operator
+
+    @property
+    def children(self):
+        return [self.left, self.right]
+
+
+class UnaryOperation(Node):
+    __slots__ = ('operator', 'operand', 'ctype')
+    type = 'UnaryOperation'
+
+    def __init__(self, operator, operand):
+        self.operator = operator
+        self.operand = operand
+        self.ctype = None
+
+    @property
+    def value(self):
+        return self.operator
+
+    @property
+    def children(self):
+        return [self.operand]
+
+
+class Variable(Node):
+    __slots__ = ('name', 'ctype', 'symbol')
+    type = 'Variable'
+
+    def __init__(self, name):
+        self.name = name
+        self.ctype = None
+        self.symbol = None
+
+    @property
+    def value(self):
+        return self.name
+
+
+class Literal(Node):
+    # Листья-литералы хранят текст лексемы и не имеют списка детей
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class Number(Literal):
+    __slots__ = ()
+    type = 'Number'
+
+    @property
+    def ctype(self):
+        # 12 - int, 1.5f - float, 1.5 - double
+        if self.value.endswith('f'):
+            return 'float'
+        return 'double' if '.' in self.value else 'int'
+
+
+class String(Literal):
+    __slots__ = ()
+    type = 'String'
+    ctype = 'string'
+
+
+class Boolean(Literal):
+    __slots__ = ()
+    type = 'Boolean'
+    ctype = 'bool'
+
+
+NODE_CLASSES = {cls.type: cls for cls in (
+    Program, LibraryImport, Namespace, Class, Method, VariableDeclaration, Assignment,
+    CompoundAssignment, ExpressionStatement, Output, Return, Block, ElseBlock, If, While,
+    DoWhile, MethodCall, BinaryOperation, UnaryOperation, Variable, Number, String, Boolean,
+)}
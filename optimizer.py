@@ -0,0 +1,225 @@
+import operator
+import re
+
+from instrumentation import instrumented
+from nodes import (
+    Method, Block, ElseBlock, If, While, DoWhile, Return, VariableDeclaration, Assignment,
+    CompoundAssignment, ExpressionStatement, Output, MethodCall, BinaryOperation, UnaryOperation,
+    Number, String, Boolean,
+)
+
+# Проход между Parser.parse и CodeGenerator.generate: сворачивает выражения из
+# литералов и убирает недостижимые операторы. Правила следуют C#: сворачивается
+# только арифметика int (32 бита), деление целочисленное с отбрасыванием дробной
+# части, а переполнение и деление на ноль - ошибки компиляции C#, поэтому такие
+# выражения остаются как есть. Дробные числа не трогаются. Выражения вроде
+# z != z без типов свернуть нельзя (для float это NaN).
+
+INT_MIN = -2 ** 31
+INT_MAX = 2 ** 31 - 1
+INT_LITERAL = re.compile(r'-?[0-9]+')
+
+
+def truncating_division(a, b):
+    quotient = abs(a) // abs(b)
+    return quotient if (a < 0) == (b < 0) else -quotient
+
+
+def truncating_remainder(a, b):
+    return a - b * truncating_division(a, b)
+
+
+INT_OPERATIONS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': truncating_division,
+    '%': truncating_remainder,
+    '&': operator.and_,
+    '|': operator.or_,
+}
+COMPARISONS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '>': operator.gt,
+    '<=': operator.le,
+    '>=': operator.ge,
+}
+BOOL_OPERATIONS = {
+    '&&': operator.and_,
+    '||': operator.or_,
+    '&': operator.and_,
+    '|': operator.or_,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+# Поля с выражениями и списки операторов у узлов, которые их содержат
+EXPRESSION_FIELDS = {
+    BinaryOperation: ('left', 'right'),
+    UnaryOperation: ('operand',),
+    VariableDeclaration: ('initializer',),
+    Assignment: ('expression',),
+    CompoundAssignment: ('expression',),
+    ExpressionStatement: ('expression',),
+    Output: ('expression',),
+    Return: ('expression',),
+    If: ('condition',),
+    While: ('condition',),
+    DoWhile: ('condition',),
+}
+STATEMENT_LISTS = {
+    Method: 'body',
+    Block: 'statements',
+    ElseBlock: 'statements',
+}
+
+
+@instrumented('optimizer')
+def optimize(node):
+    # Обход в обратном порядке на явном стеке: к моменту обработки узла его
+    # дети уже упрощены, остаётся свернуть непосредственных потомков.
+    # Дерево меняется на месте; возвращается тот же узел.
+    stack = [(node, False)]
+    while stack:
+        current, visited = stack.pop()
+        if not visited:
+            stack.append((current, True))
+            stack.extend((child, False) for child in current.children)
+            continue
+        cls = current.__class__
+        for field in EXPRESSION_FIELDS.get(cls, ()):
+            value = getattr(current, field)
+            if value is not None:
+                setattr(current, field, fold(value))
+        if cls is MethodCall:
+            current.arguments = [fold(argument) for argument in current.arguments]
+        elif cls in STATEMENT_LISTS:
+            field = STATEMENT_LISTS[cls]
+            setattr(current, field, prune(getattr(current, field)))
+    return node
+
+
+def int_value(node):
+    # Значение литерала int или None (дробные и не влезающие в int32 не считаются)
+    if node.__class__ is Number and INT_LITERAL.fullmatch(node.value):
+        value = int(node.value)
+        if INT_MIN <= value <= INT_MAX:
+            return value
+    return None
+
+
+def bool_value(node):
+    if node.__class__ is Boolean:
+        return node.value == 'true'
+    return None
+
+
+def int_node(value):
+    if INT_MIN <= value <= INT_MAX:
+        return Number(str(value))
+    return None
+
+
+def bool_node(value):
+    return Boolean('true' if value else 'false')
+
+
+def fold(node):
+    cls = node.__class__
+    if cls is UnaryOperation:
+        return fold_unary(node)
+    if cls is BinaryOperation:
+        return fold_binary(node)
+    return node
+
+
+def fold_unary(node):
+    operand = node.operand
+    if node.operator == '-':
+        value = int_value(operand)
+        if value is not None:
+            return int_node(-value) or node
+        # - -x == x; к тому же в JS '--x' был бы декрементом
+        if operand.__class__ is UnaryOperation and operand.operator == '-':
+            return operand.operand
+    elif node.operator == '!':
+        value = bool_value(operand)
+        if value is not None:
+            return bool_node(not value)
+        # !!x == x: в C# '!' применяется только к bool
+        if operand.__class__ is UnaryOperation and operand.operator == '!':
+            return operand.operand
+    return node
+
+
+def fold_binary(node):
+    op = node.operator
+    left = node.left
+    right = node.right
+
+    a = int_value(left)
+    b = int_value(right)
+    if a is not None and b is not None:
+        if op in COMPARISONS:
+            return bool_node(COMPARISONS[op](a, b))
+        if op in INT_OPERATIONS:
+            if op in ('/', '%') and (b == 0 or (a == INT_MIN and b == -1)):
+                return node
+            return int_node(INT_OPERATIONS[op](a, b)) or node
+        return node
+
+    a = bool_value(left)
+    if a is not None:
+        # Сокращённое вычисление: правая часть не выполняется или сама является результатом
+        if op == '&&':
+            return right if a else left
+        if op == '||':
+            return left if a else right
+        b = bool_value(right)
+        if b is not None and op in BOOL_OPERATIONS:
+            return bool_node(BOOL_OPERATIONS[op](a, b))
+        return node
+
+    if op == '+' and left.__class__ is String and right.__class__ is String:
+        # Escape-последовательности самостоятельны, содержимое склеивается как есть
+        return String(f'"{left.value[1:-1]}{right.value[1:-1]}"')
+    return node
+
+
+def declares(block):
+    # Объявления в блоке нельзя переносить в родительский: let изменит область видимости
+    return any(statement.__class__ is VariableDeclaration for statement in block.statements)
+
+
+def prune(statements):
+    # Убирает ветки с постоянным условием и операторы после return.
+    # Вложенные блоки к этому моменту уже обработаны.
+    result = []
+    for statement in statements:
+        cls = statement.__class__
+        condition = bool_value(statement.condition) if cls in (If, While, DoWhile) else None
+        if condition is None:
+            result.append(statement)
+        elif cls is If:
+            taken = statement.then_block if condition else statement.else_block
+            if taken is None:
+                pass
+            elif not declares(taken):
+                result.extend(taken.statements)
+            else:
+                if condition:
+                    statement.else_block = None
+                result.append(statement)
+        elif cls is While:
+            if condition:
+                result.append(statement)
+        elif not condition and not declares(statement.body):
+            # do { ... } while (false) выполняется ровно один раз
+            result.extend(statement.body.statements)
+        else:
+            result.append(statement)
+        if result and result[-1].__class__ is Return:
+            break
+    return result
@@ -0,0 +1,68 @@
+from lexer import Lexer, TokenBuffer
+from parser import Parser
+from prescan import scan_method_bodies
+
+# Структура программы без разбора тел методов: импорты, пространства имён,
+# классы и методы с сигнатурами и участками текста. Для панели структуры
+# в редакторе и поиска зависимостей при сборке. Тела методов находятся
+# проходом по скобкам (prescan.scan_method_bodies) и даже не токенизируются,
+# а ленивый парсер разбирает только объявления.
+
+
+class OutlineItem:
+    __slots__ = ('kind', 'name', 'signature', 'start', 'end', 'children')
+
+    def __init__(self, kind, name, signature, start, end):
+        # kind - 'using', 'namespace', 'class' или 'method';
+        # start/end - смещения в тексте от первого токена до закрывающей '}' или ';'
+        self.kind = kind
+        self.name = name
+        self.signature = signature
+        self.start = start
+        self.end = end
+        self.children = []
+
+    def __repr__(self):
+        return f"OutlineItem({self.kind}, {self.signature}, {self.start}, {self.end}, {self.children})"
+
+
+def method_signature(method):
+    parameters = ', '.join(f'{ctype} {name}' for ctype, name in zip(method.parameter_types, method.parameters))
+    return ' '.join(method.modifiers + [method.return_type, f'{method.name}({parameters})'])
+
+
+def outline(source):
+    # source - строка, файл или mmap (как у Lexer); возвращает список OutlineItem
+    lexer = Lexer(source)
+    if not isinstance(source, str):
+        source = lexer.code = ''.join(chunk for chunk, _ in lexer.read_chunks())
+    tokens = TokenBuffer(source)
+    position = 0
+    for start, end in scan_method_bodies(source):
+        tokens.extend(lexer.tokenize_buffer(position, start))
+        position = end
+    tokens.extend(lexer.tokenize_buffer(position))
+    # тела методов в этом буфере пусты, поэтому узлы наружу не отдаются
+    parser = Parser(tokens, lazy=True)
+    spans = parser.spans = {}
+    program = parser.parse()
+    starts = tokens.starts
+    ends = tokens.ends
+
+    def item(kind, node, signature):
+        first, last = spans[node]
+        return OutlineItem(kind, node.name, signature, starts[first], ends[last])
+
+    items = []
+    for node in program.items:
+        if node.type == 'LibraryImport':
+            items.append(item('using', node, f'using {node.name}'))
+            continue
+        namespace_item = item('namespace', node, f'namespace {node.name}')
+        for class_node in node.classes:
+            class_item = item('class', class_node, ' '.join(class_node.modifiers + ['class', class_node.name]))
+            for method in class_node.methods:
+                class_item.children.append(item('method', method, method_signature(method)))
+            namespace_item.children.append(class_item)
+        items.append(namespace_item)
+    return items
@@ -0,0 +1,174 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import optimizer
+import inference
+from lexer import Lexer, TokenBuffer, TokenKind
+from parser import Parser
+from generator import CodeGenerator
+from prescan import scan_classes
+from translator import translate
+from instrumentation import instrumented, count_output
+
+# Трансляция одного большого файла на нескольких процессах. Быстрый проход по
+# фигурным скобкам (prescan.scan_classes) находит участки классов; процессы
+# разбирают и генерируют свои группы подряд идущих классов, а главный процесс
+# разбирает только каркас (импорты и namespace'ы) и склеивает JS в порядке
+# исходника. Результат побайтно совпадает с translator.translate.
+# Весь текст в главном процессе не токенизируется: это последовательная
+# часть работы, и она ограничивала бы ускорение.
+# Процесс пула получает только текст своей группы классов, поэтому файл
+# целиком в процессы не копируется, а пул без состояния можно передать
+# снаружи (executor) и переиспользовать для многих файлов.
+
+# Сколько групп классов приходится на процесс: мелкие группы выравнивают хвост
+GROUPS_PER_JOB = 4
+
+
+class ClassSlot:
+    # Место класса в каркасе: его JS придёт из процесса пула
+    __slots__ = ()
+    type = 'Class'
+
+
+def skeleton_tokens(source, class_ranges):
+    # Токены текста вне классов; на месте каждого класса - один токен-метка
+    # (первый символ участка). Возвращает буфер и множество индексов меток.
+    tokens = TokenBuffer(source)
+    slots = set()
+    lexer = Lexer(source)
+    position = 0
+    for start, end in class_ranges:
+        tokens.extend(lexer.tokenize_buffer(position, start))
+        slots.add(len(tokens.kinds))
+        tokens.kinds.append(TokenKind.TYPE)
+        tokens.starts.append(start)
+        tokens.ends.append(start + 1)
+        position = end
+    tokens.extend(lexer.tokenize_buffer(position))
+    return tokens, slots
+
+
+class SkeletonParser(Parser):
+    # Разбирает каркас; на месте класса стоит метка, которая становится ClassSlot
+    def __init__(self, tokens, slots):
+        super().__init__(tokens)
+        self.slots = slots
+
+    def class_declaration(self):
+        if self.current_token_index not in self.slots:
+            # prescan увидел здесь не то, что парсер: пусть ошибку найдёт последовательный путь
+            raise SyntaxError("Класс вне участков prescan")
+        self.current_token_index += 1
+        return ClassSlot()
+
+
+def translate_classes(text, optimize, typed):
+    # Выполняется в процессе пула: text - участок исходника с подряд идущими классами.
+    # Возвращает пары (JS класса, префикс вызова Main или '').
+    parser = Parser(Lexer(text).iter_tokens())
+    generator = CodeGenerator(typed=typed)
+    results = []
+    while parser.next_token() is not None:
+        class_node = parser.class_declaration()
+        if optimize:
+            optimizer.optimize(class_node)
+        if typed:
+            inference.annotate(class_node)
+        had_main = generator.mainFlag
+        generator.mainFlag = False
+        js_code = generator.visit(class_node, 0)
+        results.append((js_code, f'{class_node.name}.' if generator.mainFlag else ''))
+        generator.mainFlag = had_main or generator.mainFlag
+    return results
+
+
+def group_ranges(ranges, groups):
+    # Делит подряд идущие классы на группы (начало, конец) примерно равной длины текста
+    limit = sum(end - start for start, end in ranges) / groups
+    result = []
+    first = None
+    size = 0
+    for start, end in ranges:
+        if first is None:
+            first = start
+        size += end - start
+        if size >= limit:
+            result.append((first, end))
+            first = None
+            size = 0
+    if first is not None:
+        result.append((first, ranges[-1][1]))
+    return result
+
+
+@instrumented('parallel', count_output)
+def translate_parallel(source, jobs=None, optimize=True, typed=True, executor=None):
+    # source - строка с текстом программы. При любой ошибке, в том числе при
+    # гибели процесса пула, файл переводится заново последовательно, чтобы
+    # сообщение было тем же, что у translate. executor - готовый пул процессов
+    # (не закрывается); без него пул создаётся на время вызова.
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1:
+        return translate(source, optimize=optimize, typed=typed)
+    try:
+        class_ranges = scan_classes(source)
+    except SyntaxError:
+        return translate(source, optimize=optimize, typed=typed)
+    if len(class_ranges) < 2:
+        return translate(source, optimize=optimize, typed=typed)
+
+    groups = group_ranges(class_ranges, jobs * GROUPS_PER_JOB)
+    try:
+        if executor is not None:
+            skeleton, classes = split_translate(executor, source, class_ranges, groups, optimize, typed)
+        else:
+            with ProcessPoolExecutor(min(jobs, len(groups))) as own_executor:
+                skeleton, classes = split_translate(own_executor, source, class_ranges, groups, optimize, typed)
+    except (SyntaxError, ValueError, BrokenProcessPool):
+        return translate(source, optimize=optimize, typed=typed)
+    if sum(node.type == 'Class' for node in skeleton) != len(classes):
+        return translate(source, optimize=optimize, typed=typed)
+    return assemble(skeleton, classes)
+
+
+def split_translate(executor, source, class_ranges, groups, optimize, typed):
+    # Группы классов уходят в пул, каркас тем временем разбирается здесь
+    futures = [executor.submit(translate_classes, source[start:end], optimize, typed) for start, end in groups]
+    try:
+        skeleton = list(SkeletonParser(*skeleton_tokens(source, class_ranges)).declarations())
+        classes = [result for future in futures for result in future.result()]
+    finally:
+        # с чужим пулом оставшиеся задания этого файла не должны занимать процессы
+        for future in futures:
+            future.cancel()
+    return skeleton, classes
+
+
+def assemble(skeleton, classes):
+    # Склеивает куски верхнего уровня так же, как translate: импорт, класс
+    # или пустая строка за пустой namespace, через '\n'
+    parts = []
+    main = ''
+    results = iter(classes)
+    generator = CodeGenerator()
+    empty_namespace = False
+    for node in skeleton:
+        if node.type == 'Class':
+            empty_namespace = False
+            js_code, prefix = next(results)
+            parts.append(js_code)
+            main = main or prefix
+            continue
+        if empty_namespace:
+            parts.append('')
+        empty_namespace = node.type == 'Namespace'
+        if not empty_namespace:
+            parts.append(generator.visit(node, 0))
+    if empty_namespace:
+        parts.append('')
+    code = '\n'.join(parts)
+    if main:
+        code += f'\n{main}Main()'
+    return code
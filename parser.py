@@ -1,48 +1,110 @@
-class Node:
-    def __init__(self, type, children=None, value=None):
-        self.type = type
-        self.children = children if children is not None else []
-        self.value = value
-
-    def __repr__(self):
-        return f"Node({self.type}, {self.value}, {self.children})"
-
-    def print_tree(self, level=0):
-        indent = "  " * level
-        output = f"{indent}Node({self.type}, {self.value})\n"
-        for child in self.children:
-            output += child.print_tree(level + 1)
-        return output
+from lexer import TokenStream, TokenKind, TokenBuffer
+from instrumentation import instrumented, count_nodes
+from nodes import (
+    Node, Program, LibraryImport, Namespace, Class, Method, VariableDeclaration, Assignment,
+    CompoundAssignment, ExpressionStatement, Output, Return, Block, ElseBlock, If, While,
+    DoWhile, MethodCall, BinaryOperation, UnaryOperation, Variable, Number, String, Boolean,
+)
+
+OUTPUT = TokenKind.OUTPUT
+NUMBER = TokenKind.NUMBER
+STRING = TokenKind.STRING
+ID = TokenKind.ID
+KEYWORD = TokenKind.KEYWORD
+TYPE = TokenKind.TYPE
+OP = TokenKind.OP
+DELIM = TokenKind.DELIM
+
+MODIFIERS = frozenset({'public', 'private', 'protected', 'static'})
+ASSIGNMENT_OPERATORS = frozenset({'=', '+=', '-=', '*=', '/=', '%='})
+CONTROL_KEYWORDS = frozenset({'if', 'while', 'do', 'for'})
+
+# Бинарные операторы и их приоритеты (больше - связывает сильнее), как в C#.
+# Новый оператор добавляется строкой в таблицу; правоассоциативные - ещё и в RIGHT_ASSOCIATIVE.
+# Таблицы описывают только префиксные унарные и бинарные операторы. Постфиксные
+# (x++), тернарный (a ? b : c) и доступ к члену (a.b) так не добавить: для них
+# нужны свои виды узлов и место в цикле expression.
+BINARY_OPERATORS = {
+    '||': 1,
+    '&&': 2,
+    '|': 3,
+    '&': 4,
+    '==': 5, '!=': 5,
+    '<': 6, '>': 6, '<=': 6, '>=': 6,
+    '+': 7, '-': 7,
+    '*': 8, '/': 8, '%': 8,
+}
+RIGHT_ASSOCIATIVE = frozenset()
+# '++' и '--' лексер не выделяет, поэтому их здесь нет
+UNARY_OPERATORS = frozenset({'-', '!'})
+UNARY_PRECEDENCE = max(BINARY_OPERATORS.values()) + 1
+
+class LazyBody:
+    # Тело метода, которое пока только пропущено по скобкам: токены с first
+    # (после '{') до закрывающей '}' с индексом last. Разбирается по запросу.
+    __slots__ = ('tokens', 'first', 'last')
+
+    def __init__(self, tokens, first, last):
+        self.tokens = tokens
+        self.first = first
+        self.last = last
+
+    def parse(self):
+        parser = Parser(self.tokens)
+        parser.current_token_index = self.first
+        try:
+            statements = parser.statement_list()
+        except SyntaxError as e:
+            raise SyntaxError(f"Синтаксическая ошибка: {e}")
+        if parser.current_token_index != self.last:
+            raise SyntaxError("Синтаксическая ошибка: тело метода закончилось раньше закрывающей скобки")
+        return statements
+
 
 class Parser:
-    def __init__(self, tokens):
+    def __init__(self, tokens, lazy=False):
+        # tokens - список или любой итератор токенов (например, Lexer.iter_tokens()).
+        # lazy - тела методов только пропускаются по скобкам и разбираются при
+        # первом обращении к Method.body; нужен список или TokenBuffer, потому
+        # что поток токенов не хранит пройденное.
+        if not hasattr(tokens, '__getitem__'):
+            if lazy:
+                raise ValueError("Ленивый разбор требует список токенов или TokenBuffer")
+            tokens = TokenStream(tokens)
         self.tokens = tokens
         self.current_token_index = 0
+        self.lazy = lazy
+        # узел -> (первый, последний токен) для LibraryImport, Namespace, Class
+        # и Method; заполняется, только если вызывающий код положит сюда словарь
+        self.spans = None
 
-    def eat(self, token_type, value=None):
-        if self.current_token_index < len(self.tokens):
+    def eat(self, token_kind, value=None):
+        try:
             token = self.tokens[self.current_token_index]
-            if token.type == token_type and (value is None or token.value == value):
-                self.current_token_index += 1
-            else:
-                raise SyntaxError(f"Ожидался токен {token_type} '{value}', но найден {token.type} '{token.value}'")
+        except IndexError:
+            raise SyntaxError("Неожиданный конец ввода") from None
+        if token.kind == token_kind and (value is None or token.value == value):
+            self.current_token_index += 1
         else:
-            raise SyntaxError("Неожиданный конец ввода")
+            raise SyntaxError(f"Ожидался токен {token_kind} '{value}', но найден {token.type} '{token.value}'")
 
     def next_token(self):
-        if self.current_token_index < len(self.tokens):
+        try:
             return self.tokens[self.current_token_index]
-        else:
+        except IndexError:
             return None
 
     def next_token_type(self):
         token = self.next_token()
-        return token.type if token else None
+        return token.kind if token else None
 
     def next_token_value(self):
-        token = self.next_token()
-        return token.value if token else None
+        try:
+            return self.tokens[self.current_token_index].value
+        except IndexError:
+            return None
 
+    @instrumented('parser', count_nodes)
     def parse(self):
         try:
             return self.program()
@@ -51,106 +113,221 @@ class Parser:
             return None
 
     def program(self):
+        # Program собирается из потока объявлений: классы дописываются
+        # в оболочку Namespace, которая пришла перед ними
         nodes = []
-        while self.current_token_index < len(self.tokens):
+        for node in self.declarations():
+            if node.type == 'Class':
+                nodes[-1].classes.append(node)
+            else:
+                nodes.append(node)
+        return Program(nodes)
+
+    def declarations(self):
+        # Объявления верхнего уровня по мере разбора: LibraryImport, оболочка
+        # Namespace (без классов), затем каждый Class этого пространства имён.
+        # Разобранные узлы нигде не копятся, это делает вызывающий код.
+        while self.next_token() is not None:
             if self.next_token_value() == 'using':
-                nodes.append(self.lib_import())
+                yield self.lib_import()
             else:
-                nodes.append(self.namespace_declaration())
-        return Node("Program", nodes)
+                yield from self.namespace_items()
 
     def lib_import(self):
-        self.eat('KEYWORD', 'using')
+        first = self.current_token_index
+        self.eat(KEYWORD, 'using')
         lib_name_parts = []
         while True:
             lib_name_parts.append(self.next_token_value())
-            self.eat('ID')
+            self.eat(ID)
             if self.next_token_value() == '.':
-                self.eat('OP', '.')
+                self.eat(OP, '.')
             else:
                 break
         lib_name = '.'.join(lib_name_parts)
-        self.eat('DELIM', ';')
-        return Node("LibraryImport", value=lib_name)
+        library = LibraryImport(lib_name)
+        if self.spans is not None:
+            self.spans[library] = (first, self.current_token_index)
+        self.eat(DELIM, ';')
+        return library
 
     def namespace_declaration(self):
-        self.eat('KEYWORD', 'namespace')
+        items = self.namespace_items()
+        namespace = next(items)
+        namespace.classes.extend(items)
+        return namespace
+
+    def namespace_items(self):
+        first = self.current_token_index
+        self.eat(KEYWORD, 'namespace')
         namespace_name = self.next_token_value()
-        self.eat('ID')
-        self.eat('DELIM', '{')
+        self.eat(ID)
+        self.eat(DELIM, '{')
+        namespace = Namespace(namespace_name, [])
+        yield namespace
 
-        class_nodes = []
         while self.next_token_value() != '}':
-            class_nodes.append(self.class_declaration())
-        self.eat('DELIM', '}')
-        return Node("Namespace", children=class_nodes, value=namespace_name)
+            yield self.class_declaration()
+        if self.spans is not None:
+            self.spans[namespace] = (first, self.current_token_index)
+        self.eat(DELIM, '}')
 
     def class_declaration(self):
+        first = self.current_token_index
         modifiers = []
-        while self.next_token_type() == 'KEYWORD' and self.next_token_value() in {'public', 'private', 'protected', 'static'}:
+        while self.next_token_type() == KEYWORD and self.next_token_value() in MODIFIERS:
             modifiers.append(self.next_token_value())
-            self.eat('KEYWORD')
-        self.eat('TYPE', 'class')
+            self.eat(KEYWORD)
+        self.eat(TYPE, 'class')
         class_name = self.next_token_value()
-        self.eat('ID')
-        self.eat('DELIM', '{')
+        self.eat(ID)
+        self.eat(DELIM, '{')
 
         method_nodes = []
         while self.next_token_value() != '}':
             method_nodes.append(self.method_declaration())
 
-        self.eat('DELIM', '}')
-        return Node("Class", children=method_nodes, value={"name": class_name, "modifiers": modifiers})
+        class_node = Class(class_name, modifiers, method_nodes)
+        if self.spans is not None:
+            self.spans[class_node] = (first, self.current_token_index)
+        self.eat(DELIM, '}')
+        return class_node
 
     def method_declaration(self):
+        first = self.current_token_index
         modifiers = []
-        while self.next_token_type() == 'KEYWORD' and self.next_token_value() in {'public', 'private', 'protected', 'static'}:
+        while self.next_token_type() == KEYWORD and self.next_token_value() in MODIFIERS:
             modifiers.append(self.next_token_value())
-            self.eat('KEYWORD')
+            self.eat(KEYWORD)
         return_type = self.next_token_value()
-        self.eat('TYPE')
+        self.eat(TYPE)
         method_name = self.next_token_value()
-        self.eat('ID')
-        self.eat('DELIM', '(')
-        parameters = self.method_parameters()
-        self.eat('DELIM', ')')
-        self.eat('DELIM', '{')
-
-        statement_list = self.statement_list()
-
-        self.eat('DELIM', '}')
-        return Node("Method", children=statement_list, value={"name": method_name, "modifiers": modifiers, "parameters": parameters, "return_type": return_type})
+        self.eat(ID)
+        self.eat(DELIM, '(')
+        parameters, parameter_types = self.method_parameters()
+        self.eat(DELIM, ')')
+        self.eat(DELIM, '{')
+
+        if self.lazy:
+            body_start = self.current_token_index
+            self.current_token_index = self.skip_block()
+            body = LazyBody(self.tokens, body_start, self.current_token_index)
+        else:
+            body = self.statement_list()
+
+        method = Method(method_name, modifiers, parameters, return_type, body, parameter_types)
+        if self.spans is not None:
+            self.spans[method] = (first, self.current_token_index)
+        self.eat(DELIM, '}')
+        return method
+
+    def skip_block(self):
+        # Индекс '}', парной к уже съеденной '{', без разбора того, что между ними.
+        # В TokenBuffer разделители ищутся по массиву типов (array.index).
+        tokens = self.tokens
+        depth = 1
+        index = self.current_token_index
+        if isinstance(tokens, TokenBuffer):
+            kinds = tokens.kinds
+            source = tokens.source
+            starts = tokens.starts
+            try:
+                while True:
+                    index = kinds.index(DELIM, index)
+                    char = source[starts[index]]
+                    if char == '{':
+                        depth += 1
+                    elif char == '}':
+                        depth -= 1
+                        if not depth:
+                            return index
+                    index += 1
+            except ValueError:
+                raise SyntaxError("Неожиданный конец ввода") from None
+        for index in range(index, len(tokens)):
+            token = tokens[index]
+            if token.kind == DELIM:
+                if token.value == '{':
+                    depth += 1
+                elif token.value == '}':
+                    depth -= 1
+                    if not depth:
+                        return index
+        raise SyntaxError("Неожиданный конец ввода")
 
     def method_parameters(self):
+        # Имена и типы параметров двумя параллельными списками
         params = []
+        param_types = []
         if self.next_token_value() != ')':
             while True:
                 param_type = self.next_token_value()
-                self.eat('TYPE')
+                self.eat(TYPE)
                 param_name = self.next_token_value()
-                self.eat('ID')
+                self.eat(ID)
                 params.append(param_name)
+                param_types.append(param_type)
                 if self.next_token_value() == ',':
-                    self.eat('DELIM', ',')
+                    self.eat(DELIM, ',')
                 else:
                     break
-        return params
+        return params, param_types
 
     def statement_list(self):
+        # Вложенные блоки if/while/do разбираются с явным стеком, а не рекурсией.
+        # Кадр стека: (вид блока, список операторов родителя, условие, ветка then)
         statements = []
-        while self.next_token_value() != '}':
-            statements.append(self.statement())
-        return statements
+        stack = []
+        while True:
+            token = self.next_token()
+            if token is not None and token.value == '}':
+                if not stack:
+                    return statements
+                kind, parent, condition, then_branch = stack.pop()
+                if kind != 'else if':
+                    self.eat(DELIM, '}')
+                if kind == 'if':
+                    if self.next_token_value() == 'else':
+                        self.eat(KEYWORD, 'else')
+                        if self.next_token_value() == 'if':
+                            # ветка else продолжается до конца внешнего блока
+                            stack.append(('else if', parent, condition, statements))
+                        else:
+                            self.eat(DELIM, '{')
+                            stack.append(('else', parent, condition, statements))
+                        statements = []
+                        continue
+                    node = self.if_node(condition, statements, None)
+                elif kind == 'while':
+                    node = While(condition, Block(statements))
+                elif kind == 'do':
+                    node = DoWhile(Block(statements), self.do_while_condition())
+                else:
+                    node = self.if_node(condition, then_branch, statements)
+                parent.append(node)
+                statements = parent
+            elif token is not None and token.kind == KEYWORD and token.value in BLOCK_HEADERS:
+                kind = token.value
+                condition = BLOCK_HEADERS[kind](self)
+                stack.append((kind, statements, condition, None))
+                statements = []
+            else:
+                statements.append(self.statement())
 
     def statement(self):
-        if self.next_token_type() == 'OUTPUT':
+        token = self.next_token()
+        if token is None:
+            raise SyntaxError("Неожиданный конец ввода")
+        kind = token.kind
+        if kind == OUTPUT:
             return self.output()
-        elif self.next_token_type() == 'TYPE':
+        elif kind == TYPE:
             return self.variable_declaration()
-        elif self.next_token_type() == 'ID':
-            if self.tokens[self.current_token_index + 1].type == 'OP':
-                next_op = self.tokens[self.current_token_index + 1].value
-                if next_op in {'=', '+=', '-=', '*=', '/=', '%='}:
+        elif kind == ID:
+            following = self.tokens[self.current_token_index + 1]
+            if following.kind == OP:
+                next_op = following.value
+                if next_op in ASSIGNMENT_OPERATORS:
                     if next_op == '=':
                         return self.assignment_statement()
                     else:
@@ -159,225 +336,210 @@ class Parser:
                     return self.method_call()
                 else:
                     return self.expression_statement()
-            elif self.tokens[self.current_token_index + 1].value == '(':
+            elif following.value == '(':
                     return self.method_call()
             else:
                 return self.expression_statement()
-        elif self.next_token_value() == 'return':
+        elif token.value == 'return':
             return self.return_statement()
-        elif self.next_token_value() in {'if', 'while', 'do', 'for'}:
-            return self.control_statement()
+        elif token.value in CONTROL_KEYWORDS:
+            raise SyntaxError(f"Неизвестная управляющая конструкция: {token.value}")
         else:
-            raise SyntaxError(f"Неожиданное начало оператора: {self.next_token_value()}")
+            raise SyntaxError(f"Неожиданное начало оператора: {token.value}")
 
     def output(self):
-        self.eat('OUTPUT')
-        self.eat('DELIM', '(')
+        self.eat(OUTPUT)
+        self.eat(DELIM, '(')
         value = self.expression()
-        self.eat('DELIM', ')')
-        self.eat('DELIM', ';')
-        return Node("Output", children=[value] if value else [])
+        self.eat(DELIM, ')')
+        self.eat(DELIM, ';')
+        return Output(value)
 
 
     def variable_declaration(self):
         var_type = self.next_token_value()
-        self.eat('TYPE')
+        self.eat(TYPE)
         var_name = self.next_token_value()
-        self.eat('ID')
+        self.eat(ID)
         value = None
         if self.next_token_value() == '=':
-            self.eat('OP', '=')
+            self.eat(OP, '=')
             value = self.expression()
-        self.eat('DELIM', ';')
-        return Node("VariableDeclaration", value={"type": var_type, "name": var_name}, children=[value] if value else [])
+        self.eat(DELIM, ';')
+        return VariableDeclaration(var_type, var_name, value)
 
     def assignment_statement(self):
         var_name = self.next_token_value()
-        self.eat('ID')
-        self.eat('OP', '=')
+        self.eat(ID)
+        self.eat(OP, '=')
         value = self.expression()
-        self.eat('DELIM', ';')
-        return Node("Assignment", value={"variable": var_name}, children=[value])
+        self.eat(DELIM, ';')
+        return Assignment(var_name, value)
 
     def compound_assignment(self):
         var_name = self.next_token_value()
-        self.eat('ID')
+        self.eat(ID)
         operator = self.next_token_value()
-        self.eat('OP')
+        self.eat(OP)
         value = self.expression()
-        self.eat('DELIM', ';')
-        return Node("CompoundAssignment", value={"variable": var_name, "operator": operator}, children=[value])
+        self.eat(DELIM, ';')
+        return CompoundAssignment(var_name, operator, value)
 
     def expression_statement(self):
         expr = self.expression()
-        self.eat('DELIM', ';')
-        return Node("ExpressionStatement", children=[expr])
+        self.eat(DELIM, ';')
+        return ExpressionStatement(expr)
 
     def expression(self):
-        return self.logical_or()
-
-    def logical_or(self):
-        node = self.logical_and()
-        while self.next_token_value() == '||':
-            op = self.next_token_value()
-            self.eat('OP', '||')
-            right = self.logical_and()
-            node = Node("BinaryOperation", value=op, children=[node, right])
-        return node
-
-    def logical_and(self):
-        node = self.equality()
-        while self.next_token_value() == '&&':
-            op = self.next_token_value()
-            self.eat('OP', '&&')
-            right = self.equality()
-            node = Node("BinaryOperation", value=op, children=[node, right])
-        return node
-
-    def equality(self):
-        node = self.relational()
-        while self.next_token_value() in {'==', '!='}:
-            op = self.next_token_value()
-            self.eat('OP')
-            right = self.relational()
-            node = Node("BinaryOperation", value=op, children=[node, right])
-        return node
-
-    def relational(self):
-        node = self.additive()
-        while self.next_token_value() in {'<', '>', '<=', '>='}:
-            op = self.next_token_value()
-            self.eat('OP')
-            right = self.additive()
-            node = Node("BinaryOperation", value=op, children=[node, right])
-        return node
-
-    def additive(self):
-        node = self.multiplicative()
-        while self.next_token_value() in {'+', '-'}:
-            op = self.next_token_value()
-            self.eat('OP')
-            right = self.multiplicative()
-            node = Node("BinaryOperation", value=op, children=[node, right])
-        return node
-
-    def multiplicative(self):
-        node = self.unary()
-        while self.next_token_value() in {'*', '/', '%'}:
-            op = self.next_token_value()
-            self.eat('OP')
-            right = self.unary()
-            node = Node("BinaryOperation", value=op, children=[node, right])
-        return node
-
-    def unary(self):
-        if self.next_token_value() in {'-', '!', '++', '--'}:
-            op = self.next_token_value()
-            self.eat('OP')
-            operand = self.unary()
-            return Node("UnaryOperation", value=op, children=[operand])
-        else:
-            return self.primary()
+        # Разбор по приоритетам из таблицы BINARY_OPERATORS на явных стеках
+        # операндов и операторов (сортировочная станция), без рекурсии по скобкам
+        # и цепочкам унарных операторов. Скобка '(' лежит на стеке с приоритетом 0.
+        tokens = self.tokens
+        operands = []
+        operators = []
+        open_parens = 0
+        while True:
+            # ожидается операнд: унарные операторы, открывающие скобки, затем первичное выражение
+            while True:
+                try:
+                    token = tokens[self.current_token_index]
+                except IndexError:
+                    break
+                if token.kind == OP and token.value in UNARY_OPERATORS:
+                    operators.append((UNARY_PRECEDENCE, token.value))
+                elif token.kind == DELIM and token.value == '(':
+                    operators.append((0, '('))
+                    open_parens += 1
+                else:
+                    break
+                self.current_token_index += 1
+            operands.append(self.primary())
+            # ожидается бинарный оператор или закрывающая скобка
+            while True:
+                try:
+                    token = tokens[self.current_token_index]
+                except IndexError:
+                    token = None
+                precedence = None
+                if token is None:
+                    pass
+                elif token.kind == OP:
+                    precedence = BINARY_OPERATORS.get(token.value)
+                elif token.kind == DELIM and token.value == ')' and open_parens:
+                    self.reduce(operands, operators, 1)
+                    operators.pop()
+                    open_parens -= 1
+                    self.current_token_index += 1
+                    continue
+                if precedence is None:
+                    if open_parens:
+                        self.eat(DELIM, ')')
+                    if operators:
+                        self.reduce(operands, operators, 1)
+                    return operands[0]
+                if operators and operators[-1][0] >= precedence:
+                    self.reduce(operands, operators, precedence + 1 if token.value in RIGHT_ASSOCIATIVE else precedence)
+                operators.append((precedence, token.value))
+                self.current_token_index += 1
+                break
+
+    @staticmethod
+    def reduce(operands, operators, min_precedence):
+        # Сворачивает операторы стека с приоритетом не ниже min_precedence
+        while operators and operators[-1][0] >= min_precedence:
+            precedence, op = operators.pop()
+            operand = operands.pop()
+            if precedence == UNARY_PRECEDENCE:
+                operands.append(UnaryOperation(op, operand))
+            else:
+                operands.append(BinaryOperation(op, operands.pop(), operand))
 
     def primary(self):
         token = self.next_token()
-        if token.type == 'NUMBER':
-            self.eat('NUMBER')
-            return Node("Number", value=token.value)
-        elif token.type == 'STRING':
-            self.eat('STRING')
-            return Node("String", value=token.value)
-        elif token.type == 'ID':
-            self.eat('ID')
-            return Node("Variable", value=token.value)
-        elif token.type == 'KEYWORD' and token.value in {'true', 'false'}:
-            self.eat('KEYWORD')
-            return Node("Boolean", value=token.value)
-        elif token.type == 'DELIM' and token.value == '(':
-            self.eat('DELIM', '(')
-            expr = self.expression()
-            self.eat('DELIM', ')')
-            return expr
+        if token is None:
+            raise SyntaxError("Неожиданный конец ввода")
+        kind = token.kind
+        if kind == NUMBER:
+            self.current_token_index += 1
+            return Number(token.value)
+        elif kind == STRING:
+            self.current_token_index += 1
+            return String(token.value)
+        elif kind == ID:
+            self.current_token_index += 1
+            return Variable(token.value)
+        elif kind == KEYWORD and token.value in {'true', 'false'}:
+            self.current_token_index += 1
+            return Boolean(token.value)
         else:
             raise SyntaxError(f"Неожиданный токен: {token.type} '{token.value}'")
 
     def return_statement(self):
-        self.eat('KEYWORD', 'return')
+        self.eat(KEYWORD, 'return')
         if self.next_token_value() != ';':
             expr = self.expression()
         else:
             expr = None
-        self.eat('DELIM', ';')
-        return Node("Return", children=[expr] if expr else [])
-
-    def control_statement(self):
-        if self.next_token_value() == 'if':
-            return self.if_statement()
-        elif self.next_token_value() == 'while':
-            return self.while_statement()
-        elif self.next_token_value() == 'do':
-            return self.do_while_statement()
-        else:
-            raise SyntaxError(f"Неизвестная управляющая конструкция: {self.next_token_value()}")
+        self.eat(DELIM, ';')
+        return Return(expr)
 
-    def if_statement(self):
-        self.eat('KEYWORD', 'if')
-        self.eat('DELIM', '(')
+    def if_header(self):
+        self.eat(KEYWORD, 'if')
+        self.eat(DELIM, '(')
         condition = self.expression()
-        self.eat('DELIM', ')')
-        self.eat('DELIM', '{')
-        then_branch = self.statement_list()
-        self.eat('DELIM', '}')
-        else_branch = None
-        if self.next_token_value() == 'else':
-            self.eat('KEYWORD', 'else')
-            if self.next_token_value() == 'if':
-                else_branch = self.statement_list()
-            else:
-                self.eat('DELIM', '{')
-                else_branch = self.statement_list()
-                self.eat('DELIM', '}')
-        return Node("If", children=[condition, Node("Block", children=then_branch)] + ([Node("ElseBlock", children=else_branch)] if else_branch else []))
-
-    def while_statement(self):
-        self.eat('KEYWORD', 'while')
-        self.eat('DELIM', '(')
+        self.eat(DELIM, ')')
+        self.eat(DELIM, '{')
+        return condition
+
+    def if_node(self, condition, then_branch, else_branch):
+        return If(condition, Block(then_branch), ElseBlock(else_branch) if else_branch else None)
+
+    def while_header(self):
+        self.eat(KEYWORD, 'while')
+        self.eat(DELIM, '(')
         condition = self.expression()
-        self.eat('DELIM', ')')
-        self.eat('DELIM', '{')
-        body = self.statement_list()
-        self.eat('DELIM', '}')
-        return Node("While", children=[condition, Node("Block", children=body)])
-
-    def do_while_statement(self):
-        self.eat('KEYWORD', 'do')
-        self.eat('DELIM', '{')
-        body = self.statement_list()
-        self.eat('DELIM', '}')
-        self.eat('KEYWORD', 'while')
-        self.eat('DELIM', '(')
+        self.eat(DELIM, ')')
+        self.eat(DELIM, '{')
+        return condition
+
+    def do_header(self):
+        self.eat(KEYWORD, 'do')
+        self.eat(DELIM, '{')
+        return None
+
+    def do_while_condition(self):
+        self.eat(KEYWORD, 'while')
+        self.eat(DELIM, '(')
         condition = self.expression()
-        self.eat('DELIM', ')')
-        self.eat('DELIM', ';')
-        return Node("DoWhile", children=[Node("Block", children=body), condition])
+        self.eat(DELIM, ')')
+        self.eat(DELIM, ';')
+        return condition
 
     def method_call(self):
         method_name = self.next_token_value()
-        self.eat('ID')
+        self.eat(ID)
         while self.next_token_value() != '(':
-            self.eat('OP')
+            self.eat(OP)
             method_name += '.'
             method_name += self.next_token_value()
-            self.eat('ID')
-        self.eat('DELIM', '(')
+            self.eat(ID)
+        self.eat(DELIM, '(')
         args = []
         if self.next_token_value() != ')':
             while True:
                 args.append(self.expression())
                 if self.next_token_value() == ',':
-                    self.eat('DELIM', ',')
+                    self.eat(DELIM, ',')
                 else:
                     break
-        self.eat('DELIM', ')')
-        self.eat('DELIM', ';')
-        return Node("MethodCall", value=method_name, children=args)
+        self.eat(DELIM, ')')
+        self.eat(DELIM, ';')
+        return MethodCall(method_name, args)
+
+
+# Заголовки составных операторов: разбирают всё до '{' и возвращают условие
+BLOCK_HEADERS = {
+    'if': Parser.if_header,
+    'while': Parser.while_header,
+    'do': Parser.do_header,
+}
@@ -0,0 +1,123 @@
+import re
+
+from lexer import Lexer, TokenKind
+
+
+class Span:
+    # Участок программы: namespace, класс или метод.
+    # first/last - индексы первого и последнего токена (last - закрывающая '}')
+    def __init__(self, kind, first, last=None):
+        self.kind = kind
+        self.first = first
+        self.last = last
+        self.children = []
+
+    def __repr__(self):
+        return f"Span({self.kind}, {self.first}, {self.last}, {self.children})"
+
+
+# Вид участка по глубине фигурных скобок, на которой открывается его тело
+SPAN_KINDS = ('Namespace', 'Class', 'Method')
+
+
+def scan_spans(tokens):
+    # Быстрый проход по скобкам TokenBuffer без синтаксического анализа:
+    # возвращает namespace'ы с вложенными классами и методами.
+    # Участок начинается с токена после предыдущего участка или открывающей
+    # скобки родителя (модификаторы входят в участок).
+    source = tokens.source
+    starts = tokens.starts
+    delim = TokenKind.DELIM
+    roots = []
+    stack = []
+    first = None
+    for index, kind in enumerate(tokens.kinds):
+        if kind != delim:
+            if first is None:
+                first = index
+            continue
+        char = source[starts[index]]
+        if char == '{':
+            depth = len(stack)
+            if depth < len(SPAN_KINDS):
+                span = Span(SPAN_KINDS[depth], index if first is None else first)
+                (stack[-1].children if stack else roots).append(span)
+            else:
+                span = None
+            stack.append(span)
+            first = None
+        elif char == '}':
+            if not stack:
+                raise SyntaxError("Лишняя закрывающая скобка")
+            span = stack.pop()
+            if span is not None:
+                span.last = index
+            first = None
+        elif char == ';':
+            first = None
+        elif first is None:
+            first = index
+    if stack:
+        raise SyntaxError("Незакрытая фигурная скобка")
+    return roots
+
+
+# Строки, символы и комментарии разбираются теми же шаблонами, что и в лексере:
+# фигурная скобка внутри них не считается. Всё остальное пропускается без токенов.
+BRACES = re.compile('|'.join(
+    dict(Lexer.token_specification)[name] for name in ('STRING', 'CHAR', 'COMMENT')
+) + r'|[{};]')
+
+
+def scan_classes(source):
+    # Ещё более быстрый проход прямо по тексту: смещения (начало, конец)
+    # классов, т.е. участков с телом на глубине 1. Начало - сразу после
+    # предыдущей скобки или ';' (пробелы и комментарии перед классом входят
+    # в его участок), конец - сразу после закрывающей скобки класса.
+    ranges = []
+    depth = 0
+    boundary = 0
+    start = 0
+    for match in BRACES.finditer(source):
+        char = source[match.start()]
+        if char == '{':
+            if depth == 0:
+                boundary = match.end()
+            elif depth == 1:
+                start = boundary
+            depth += 1
+        elif char == '}':
+            if depth == 0:
+                raise SyntaxError("Лишняя закрывающая скобка")
+            depth -= 1
+            if depth == 1:
+                ranges.append((start, match.end()))
+                boundary = match.end()
+        elif char == ';' and depth == 1:
+            boundary = match.end()
+    if depth:
+        raise SyntaxError("Незакрытая фигурная скобка")
+    return ranges
+
+
+def scan_method_bodies(source):
+    # Смещения (начало, конец) содержимого тел методов: от символа после
+    # открывающей скобки на глубине 2 до парной закрывающей (не включая её)
+    ranges = []
+    depth = 0
+    start = 0
+    for match in BRACES.finditer(source):
+        char = source[match.start()]
+        if char == '{':
+            if depth == 2:
+                start = match.end()
+            depth += 1
+        elif char == '}':
+            if depth == 0:
+                raise SyntaxError("Лишняя закрывающая скобка")
+            depth -= 1
+            if depth == 2:
+                ranges.append((start, match.start()))
+    if depth:
+        raise SyntaxError("Незакрытая фигурная скобка")
+    return ranges
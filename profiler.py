@@ -0,0 +1,292 @@
+import atexit
+import functools
+import inspect
+import os
+import sys
+import time
+from types import GeneratorType
+
+import generator as generator_module
+import parser as parser_module
+from parser import Parser
+from generator import CodeGenerator, refresh_handlers
+
+# Профилировщик правил грамматики и обработчиков генератора: вызовы, полное
+# время (с вложенными правилами), собственное время и токены, съеденные
+# правилом. Включается install() или переменной окружения TRANSLATOR_PROFILE
+# (путь файла со стеками); методы Parser и обработчики CodeGenerator
+# подменяются обёртками только на время профилирования.
+# При потоковой трансляции токены читаются лениво, поэтому время лексера
+# попадает в собственное время правила, которое запросило токен.
+# Выражения разбирает один цикл Parser.expression (сортировочная станция на
+# явных стеках операндов и операторов, см. parser.py), а не правила на каждый
+# уровень приоритета и не рекурсия по скобкам. Поэтому в стеках нет правил
+# вроде equality/term: вся работа с операторами, скобками и унарными минусами
+# - собственное время Parser.expression, над которым только Parser.primary
+# (по вызову на операнд), а глубина стека не зависит от вложенности скобок.
+# Стеки выводятся в свёрнутом формате flamegraph.pl / speedscope:
+# "Parser.program;Parser.namespace_items;Parser.class_declaration 1234" (мкс).
+
+ENVIRONMENT_VARIABLE = 'TRANSLATOR_PROFILE'
+
+# Служебные методы парсера, не правила грамматики
+PARSER_HELPERS = frozenset({'__init__', 'eat', 'next_token', 'next_token_type', 'next_token_value'})
+
+
+class RuleStats:
+    __slots__ = ('calls', 'inclusive', 'exclusive', 'tokens')
+
+    def __init__(self):
+        self.calls = 0
+        # полное время и токены считаются по внешнему вызову, чтобы рекурсия не удваивала их
+        self.inclusive = 0.0
+        self.exclusive = 0.0
+        self.tokens = 0
+
+
+class Frame:
+    __slots__ = ('name', 'path', 'start', 'children', 'token', 'outer')
+
+    def __init__(self, name, path, token, outer):
+        self.name = name
+        self.path = path
+        self.start = time.perf_counter()
+        self.children = 0.0
+        self.token = token
+        # первый на стеке вызов этого правила (не рекурсивный)
+        self.outer = outer
+
+
+class Profile:
+    def __init__(self):
+        self.rules = {}
+        # стеки: номер пути -> собственное время; путь - (номер родителя, имя)
+        self.paths = {}
+        self.path_parents = []
+        self.path_names = []
+        self.times = []
+        # стеки, пришедшие из других процессов (merge), уже строками
+        self.merged = {}
+
+    def path(self, parent, name):
+        key = (parent, name)
+        path = self.paths.get(key)
+        if path is None:
+            path = self.paths[key] = len(self.path_names)
+            self.path_parents.append(parent)
+            self.path_names.append(name)
+            self.times.append(0.0)
+        return path
+
+    def rule(self, name):
+        stats = self.rules.get(name)
+        if stats is None:
+            stats = self.rules[name] = RuleStats()
+        return stats
+
+    def stacks(self):
+        # {"a;b;c": собственное время в секундах}; строки собираются по цепочке родителей
+        names = []
+        for parent, name in zip(self.path_parents, self.path_names):
+            names.append(name if parent < 0 else f'{names[parent]};{name}')
+        stacks = dict(self.merged)
+        for name, seconds in zip(names, self.times):
+            stacks[name] = stacks.get(name, 0.0) + seconds
+        return stacks
+
+    def merge(self, other):
+        for name, source in other.rules.items():
+            stats = self.rule(name)
+            stats.calls += source.calls
+            stats.inclusive += source.inclusive
+            stats.exclusive += source.exclusive
+            stats.tokens += source.tokens
+        for name, seconds in other.stacks().items():
+            self.merged[name] = self.merged.get(name, 0.0) + seconds
+
+    def __getstate__(self):
+        # между процессами передаются только итоги и стеки строками
+        return {'rules': self.rules, 'merged': self.stacks()}
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.rules = state['rules']
+        self.merged = state['merged']
+
+    def report(self, limit=None):
+        rows = sorted(self.rules.items(), key=lambda item: item[1].exclusive, reverse=True)
+        if limit is not None:
+            rows = rows[:limit]
+        lines = [f"{'Правило / обработчик':40} {'вызовы':>10} {'всего, мс':>11} {'своё, мс':>11} {'токены':>10}\n"]
+        for name, stats in rows:
+            tokens = stats.tokens if name.startswith('Parser.') else '-'
+            lines.append(f'{name:40} {stats.calls:10} {stats.inclusive * 1000:11.1f} '
+                         f'{stats.exclusive * 1000:11.1f} {tokens:>10}\n')
+        return ''.join(lines)
+
+    def collapsed(self):
+        lines = []
+        for name, seconds in sorted(self.stacks().items()):
+            microseconds = round(seconds * 1e6)
+            if microseconds:
+                lines.append(f'{name} {microseconds}\n')
+        return ''.join(lines)
+
+
+profile = Profile()
+installed = False
+frames = []
+# сколько раз правило сейчас на стеке
+depths = {}
+originals = []
+
+
+def enter(name, token=0):
+    parent = frames[-1].path if frames else -1
+    depth = depths.get(name, 0)
+    depths[name] = depth + 1
+    frame = Frame(name, profile.path(parent, name), token, not depth)
+    frames.append(frame)
+    return frame
+
+
+def leave(frame, token=0, call=True):
+    # call=False - очередное возобновление генератора, а не новый вызов
+    now = time.perf_counter()
+    # после исключения внутренние кадры могли остаться на стеке
+    while frames and frames[-1] is not frame:
+        leave(frames[-1])
+    if not frames:
+        return
+    frames.pop()
+    depths[frame.name] -= 1
+    inclusive = now - frame.start
+    exclusive = inclusive - frame.children
+    if frames:
+        frames[-1].children += inclusive
+    stats = profile.rule(frame.name)
+    if call:
+        stats.calls += 1
+    stats.exclusive += exclusive
+    if frame.outer:
+        stats.inclusive += inclusive
+        stats.tokens += token - frame.token
+    profile.times[frame.path] += exclusive
+
+
+def profile_rule(name, function):
+    if inspect.isgeneratorfunction(function):
+        # Генератор работает только внутри next(): каждое возобновление - отдельный кадр
+        @functools.wraps(function)
+        def generator_wrapper(parser, *args):
+            items = function(parser, *args)
+            call = True
+            while True:
+                frame = enter(name, parser.current_token_index)
+                try:
+                    item = next(items)
+                except StopIteration:
+                    leave(frame, parser.current_token_index, call)
+                    return
+                except BaseException:
+                    leave(frame, parser.current_token_index, call)
+                    raise
+                leave(frame, parser.current_token_index, call)
+                call = False
+                yield item
+        return generator_wrapper
+
+    @functools.wraps(function)
+    def wrapper(parser, *args):
+        frame = enter(name, parser.current_token_index)
+        try:
+            return function(parser, *args)
+        finally:
+            leave(frame, parser.current_token_index)
+    return wrapper
+
+
+def profiled_handler(frame, items):
+    # Кадр обработчика-генератора открыт, пока emit обходит его детей,
+    # поэтому их обработчики оказываются вложенными в него
+    try:
+        yield from items
+    finally:
+        leave(frame)
+
+
+def profile_handler(name, handler):
+    @functools.wraps(handler)
+    def wrapper(generator, node, depth):
+        frame = enter(name)
+        try:
+            result = handler(generator, node, depth)
+        except BaseException:
+            leave(frame)
+            raise
+        if type(result) is GeneratorType:
+            return profiled_handler(frame, result)
+        leave(frame)
+        return result
+    return wrapper
+
+
+def wrap_handler(cls, handler):
+    return profile_handler(f'{cls.__name__}.{handler.__name__}', handler)
+
+
+def install():
+    global installed
+    if installed:
+        return
+    installed = True
+    for name, function in list(vars(Parser).items()):
+        if inspect.isfunction(function) and name not in PARSER_HELPERS:
+            originals.append((Parser, name, function))
+            setattr(Parser, name, profile_rule(f'Parser.{name}', function))
+    # таблица заголовков блоков хранит сами функции, а не имена
+    headers = parser_module.BLOCK_HEADERS
+    originals.append((headers, None, dict(headers)))
+    for keyword, function in headers.items():
+        headers[keyword] = getattr(Parser, function.__name__)
+    # Таблицы handlers собираются заново с обёртками; пока профилировщик
+    # установлен, register() и новые подклассы CodeGenerator тоже получают обёртки
+    generator_module.handler_wrapper = wrap_handler
+    refresh_handlers(CodeGenerator)
+
+
+def uninstall():
+    global installed
+    for owner, name, original in reversed(originals):
+        if name is None:
+            owner.update(original)
+        else:
+            setattr(owner, name, original)
+    originals.clear()
+    if installed:
+        generator_module.handler_wrapper = None
+        refresh_handlers(CodeGenerator)
+    installed = False
+
+
+def reset():
+    global profile
+    profile = Profile()
+    frames.clear()
+    depths.clear()
+
+
+def write(path, report=sys.stderr, limit=40):
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(profile.collapsed())
+    if report is not None:
+        report.write(profile.report(limit))
+
+
+def from_environment():
+    # TRANSLATOR_PROFILE=путь: профилировать весь запуск, при выходе записать
+    # стеки в этот файл, а таблицу правил - в stderr
+    path = os.environ.get(ENVIRONMENT_VARIABLE)
+    if path and not installed:
+        install()
+        atexit.register(lambda: write(path))
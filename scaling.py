@@ -0,0 +1,149 @@
+import gc
+import math
+import time
+
+from lexer import Lexer
+from parser import Parser
+from generator import CodeGenerator
+from translator import translate
+from optimizer import optimize
+from inference import annotate
+from semantic import resolve
+from outline import outline
+from corpus import CorpusSettings, generate_program, STRESS_INPUTS, stress_code
+
+# Проверка, что время каждой стадии растёт линейно с размером входа: стадия
+# запускается на входах масштаба N, 2N, 4N, 8N, и по точкам оценивается
+# показатель степени k в time ~ size^k. Используется benchmark.py scaling и
+# tests/test_scaling.py.
+# Каждая точка - лучшее из REPEAT средних процессорных времён; в одном замере
+# стадия повторяется, пока не наберётся MIN_SAMPLE секунд, поэтому входы в
+# миллисекунды измеряются так же точно, как большие. Сборщик мусора на время
+# замера выключен (как в timeit): полные сборки стоят O(живых объектов) и на
+# больших деревьях дают ложную нелинейность. Показатель - медиана наклонов
+# по всем парам точек (оценка Тейла - Сена): один зашумлённый замер её не сдвигает.
+
+# Наибольший допустимый показатель степени
+LIMIT = 1.3
+REPEAT = 5
+# Сколько раз перемерить стадию с удвоенным REPEAT, прежде чем признать её нелинейной
+ATTEMPTS = 3
+MIN_SAMPLE = 0.02
+STEPS = (1, 2, 4, 8)
+
+
+def parse_source(code):
+    return Parser(Lexer(code).tokenize_buffer()).parse()
+
+
+def cpu_time(function, *args):
+    # Среднее процессорное время одного вызова function(*args)
+    number = 0
+    gc.collect()
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.process_time()
+        while True:
+            function(*args)
+            number += 1
+            elapsed = time.process_time() - start
+            if elapsed >= MIN_SAMPLE:
+                return elapsed / number
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def fresh_tree(code, function):
+    # optimize меняет дерево, поэтому каждый вызов получает новое; разбор не измеряется
+    number = 0
+    total = 0.0
+    while total < MIN_SAMPLE:
+        tree = parse_source(code)
+        gc.collect()
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = time.process_time()
+            function(tree)
+            total += time.process_time() - start
+        finally:
+            if enabled:
+                gc.enable()
+        number += 1
+    return total / number
+
+
+# Стадия: (код, готовое дерево) -> процессорное время вызова; подготовка не измеряется
+STAGES = {
+    'lex': lambda code, tree: cpu_time(Lexer(code).tokenize_buffer),
+    'stream': lambda code, tree: cpu_time(lambda: sum(1 for _ in Lexer(code).iter_tokens())),
+    'parse': lambda code, tree: cpu_time(lambda: Parser(Lexer(code).tokenize_buffer()).parse()),
+    'repr': lambda code, tree: cpu_time(repr, tree),
+    'print_tree': lambda code, tree: cpu_time(tree.print_tree),
+    'optimize': lambda code, tree: fresh_tree(code, optimize),
+    'annotate': lambda code, tree: cpu_time(annotate, tree),
+    'resolve': lambda code, tree: cpu_time(resolve, tree),
+    'generate': lambda code, tree: cpu_time(CodeGenerator().generate, tree),
+    'translate': lambda code, tree: cpu_time(translate, code),
+    'outline': lambda code, tree: cpu_time(outline, code),
+}
+
+# Для глубоких входов текст print_tree и JS растёт квадратично с глубиной
+# из-за отступов - это свойство вывода, а не алгоритма, и такие стадии не проверяются
+DEEP_STAGES = ('lex', 'parse', 'repr', 'optimize', 'annotate', 'resolve')
+
+# Форма входа: (построение по масштабу n, базовый n, проверяемые стадии)
+SHAPES = {
+    'wide': (lambda n: generate_program(0, size=n * 1024), 32, tuple(STAGES)),
+    'long method': (lambda n: generate_program(0, CorpusSettings(classes=1, methods=1, statements=n)), 400,
+                    tuple(STAGES)),
+    'nested if': (lambda n: stress_code(STRESS_INPUTS['nested if'](n)), 1000, DEEP_STAGES),
+    'else if chain': (lambda n: stress_code(STRESS_INPUTS['else if chain'](n)), 1000, DEEP_STAGES),
+    'operator chain': (lambda n: stress_code(STRESS_INPUTS['operator chain'](n)), 2000, DEEP_STAGES),
+}
+
+
+def exponent(sizes, times):
+    # Медиана наклонов log(время) / log(размер) по всем парам точек: 1 - линейно, 2 - квадратично
+    points = [(math.log(size), math.log(max(elapsed, 1e-9))) for size, elapsed in zip(sizes, times)]
+    slopes = sorted((y2 - y1) / (x2 - x1)
+                    for index, (x1, y1) in enumerate(points) for x2, y2 in points[index + 1:])
+    middle = len(slopes) // 2
+    return slopes[middle] if len(slopes) % 2 else (slopes[middle - 1] + slopes[middle]) / 2
+
+
+def shape_inputs(shape, scale=1):
+    # (размер текста, текст, дерево) для каждого шага STEPS
+    build, base, _ = SHAPES[shape]
+    inputs = []
+    for step in STEPS:
+        code = build(max(1, round(base * scale)) * step)
+        inputs.append((len(code), code, parse_source(code)))
+    return inputs
+
+
+def measure(stage, inputs, repeat=REPEAT, attempts=ATTEMPTS, limit=LIMIT):
+    # (времена по точкам, показатель). Показатель больше limit перемеряется
+    # с удвоенным repeat: на общей машине случайная задержка бывает в любой точке
+    measure_stage = STAGES[stage]
+    sizes = [size for size, _, _ in inputs]
+    for _ in range(attempts):
+        times = [min(measure_stage(code, tree) for _ in range(repeat)) for _, code, tree in inputs]
+        result = exponent(sizes, times)
+        if result <= limit:
+            break
+        repeat *= 2
+    return times, result
+
+
+def sweep(shapes=None, stages=None, scale=1, repeat=REPEAT, attempts=ATTEMPTS, limit=LIMIT):
+    # (форма, стадия, времена, показатель) по всем выбранным формам и их стадиям
+    for shape in shapes or SHAPES:
+        inputs = shape_inputs(shape, scale)
+        for stage in SHAPES[shape][2]:
+            if stages and stage not in stages:
+                continue
+            times, result = measure(stage, inputs, repeat, attempts, limit)
+            yield shape, stage, times, result
@@ -0,0 +1,144 @@
+from instrumentation import instrumented, count_unresolved
+from nodes import (
+    Program, Namespace, Class, Method, Block, ElseBlock, VariableDeclaration, Assignment,
+    CompoundAssignment, Variable, MethodCall,
+)
+
+# Семантический анализ: таблица символов для пространств имён, классов,
+# методов, параметров и локальных переменных. Каждое использование имени
+# связывается со своим символом (поле symbol у узла), а имена, которые
+# ничему не соответствуют, собираются в список неразрешённых.
+
+
+class Symbol:
+    __slots__ = ('name', 'kind', 'ctype', 'node', 'assignments')
+
+    def __init__(self, name, kind, ctype=None, node=None):
+        # kind: 'namespace', 'class', 'method', 'parameter' или 'local'
+        self.name = name
+        self.kind = kind
+        self.ctype = ctype
+        self.node = node
+        # сколько раз переменной присваивали значение после объявления
+        self.assignments = 0
+
+    def __repr__(self):
+        return f"Symbol({self.kind}, {self.name}, {self.ctype})"
+
+
+class SymbolTable:
+    # Области видимости вложены, но поиск не проходит по их цепочке: для
+    # каждого имени хранится стек символов из открытых областей, верхний -
+    # ближайший. Поиск - одно обращение к словарю; при выходе из области
+    # снимаются только её собственные объявления.
+    def __init__(self):
+        self.bindings = {}
+        self.scopes = []
+
+    def enter(self):
+        self.scopes.append([])
+
+    def exit(self):
+        bindings = self.bindings
+        for name in self.scopes.pop():
+            symbols = bindings[name]
+            symbols.pop()
+            if not symbols:
+                del bindings[name]
+
+    def declare(self, symbol):
+        self.bindings.setdefault(symbol.name, []).append(symbol)
+        self.scopes[-1].append(symbol.name)
+        return symbol
+
+    def lookup(self, name):
+        symbols = self.bindings.get(name)
+        return symbols[-1] if symbols else None
+
+
+class Unresolved:
+    __slots__ = ('name', 'node', 'method')
+
+    def __init__(self, name, node, method):
+        self.name = name
+        self.node = node
+        self.method = method
+
+    def __str__(self):
+        where = f" (метод {self.method})" if self.method else ''
+        return f"Необъявленное имя: {self.name}{where}"
+
+
+# Действия на стеке обхода
+VISIT = 0
+EXIT = 1
+DECLARE = 2
+
+# Узлы, открывающие свою область видимости
+SCOPES = frozenset({Program, Namespace, Class, Method, Block, ElseBlock})
+
+
+@instrumented('semantic', count_unresolved)
+def resolve(node):
+    # Проставляет symbol у переменных, объявлений и присваиваний внутри node
+    # (Program, Namespace, Class или Method) и возвращает список Unresolved.
+    # Время линейно по числу узлов при любой глубине вложенности.
+    table = SymbolTable()
+    unresolved = []
+    classes_open = 0
+    method_name = None
+    stack = [(VISIT, node)]
+    while stack:
+        action, current = stack.pop()
+        cls = current.__class__
+        if action == EXIT:
+            table.exit()
+            if cls is Class:
+                classes_open -= 1
+            elif cls is Method:
+                method_name = None
+            continue
+        if action == DECLARE:
+            current.symbol = table.declare(Symbol(current.name, 'local', current.var_type, current))
+            continue
+
+        if cls is Variable:
+            current.symbol = table.lookup(current.name)
+            if current.symbol is None:
+                unresolved.append(Unresolved(current.name, current, method_name))
+            continue
+        if cls is Assignment or cls is CompoundAssignment:
+            symbol = current.symbol = table.lookup(current.variable)
+            if symbol is None:
+                unresolved.append(Unresolved(current.variable, current, method_name))
+            else:
+                symbol.assignments += 1
+        elif cls is MethodCall:
+            # Вызовы с точкой могут вести в подключённые библиотеки - их не проверить
+            if '.' not in current.name and classes_open and table.lookup(current.name) is None:
+                unresolved.append(Unresolved(current.name, current, method_name))
+        elif cls is VariableDeclaration:
+            # имя появляется после инициализатора
+            stack.append((DECLARE, current))
+        elif cls in SCOPES:
+            table.enter()
+            stack.append((EXIT, current))
+            if cls is Program:
+                for namespace in current.items:
+                    if namespace.__class__ is Namespace:
+                        table.declare(Symbol(namespace.name, 'namespace', node=namespace))
+            elif cls is Namespace:
+                for class_node in current.classes:
+                    table.declare(Symbol(class_node.name, 'class', node=class_node))
+            elif cls is Class:
+                classes_open += 1
+                for method in current.methods:
+                    table.declare(Symbol(method.name, 'method', method.return_type, method))
+            elif cls is Method:
+                method_name = current.name
+                for name, ctype in zip(current.parameters, current.parameter_types):
+                    table.declare(Symbol(name, 'parameter', ctype))
+        children = current.children
+        for index in range(len(children) - 1, -1, -1):
+            stack.append((VISIT, children[index]))
+    return unresolved
@@ -0,0 +1,271 @@
+import asyncio
+import json
+import os
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from lexer import Lexer, TOKEN_TYPES
+from parser import Parser
+from translator import translate
+
+# Долгоживущий сервер трансляции: JSON-RPC 2.0 по одному сообщению на строку
+# через stdin/stdout или локальный Unix-сокет. Интерпретатор и модули
+# загружаются один раз, запросы выполняются на пуле процессов ограниченного
+# размера, поэтому маленький файл переводится за миллисекунды.
+#
+# Методы (params - объект):
+#   translate {source, optimize=true, typed=true} -> {js, problems: [строка, ...]}
+#   tokens    {source}                -> {tokens: [[тип, значение], ...]}
+#   ast       {source}                -> {tree: {type, value, children}}
+#   shutdown  {}                      -> null, затем сервер останавливается
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+TRANSLATION_ERROR = -32000
+TIMEOUT_ERROR = -32001
+SIZE_ERROR = -32002
+
+WORKER_METHODS = frozenset({'translate', 'tokens', 'ast'})
+
+# Запас к лимиту строки сверх max_size: экранирование JSON и сам конверт запроса
+LINE_OVERHEAD = 64 * 1024
+
+
+class RequestError(Exception):
+    # Ошибка с кодом JSON-RPC; передаётся из процесса пула, поэтому оба поля в args
+    def __init__(self, code, message):
+        super().__init__(code, message)
+        self.code = code
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+def on_alarm(signum, frame):
+    raise TimeoutError
+
+
+def init_worker():
+    # Пул не должен ловить Ctrl+C сам: остановкой управляет главный процесс
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGALRM, on_alarm)
+
+
+def tree_json(tree):
+    # Вложенные объекты {type, value, children} без рекурсии: дети
+    # заполняются через стек, поэтому глубина дерева не важна до json.dumps
+    root = {}
+    stack = [(tree, root)]
+    while stack:
+        node, target = stack.pop()
+        target['type'] = node.type
+        target['value'] = node.value
+        children = target['children'] = [{} for _ in node.children]
+        stack.extend(zip(node.children, children))
+    return root
+
+
+def run_request(method, params, time_limit):
+    # Выполняется в процессе пула; возвращает результат уже в виде JSON,
+    # чтобы большой JS не сериализовывался дважды. Время ограничивается
+    # таймером процесса: TimeoutError прерывает и зациклившийся разбор.
+    if time_limit:
+        signal.setitimer(signal.ITIMER_REAL, time_limit)
+    try:
+        source = params['source']
+        if method == 'translate':
+            problems = []
+            js_code = translate(source, optimize=params.get('optimize', True),
+                                typed=params.get('typed', True), problems=problems)
+            result = {'js': js_code, 'problems': [str(problem) for problem in problems]}
+        elif method == 'tokens':
+            tokens = Lexer(source).tokenize_buffer()
+            result = {'tokens': [[TOKEN_TYPES[kind], tokens.value_at(index)]
+                                 for index, kind in enumerate(tokens.kinds)]}
+        else:
+            result = {'tree': tree_json(Parser(Lexer(source).tokenize_buffer()).parse())}
+        return json.dumps(result, ensure_ascii=False)
+    except TimeoutError:
+        raise RequestError(TIMEOUT_ERROR, f"Превышено время обработки запроса ({time_limit} с)")
+    except RecursionError:
+        raise RequestError(TRANSLATION_ERROR, "Слишком глубокое дерево для JSON")
+    except ValueError as e:
+        raise RequestError(TRANSLATION_ERROR, f"Лексическая ошибка: {e}")
+    except Exception as e:
+        raise RequestError(TRANSLATION_ERROR, str(e))
+    finally:
+        if time_limit:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def response(request_id, result=None, error=None):
+    # result - уже готовый JSON результата
+    head = f'{{"jsonrpc": "2.0", "id": {json.dumps(request_id)}, '
+    if error is not None:
+        return head + f'"error": {json.dumps({"code": error.code, "message": str(error)}, ensure_ascii=False)}}}\n'
+    return head + f'"result": {result}}}\n'
+
+
+class TranslationServer:
+    def __init__(self, workers=None, time_limit=10.0, max_size=4 * 1024 * 1024, queue_size=None):
+        # workers - процессы пула; queue_size - сколько запросов может ждать
+        # и выполняться одновременно (остальные ждут чтения из соединения)
+        self.workers = workers or os.cpu_count() or 1
+        self.time_limit = time_limit
+        self.max_size = max_size
+        self.line_limit = 8 * max_size + LINE_OVERHEAD
+        self.executor = None
+        self.slots = None
+        self.queue_size = queue_size or 4 * self.workers
+        self.tasks = set()
+        self.stopping = None
+
+    async def start(self):
+        self.executor = ProcessPoolExecutor(self.workers, initializer=init_worker)
+        self.slots = asyncio.Semaphore(self.queue_size)
+        self.stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self.stopping.set)
+        # первый запрос не должен платить за запуск процессов пула
+        await asyncio.gather(*(loop.run_in_executor(self.executor, os.getpid) for _ in range(self.workers)))
+
+    async def stop(self):
+        # Новые запросы уже не читаются; начатые дорабатывают и получают ответ
+        if self.tasks:
+            await asyncio.wait(self.tasks)
+        self.executor.shutdown()
+
+    async def handle(self, line):
+        # Ответ на одну строку запроса. Уведомление (запрос без ключа id) не
+        # получает ответа даже с ошибкой; явный id, в том числе null, - получает.
+        # Если id прочитать нельзя (неверный JSON или не объект), ответ идёт с id null
+        request_id = None
+        notification = False
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                raise RequestError(PARSE_ERROR, "Некорректный JSON")
+            if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+                raise RequestError(INVALID_REQUEST, "Ожидался объект JSON-RPC с полем method")
+            notification = 'id' not in request
+            request_id = request.get('id')
+            method = request['method']
+            params = request.get('params', {})
+            if method == 'shutdown':
+                self.stopping.set()
+                result = 'null'
+            elif method in WORKER_METHODS:
+                if not isinstance(params, dict) or not isinstance(params.get('source'), str):
+                    raise RequestError(INVALID_PARAMS, "Ожидался параметр source со строкой")
+                if len(params['source']) > self.max_size:
+                    raise RequestError(SIZE_ERROR, f"Исходник больше {self.max_size} символов")
+                loop = asyncio.get_running_loop()
+                future = loop.run_in_executor(self.executor, run_request, method, params, self.time_limit)
+                try:
+                    # таймер в процессе пула срабатывает раньше; это запас на случай зависшего процесса
+                    result = await asyncio.wait_for(future, self.time_limit + 1 if self.time_limit else None)
+                except asyncio.TimeoutError:
+                    raise RequestError(TIMEOUT_ERROR, f"Превышено время обработки запроса ({self.time_limit} с)")
+            else:
+                raise RequestError(METHOD_NOT_FOUND, f"Неизвестный метод: {method}")
+        except RequestError as error:
+            return None if notification else response(request_id, error=error)
+        if notification:
+            return None
+        return response(request_id, result)
+
+    async def serve_stream(self, reader, write):
+        # Запросы одного соединения выполняются параллельно, ответы уходят
+        # по мере готовности (клиент сопоставляет их по id)
+        async def reply(line):
+            try:
+                text = await self.handle(line)
+                if text is not None:
+                    await write(text.encode('utf-8'))
+            finally:
+                self.slots.release()
+
+        pending = set()
+        stop = asyncio.ensure_future(self.stopping.wait())
+        try:
+            while not self.stopping.is_set():
+                read = asyncio.ensure_future(reader.readline())
+                await asyncio.wait({read, stop}, return_when=asyncio.FIRST_COMPLETED)
+                if not read.done():
+                    read.cancel()
+                    break
+                try:
+                    line = read.result()
+                except (ValueError, asyncio.LimitOverrunError):
+                    # строка длиннее лимита: продолжить чтение с середины нельзя
+                    error = RequestError(SIZE_ERROR, f"Сообщение длиннее {self.line_limit} байт")
+                    await write(response(None, error=error).encode('utf-8'))
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                await self.slots.acquire()
+                task = asyncio.ensure_future(reply(line))
+                for tasks in (self.tasks, pending):
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            # ответы на запросы, которые ещё выполняются
+            if pending:
+                await asyncio.wait(pending)
+        finally:
+            stop.cancel()
+
+    async def serve_stdio(self):
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=self.line_limit)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        output = sys.stdout.buffer
+
+        async def write(data):
+            output.write(data)
+            output.flush()
+
+        await self.serve_stream(reader, write)
+
+    async def serve_socket(self, path):
+        async def connection(reader, writer):
+            async def write(data):
+                writer.write(data)
+                await writer.drain()
+
+            try:
+                await self.serve_stream(reader, write)
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+
+        server = await asyncio.start_unix_server(connection, path, limit=self.line_limit)
+        try:
+            await self.stopping.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+            if os.path.exists(path):
+                os.remove(path)
+
+    async def run(self, socket_path=None):
+        await self.start()
+        try:
+            if socket_path is None:
+                await self.serve_stdio()
+            else:
+                await self.serve_socket(socket_path)
+        finally:
+            await self.stop()
+
+
+def serve(socket_path=None, workers=None, time_limit=10.0, max_size=4 * 1024 * 1024):
+    asyncio.run(TranslationServer(workers, time_limit, max_size).run(socket_path))
@@ -0,0 +1,57 @@
+import os
+
+from cache import TranslationCache
+
+SOURCE = 'namespace Cached {{ class C{0} {{ static void Main() {{ int x = {0}; x += 1; }} }} }}'
+
+
+def files_by_key(directory):
+    keys = {}
+    for root, _, names in os.walk(directory):
+        for name in names:
+            key, suffix = os.path.splitext(name)
+            keys.setdefault(key, set()).add(suffix)
+    return keys
+
+
+def test_eviction_removes_js_and_tree_together(tmp_path):
+    cache = TranslationCache(str(tmp_path), store_ast=True)
+    sources = [SOURCE.format(index) for index in range(20)]
+    for index, source in enumerate(sources):
+        cache.translate(source)
+        key = cache.key(source.encode())
+        # у дерева время старше, чем у JS: по отдельности оно ушло бы первым
+        os.utime(cache.path(key), (1000 + index * 10, 1000 + index * 10))
+        os.utime(cache.path(key, '.ast'), (1, 1))
+    # первая запись только что прочитана и должна пережить вытеснение вместе с деревом
+    first = cache.key(sources[0].encode())
+    assert cache.get(first) is not None
+    entry_size = sum(entry[1] for entry in cache.entries()) // len(sources)
+    cache.max_bytes = entry_size * 10
+    cache.evict()
+
+    keys = files_by_key(str(tmp_path))
+    assert all(suffixes == {'.js', '.ast'} for suffixes in keys.values())
+    assert first in keys
+    assert 0 < len(keys) < len(sources)
+    assert cache.stats.evictions == len(sources) - len(keys)
+    assert cache.load_ast(first) is not None
+
+
+def test_clear_removes_every_file(tmp_path):
+    cache = TranslationCache(str(tmp_path), store_ast=True)
+    for index in range(3):
+        cache.translate(SOURCE.format(index))
+    cache.clear()
+    assert files_by_key(str(tmp_path)) == {}
+
+
+def test_store_ast_is_part_of_the_key(tmp_path):
+    source = SOURCE.format(0)
+    TranslationCache(str(tmp_path)).translate(source)
+    cache = TranslationCache(str(tmp_path), store_ast=True)
+    key = cache.key(source.encode())
+    assert cache.get(key) is None
+    cache.translate(source)
+    assert cache.get(key) is not None
+    assert cache.load_ast(key) is not None
@@ -0,0 +1,105 @@
+import sys
+
+import pytest
+
+from corpus import STRESS_INPUTS, stress_code
+from generator import CodeGenerator
+from lexer import Lexer
+from parser import Parser
+from translator import translate
+
+# Разбор, print_tree, генерация и трансляция не должны зависеть от стека Python:
+# глубина входов в десятки раз больше лимита рекурсии. Текст print_tree и JS
+# вложенных узлов растёт квадратично (отступы), поэтому такой вывод
+# проверяется на OUTPUT_DEPTH - это всё равно втрое глубже лимита.
+DEPTH = 30000
+OUTPUT_DEPTH = 3000
+RECURSION_LIMIT = 1000
+
+# Формы, у которых JS не растёт с глубиной вложенности отступами
+FLAT_JS = frozenset({'operator chain', 'nested parens', 'unary chain'})
+
+# Форма входа -> (тип узла, сколько таких узлов на глубине n)
+EXPECTED_NODES = {
+    'nested if': ('If', lambda n: n),
+    'nested while': ('While', lambda n: n),
+    'nested do': ('DoWhile', lambda n: n),
+    'else if chain': ('If', lambda n: n + 1),
+    'operator chain': ('BinaryOperation', lambda n: n),
+    'nested parens': ('BinaryOperation', lambda n: 0),
+    'unary chain': ('UnaryOperation', lambda n: n),
+}
+
+# Форма входа -> проверка JS на глубине n
+EXPECTED_JS = {
+    'nested if': lambda js, n: js.count('if (x) {') == n and js.count('x = 1;') == 1,
+    'nested while': lambda js, n: js.count('while (x) {') == n and js.count('x -= 1;') == 1,
+    'nested do': lambda js, n: js.count('do {') == n and js.count('} while (x);') == n,
+    'else if chain': lambda js, n: js.count('if (x) {') == n + 1 and js.count('x = 2;') == n,
+    'operator chain': lambda js, n: f"x = {'(' * n}1 + x{') + x' * (n - 1)});" in js,
+    'nested parens': lambda js, n: 'x = x;' in js,
+    'unary chain': lambda js, n: f"b = {'!' * n}true;" in js,
+}
+
+
+@pytest.fixture(autouse=True)
+def recursion_limit():
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(RECURSION_LIMIT)
+    yield
+    sys.setrecursionlimit(limit)
+
+
+def parse(code):
+    return Parser(Lexer(code).tokenize_buffer()).parse()
+
+
+def count_nodes(tree, node_type=None):
+    # node_type=None - все узлы
+    count = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        count += node_type is None or node.type == node_type
+        stack.extend(node.children)
+    return count
+
+
+def js_depth(shape):
+    return DEPTH if shape in FLAT_JS else OUTPUT_DEPTH
+
+
+@pytest.mark.parametrize('shape', list(STRESS_INPUTS))
+def test_parse(shape):
+    tree = parse(stress_code(STRESS_INPUTS[shape](DEPTH)))
+    node_type, expected = EXPECTED_NODES[shape]
+    assert count_nodes(tree, node_type) == expected(DEPTH)
+    assert repr(tree).startswith('Node(Program, None, [')
+
+
+@pytest.mark.parametrize('shape', list(STRESS_INPUTS))
+def test_print_tree(shape):
+    depth = DEPTH if shape == 'nested parens' else OUTPUT_DEPTH
+    tree = parse(stress_code(STRESS_INPUTS[shape](depth)))
+    lines = tree.print_tree().splitlines()
+    node_type, expected = EXPECTED_NODES[shape]
+    assert len(lines) == count_nodes(tree)
+    assert sum(line.lstrip().startswith(f'Node({node_type},') for line in lines) == expected(depth)
+
+
+@pytest.mark.parametrize('shape', list(STRESS_INPUTS))
+def test_generate(shape):
+    depth = js_depth(shape)
+    js = CodeGenerator().generate(parse(stress_code(STRESS_INPUTS[shape](depth))))
+    assert EXPECTED_JS[shape](js, depth)
+
+
+@pytest.mark.parametrize('shape', list(STRESS_INPUTS))
+def test_translate(shape):
+    depth = js_depth(shape)
+    code = stress_code(STRESS_INPUTS[shape](depth))
+    js = translate(code, optimize=False, typed=False)
+    assert js == CodeGenerator().generate(parse(code))
+    assert EXPECTED_JS[shape](js, depth)
+    # по умолчанию проходят и свёртка констант, и вывод типов
+    translate(code)
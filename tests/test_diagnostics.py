@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from incremental import IncrementalTranslator
+from server import run_request
+from translator import translate
+
+SOURCE = '''
+namespace Diagnostics {
+    class Program {
+        static void Main() {
+            int x = 1;
+            y = x;
+            Helper(z);
+        }
+        static void Helper(int a) {
+            Missing();
+        }
+    }
+}
+'''
+
+EXPECTED = [
+    'Необъявленное имя: y (метод Main)',
+    'Необъявленное имя: z (метод Main)',
+    'Необъявленное имя: Missing (метод Helper)',
+]
+
+
+@pytest.mark.parametrize('typed', [False, True])
+def test_translate_collects_problems(typed):
+    problems = []
+    js = translate(SOURCE, typed=typed, problems=problems)
+    assert [str(problem) for problem in problems] == EXPECTED
+    assert js == translate(SOURCE, typed=typed)
+
+
+def test_server_reports_problems():
+    result = json.loads(run_request('translate', {'source': SOURCE}, None))
+    assert result['problems'] == EXPECTED
+    assert result['js'] == translate(SOURCE)
+
+
+def test_incremental_problems_follow_edits():
+    translator = IncrementalTranslator()
+    translator.update(SOURCE)
+    assert [str(problem) for problem in translator.problems] == EXPECTED
+    # правка внутри метода: переразбирается только он, список обновляется
+    fixed = SOURCE.replace('Missing();', 'Helper(a);')
+    translator.update(fixed)
+    assert translator.patched_runs == 1
+    assert [str(problem) for problem in translator.problems] == EXPECTED[:2]
+    broken = fixed.replace('int x = 1;', 'int x = w;')
+    translator.update(broken)
+    assert translator.patched_runs == 2
+    assert [str(problem) for problem in translator.problems] == ['Необъявленное имя: w (метод Main)'] + EXPECTED[:2]
@@ -0,0 +1,127 @@
+import io
+import json
+
+import pytest
+
+import dump
+from corpus import CorpusSettings, generate_program
+from lexer import Lexer
+from parser import Parser
+
+SOURCE = generate_program(0, CorpusSettings(classes=2, methods=3, statements=10))
+
+
+def parse_source(code):
+    return Parser(Lexer(code).tokenize_buffer()).parse()
+
+
+def json_lines(tree):
+    out = io.StringIO()
+    dump.dump_json(tree, out)
+    return out.getvalue().splitlines()
+
+
+def binary_data(tree):
+    out = io.BytesIO()
+    dump.dump_binary(tree, out)
+    return out.getvalue()
+
+
+def test_round_trip():
+    tree = parse_source(SOURCE)
+    assert repr(dump.load_json(json_lines(tree))) == repr(tree)
+    assert repr(dump.load_binary(binary_data(tree))) == repr(tree)
+    assert repr(dump.load_binary(io.BytesIO(binary_data(tree)))) == repr(tree)
+
+
+@pytest.mark.parametrize('lines', [
+    ['{"type": "Assignment", "variable": "x", "children": 0}'],
+    ['{"type": "If", "children": 1}', '{"type": "Boolean", "value": "true", "children": 0}'],
+    ['{"type": "Number", "value": "1", "children": 2}'],
+    ['{"type": "Program", "children": -1}'],
+    ['{"type": "Program", "children": "1"}'],
+    ['{"type": "Program", "children": true}'],
+    ['{"type": "Program"}'],
+    ['{"type": "Variable", "children": 0}'],
+    ['{"type": "Variable", "name": 5, "children": 0}'],
+    ['{"type": "Class", "name": "A", "modifiers": "public", "children": 0}'],
+    ['{"type": ["Program"], "children": 0}'],
+    ['{"children": 0}'],
+    ['[1, 2]'],
+    ['{"type": "Program", "children": 1'],
+    ['{"type": "Program", "children": 1}'],
+])
+def test_malformed_json_raises_value_error(lines):
+    with pytest.raises(ValueError):
+        dump.load_json(lines)
+
+
+@pytest.mark.parametrize('lines', [
+    # ветка then - не Block
+    ['{"type": "If", "children": 2}', '{"type": "Boolean", "value": "true", "children": 0}',
+     '{"type": "Variable", "name": "x", "children": 0}'],
+    # ветка else - Block, а не ElseBlock
+    ['{"type": "If", "children": 3}', '{"type": "Boolean", "value": "true", "children": 0}',
+     '{"type": "Block", "children": 0}', '{"type": "Block", "children": 0}'],
+    # оператор на месте выражения
+    ['{"type": "Assignment", "variable": "x", "children": 1}', '{"type": "Block", "children": 0}'],
+    # выражение на месте оператора
+    ['{"type": "Block", "children": 1}', '{"type": "Number", "value": "1", "children": 0}'],
+    ['{"type": "Program", "children": 1}', '{"type": "Class", "name": "A", "modifiers": [], "children": 0}'],
+    ['{"type": "Namespace", "name": "N", "children": 1}', '{"type": "Program", "children": 0}'],
+])
+def test_wrong_child_type_raises_value_error(lines):
+    with pytest.raises(ValueError):
+        dump.load_json(lines)
+
+
+def test_wrong_child_type_in_binary_raises_value_error():
+    # While(Boolean, Number) вместо While(условие, Block)
+    codes = dump.TYPE_NUMBERS
+    data = dump.BINARY_MAGIC + bytes([codes['While'], 2, codes['Boolean'], 0, 1, 4]) + b'true'
+    with pytest.raises(ValueError):
+        dump.load_binary(data + bytes([codes['Number'], 0, 1, 1]) + b'1')
+    # тот же поток с Block вместо Number загружается
+    tree = dump.load_binary(data + bytes([codes['Block'], 0]))
+    assert tree.type == 'While' and tree.body.type == 'Block'
+
+
+def test_malformed_binary_raises_value_error():
+    tree = parse_source(SOURCE)
+    data = binary_data(tree)
+    header = dump.BINARY_MAGIC
+    variable = dump.TYPE_NUMBERS['Variable']
+    assignment = dump.TYPE_NUMBERS['Assignment']
+    for bad in (
+        b'',
+        b'XXXXXX',
+        header,
+        data[:-5],
+        # ссылка на строку 5 при пустой таблице
+        header + bytes([variable, 0, 7]),
+        # Assignment без выражения
+        header + bytes([assignment, 0, 1, 1]) + b'x',
+        # лист с детьми
+        header + bytes([variable, 1, 1, 1]) + b'x',
+        header + bytes([len(dump.TYPE_CODES), 0]),
+    ):
+        with pytest.raises(ValueError):
+            dump.load_binary(bad)
+
+
+def test_every_truncated_json_dump_raises_value_error():
+    lines = json_lines(parse_source(
+        'namespace N { class A { void M() { x = 1 + y; if (x) { Console.WriteLine(x); } } } }'))
+    for length in range(len(lines)):
+        with pytest.raises(ValueError):
+            dump.load_json(lines[:length])
+    # поле удалено из каждого узла по очереди
+    for index, line in enumerate(lines):
+        record = json.loads(line)
+        for field in record:
+            if field == 'type':
+                continue
+            broken = dict(record)
+            del broken[field]
+            with pytest.raises(ValueError):
+                dump.load_json(lines[:index] + [json.dumps(broken)] + lines[index + 1:])
@@ -0,0 +1,45 @@
+from generator import CodeGenerator
+from lexer import Lexer
+from nodes import Number
+from parser import Parser
+
+
+def generate(generator_class, code):
+    return generator_class().generate(Parser(Lexer(code).tokenize_buffer()).parse())
+
+
+CODE = 'namespace A { class B { void M() { int x = 7; } } }'
+
+
+def test_register_after_subclass_reaches_subclass():
+    class Derived(CodeGenerator):
+        pass
+
+    original = CodeGenerator.own_handlers.get(Number)
+    try:
+        @CodeGenerator.register(Number)
+        def visit_number(generator, node, depth):
+            return f'num({node.value})'
+
+        assert 'num(7)' in generate(Derived, CODE)
+        assert 'num(7)' in generate(CodeGenerator, CODE)
+    finally:
+        CodeGenerator.register(Number)(original)
+    assert 'num(7)' not in generate(Derived, CODE)
+
+
+def test_subclass_override_wins_over_later_base_register():
+    class Derived(CodeGenerator):
+        def visit_Number(self, node, depth):
+            return f'own({node.value})'
+
+    original = CodeGenerator.own_handlers.get(Number)
+    try:
+        @CodeGenerator.register('Number')
+        def visit_number(generator, node, depth):
+            return f'base({node.value})'
+
+        assert 'own(7)' in generate(Derived, CODE)
+        assert 'base(7)' in generate(CodeGenerator, CODE)
+    finally:
+        CodeGenerator.register(Number)(original)
@@ -0,0 +1,59 @@
+import pytest
+
+import instrumentation
+from corpus import CorpusSettings, generate_program
+from lexer import Lexer
+from parser import Parser
+from translator import translate, TIMED_TOKENS
+
+SOURCE = generate_program(3, CorpusSettings(classes=6))
+
+
+@pytest.fixture
+def metrics():
+    saved = instrumentation.metrics
+    instrumentation.metrics = instrumentation.Metrics()
+    instrumentation.enable()
+    try:
+        yield instrumentation.metrics
+    finally:
+        instrumentation.disable()
+        instrumentation.metrics = saved
+
+
+def nodes(tree):
+    record = instrumentation.StageRecord('count')
+    instrumentation.count_nodes(record, tree)
+    return record.counters['nodes']
+
+
+def test_translate_reports_lexer_parser_and_generator(metrics):
+    js = translate(SOURCE)
+    stages = metrics.stages
+    assert stages['lexer'].counters['tokens'] == len(Lexer(SOURCE).tokenize())
+    # узел Program поток объявлений не создаёт
+    assert stages['parser'].counters['nodes'] == nodes(Parser(Lexer(SOURCE).tokenize()).parse()) - 1
+    assert stages['lexer'].parents == {'parser'}
+    assert stages['parser'].parents == stages['generator'].parents == {'translate'}
+    instrumentation.disable()
+    assert translate(SOURCE) == js
+
+
+def test_self_time_adds_up_to_outer_stage(metrics):
+    translate(SOURCE)
+    stages = metrics.stages
+    outer = stages['translate']
+    assert not outer.parents
+    assert sum(totals.self_cpu for totals in stages.values()) == pytest.approx(outer.cpu)
+    assert stages['parser'].self_cpu <= stages['parser'].cpu - stages['lexer'].cpu + 1e-9
+
+
+def test_same_error_with_and_without_metrics(metrics):
+    # синтаксическая ошибка раньше лексической в той же пачке токенов
+    source = 'namespace A { class B { void f( } } ' + 'x ' * (TIMED_TOKENS // 2) + '#'
+    with pytest.raises(SyntaxError) as measured:
+        translate(source)
+    instrumentation.disable()
+    with pytest.raises(SyntaxError) as plain:
+        translate(source)
+    assert str(measured.value) == str(plain.value)
@@ -0,0 +1,114 @@
+import pytest
+
+from lexer import Lexer
+from nodes import BinaryOperation, Number
+from optimizer import optimize
+from parser import Parser
+from translator import translate
+
+
+def method_source(body):
+    return f'namespace N {{ class A {{ static void Main() {{ {body} }} }} }}'
+
+
+def main_body(body):
+    # Строки тела Main после оптимизации, без отступов
+    lines = translate(method_source(body), typed=False).splitlines()
+    start = lines.index('  function Main() {')
+    return [line.strip() for line in lines[start + 1:lines.index('  }', start)]]
+
+
+def initializer(expression):
+    # Выражение инициализатора после optimize
+    tree = Parser(Lexer(method_source(f'int x = {expression};')).tokenize_buffer()).parse()
+    optimize(tree)
+    method = tree.children[0].children[0].children[0]
+    return method.body[0].initializer
+
+
+@pytest.mark.parametrize('expression, value', [
+    ('1 + 2 * 3', '7'),
+    ('2147483646 + 1', '2147483647'),
+    ('-2147483647 - 1', '-2147483648'),
+    ('65536 * 32767', '2147418112'),
+    ('7 / 2', '3'),
+    ('-7 / 2', '-3'),
+    ('7 / -2', '-3'),
+    ('-7 / -2', '3'),
+    ('-7 % 2', '-1'),
+    ('7 % -2', '1'),
+    ('-7 % -2', '-1'),
+    ('(-2147483647 - 1) / 2', '-1073741824'),
+    ('- -5', '5'),
+])
+def test_int_folding(expression, value):
+    node = initializer(expression)
+    assert node.__class__ is Number and node.value == value
+
+
+@pytest.mark.parametrize('expression', [
+    # переполнение int32 и деление на ноль в C# - ошибки компиляции, не свёртка
+    '2147483647 + 1',
+    '-2147483647 - 2',
+    '65536 * 32768',
+    'x / 0',
+    'x % 0',
+    '5 / 0',
+    '5 % 0',
+    '(-2147483647 - 1) / -1',
+    '(-2147483647 - 1) % -1',
+    # дробные числа не сворачиваются
+    '1.5 + 2',
+])
+def test_unfoldable_expressions_are_kept(expression):
+    assert initializer(expression).__class__ is BinaryOperation
+
+
+def test_int_min_division_keeps_folded_operands():
+    node = initializer('(-2147483647 - 1) / -1')
+    assert (node.left.value, node.operator, node.right.value) == ('-2147483648', '/', '-1')
+
+
+def test_double_negations():
+    assert main_body('bool b = !!c; bool d = !!!c; x = - -x; y = -(-(-y));') == [
+        'let b = c;', 'let d = !c;', 'x = x;', 'y = -y;',
+    ]
+
+
+def test_boolean_folding():
+    assert main_body('bool a = !true; bool b = true && c; bool c2 = false && c; bool d = 1 < 2;') == [
+        'let a = false;', 'let b = c;', 'let c2 = false;', 'let d = true;',
+    ]
+
+
+def test_constant_false_statements_are_removed():
+    assert main_body('if (false) { x = 1; } while (false) { x = 2; } do { x = 3; } while (false); x = 4;') == [
+        'x = 3;', 'x = 4;',
+    ]
+
+
+def test_constant_branches_are_inlined():
+    assert main_body('if (true) { x = 1; } else { x = 2; } if (1 > 2) { x = 3; } else { x = 4; }') == [
+        'x = 1;', 'x = 4;',
+    ]
+
+
+def test_blocks_with_declarations_are_kept():
+    # перенос let в родительский блок изменил бы область видимости
+    assert main_body('if (true) { int y = 1; } else { x = 2; } do { int q = 3; } while (false);') == [
+        'if (true) {', 'let y = 1;', '}',
+        'do {', 'let q = 3;', '} while (false);',
+    ]
+
+
+def test_statements_after_return_are_dropped():
+    assert main_body('x = 1; return; x = 2; Console.WriteLine(x);') == ['x = 1;', 'return;']
+    assert main_body('while (c) { return; x = 1; } x = 2;') == ['while (c) {', 'return;', '}', 'x = 2;']
+    assert main_body('if (true) { return; } x = 2;') == ['return;']
+
+
+def test_optimize_flag_disables_the_pass():
+    # Без optimize выражения и ветки остаются как в исходнике
+    source = method_source('if (false) { x = 1 + 2; }')
+    assert 'if (false)' in translate(source, optimize=False, typed=False)
+    assert 'if (false)' not in translate(source, typed=False)
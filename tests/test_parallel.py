@@ -0,0 +1,45 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from batch import translate_tree
+from corpus import CorpusSettings, generate_program
+from parallel import translate_parallel
+from translator import translate
+
+SETTINGS = CorpusSettings(classes=12, methods=3, statements=8)
+PROGRAMS = [generate_program(seed, SETTINGS) for seed in range(3)]
+
+
+@pytest.fixture(scope='module')
+def executor():
+    with ProcessPoolExecutor(2) as executor:
+        yield executor
+
+
+def test_shared_executor_matches_translate(executor):
+    for source in PROGRAMS:
+        assert translate_parallel(source, 2, executor=executor) == translate(source)
+
+
+def test_broken_pool_falls_back_to_sequential():
+    executor = ProcessPoolExecutor(1)
+    try:
+        with pytest.raises(Exception):
+            executor.submit(os._exit, 1).result()
+        assert translate_parallel(PROGRAMS[0], 2, executor=executor) == translate(PROGRAMS[0])
+    finally:
+        executor.shutdown()
+
+
+def test_batch_splits_large_files_on_one_pool(tmp_path):
+    source_dir = tmp_path / 'src'
+    output_dir = tmp_path / 'out'
+    source_dir.mkdir()
+    for index, source in enumerate(PROGRAMS):
+        (source_dir / f'p{index}.cs').write_text(source, encoding='utf-8')
+    report = translate_tree(str(source_dir), str(output_dir), jobs=2, log=None, split_size=0)
+    assert report.files == len(PROGRAMS) and not report.failures
+    for index, source in enumerate(PROGRAMS):
+        assert (output_dir / f'p{index}.js').read_text(encoding='utf-8') == translate(source)
@@ -0,0 +1,60 @@
+import pytest
+
+import profiler
+from generator import CodeGenerator
+from lexer import Lexer
+from nodes import Number
+from parser import Parser
+from translator import translate
+
+SOURCE = ('namespace P { class C { static void Main() { '
+          'int x = ((1 + 2) * -(3 - x) % 4 == 5 && !(x < 6)) || x >= 7; '
+          'f(8 + x * 9, !true); } } }')
+
+
+@pytest.fixture
+def profile():
+    saved = profiler.profile
+    profiler.reset()
+    profiler.install()
+    try:
+        yield profiler.profile
+    finally:
+        profiler.uninstall()
+        profiler.profile = saved
+
+
+def test_expressions_are_one_rule_over_primary(profile):
+    translate(SOURCE)
+    stacks = [name.split(';') for name in profile.stacks()]
+    parser_rules = {rule for stack in stacks for rule in stack if rule.startswith('Parser.')}
+    assert {'Parser.expression', 'Parser.primary'} <= parser_rules
+    for stack in stacks:
+        if 'Parser.expression' in stack:
+            # скобки и унарные операторы не добавляют кадров
+            assert stack[stack.index('Parser.expression'):] in (['Parser.expression'],
+                                                                 ['Parser.expression', 'Parser.primary'])
+    assert profile.rules['Parser.expression'].calls == 3
+
+
+def test_handlers_added_while_profiling_are_profiled(profile):
+    class Late(CodeGenerator):
+        def visit_Variable(self, node, depth):
+            return f'v_{node.name}'
+
+    original = CodeGenerator.own_handlers.get(Number)
+    try:
+        @CodeGenerator.register(Number)
+        def visit_number(generator, node, depth):
+            return f'num({node.value})'
+
+        code = 'namespace P { class C { static void Main() { Console.WriteLine(x + 1 + 2); } } }'
+        js_code = Late().generate(Parser(Lexer(code).tokenize_buffer()).parse())
+        assert 'v_x' in js_code and 'num(2)' in js_code
+        assert profile.rules['Late.visit_Variable'].calls == 1
+        assert profile.rules['Late.visit_number'].calls == 2
+    finally:
+        CodeGenerator.register(Number)(original)
+    profiler.uninstall()
+    assert CodeGenerator.handlers[Number] is original
+    assert Late.handlers[Number] is original
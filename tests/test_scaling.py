@@ -0,0 +1,22 @@
+import functools
+
+import pytest
+
+import scaling
+
+# Входы вдвое меньше, чем у benchmark.py scaling: проверка линейности та же, но быстрее
+SCALE = 0.5
+
+
+@functools.lru_cache(maxsize=1)
+def inputs(shape):
+    return scaling.shape_inputs(shape, SCALE)
+
+
+@pytest.mark.parametrize('shape, stage', [
+    (shape, stage) for shape, (_, _, stages) in scaling.SHAPES.items() for stage in stages
+])
+def test_stage_is_linear(shape, stage):
+    times, exponent = scaling.measure(stage, inputs(shape))
+    assert exponent <= scaling.LIMIT, (
+        f'{shape} / {stage}: k = {exponent:.2f}, ' + ', '.join(f'{elapsed * 1000:.2f}' for elapsed in times) + ' ms')
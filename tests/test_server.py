@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+import pytest
+
+from server import TranslationServer, METHOD_NOT_FOUND, PARSE_ERROR, INVALID_PARAMS
+
+
+def handle_all(lines):
+    # Ответы сервера с одним процессом пула на строки запросов по очереди
+    async def run():
+        server = TranslationServer(workers=1)
+        await server.start()
+        try:
+            return [await server.handle(line) for line in lines]
+        finally:
+            await server.stop()
+    return asyncio.run(run())
+
+
+def decode(text):
+    return None if text is None else json.loads(text)
+
+
+def test_explicit_ids_are_answered_and_notifications_are_not():
+    source = 'namespace N { class A { static void Main() { int x = 1; } } }'
+    requests = [
+        {'jsonrpc': '2.0', 'id': 1, 'method': 'translate', 'params': {'source': source}},
+        {'jsonrpc': '2.0', 'id': None, 'method': 'translate', 'params': {'source': source}},
+        {'jsonrpc': '2.0', 'method': 'translate', 'params': {'source': source}},
+        {'jsonrpc': '2.0', 'id': 'a', 'method': 'missing'},
+        {'jsonrpc': '2.0', 'id': None, 'method': 'missing'},
+        {'jsonrpc': '2.0', 'method': 'missing'},
+        {'jsonrpc': '2.0', 'method': 'translate', 'params': {}},
+        {'jsonrpc': '2.0', 'id': None, 'method': 'translate', 'params': {}},
+    ]
+    replies = [decode(text) for text in handle_all([json.dumps(request) for request in requests])]
+    assert replies[0]['id'] == 1 and 'A.Main()' in replies[0]['result']['js']
+    assert replies[1]['id'] is None and 'A.Main()' in replies[1]['result']['js']
+    assert replies[2] is None
+    assert replies[3] == {'jsonrpc': '2.0', 'id': 'a', 'error': replies[3]['error']}
+    assert replies[3]['error']['code'] == METHOD_NOT_FOUND
+    assert 'id' in replies[4] and replies[4]['id'] is None
+    assert replies[4]['error']['code'] == METHOD_NOT_FOUND
+    assert replies[5] is None
+    assert replies[6] is None
+    assert replies[7]['id'] is None and replies[7]['error']['code'] == INVALID_PARAMS
+
+
+@pytest.mark.parametrize('line', ['{"id": 1, ', '[1, 2]'])
+def test_unreadable_requests_are_answered_with_null_id(line):
+    reply = decode(handle_all([line])[0])
+    assert reply['id'] is None and 'error' in reply
+    if line.startswith('{'):
+        assert reply['error']['code'] == PARSE_ERROR
@@ -0,0 +1,52 @@
+import pytest
+
+from lexer import Lexer
+from parser import Parser
+from generator import CodeGenerator
+from inference import annotate
+from translator import translate
+
+SOURCE = '''
+namespace Typed {
+    class Program {
+        static void Main() {
+            float f = 1;
+            float g = 0.1f;
+            int y = 2;
+            y = y / 2;
+            y *= 3;
+            int z = -y;
+            Console.WriteLine(f + y + z + g);
+        }
+    }
+}
+'''
+
+TYPED_MARKERS = ('Math.fround', 'Math.imul', '| 0')
+
+
+@pytest.mark.parametrize('optimize', [False, True])
+def test_untyped_output_has_no_casts(optimize):
+    js = translate(SOURCE, optimize=optimize, typed=False)
+    for marker in TYPED_MARKERS:
+        assert marker not in js
+    assert 'let g = 0.1;' in js
+
+
+@pytest.mark.parametrize('optimize', [False, True])
+def test_typed_output_has_every_cast(optimize):
+    js = translate(SOURCE, optimize=optimize)
+    assert 'const f = Math.fround(1);' in js
+    assert 'const g = Math.fround(0.1);' in js
+    assert 'y = (y / 2 | 0);' in js
+    assert 'y = Math.imul(y, 3);' in js
+    assert 'const z = (-y | 0);' in js
+
+
+def test_annotated_tree_needs_typed_generator():
+    tree = Parser(Lexer(SOURCE).tokenize_buffer()).parse()
+    annotate(tree)
+    js = CodeGenerator().generate(tree)
+    for marker in TYPED_MARKERS:
+        assert marker not in js
+    assert CodeGenerator(typed=True).generate(tree) == translate(SOURCE, optimize=False)
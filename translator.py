@@ -0,0 +1,139 @@
+import io
+
+import instrumentation
+import optimizer
+import inference
+import semantic
+from lexer import Lexer
+from parser import Parser
+from generator import CodeGenerator
+from instrumentation import instrumented, count_output, count_nodes
+
+# Сколько токенов лексер выдаёт за один замер, когда замеры стадий включены
+TIMED_TOKENS = 4096
+
+
+def timed_tokens(tokens, record):
+    # Токены пачками: часы лексера запускаются раз на пачку, а не на токен.
+    # Ошибка лексера поднимается после токенов, разобранных до неё, чтобы
+    # парсер успел найти более раннюю синтаксическую ошибку, как без замеров.
+    batch = []
+    while True:
+        error = None
+        instrumentation.resume(record)
+        try:
+            for token in tokens:
+                batch.append(token)
+                if len(batch) == TIMED_TOKENS:
+                    break
+        except ValueError as e:
+            error = e
+        finally:
+            instrumentation.pause(record)
+        record.add('tokens', len(batch))
+        yield from batch
+        if error is not None:
+            raise error
+        if len(batch) < TIMED_TOKENS:
+            return
+        batch.clear()
+
+
+def timed(items, record):
+    # Элементы items; время получения каждого идёт в record
+    items = iter(items)
+    while True:
+        instrumentation.resume(record)
+        try:
+            item = next(items)
+        except StopIteration:
+            return
+        finally:
+            instrumentation.pause(record)
+        yield item
+
+
+@instrumented('translate', count_output)
+def translate(source, out=None, optimize=True, typed=True, problems=None):
+    # Конвейер лексер -> парсер -> генератор: токены читаются по мере надобности,
+    # а JS каждого импорта и класса пишется в out сразу после его разбора.
+    # Время до первого байта и пиковая память не зависят от размера файла.
+    # source - строка, текстовый/двоичный файл или mmap (как у Lexer).
+    # Без out возвращает JS строкой; результат совпадает с
+    # CodeGenerator(typed=typed).generate(Parser(...).parse()), прошедшим
+    # optimizer.optimize (если optimize) и inference.annotate (если typed).
+    # Флаги независимы: typed=False даёт JS без приведений к типам C# и с
+    # оптимизацией, и без неё. При синтаксической ошибке в out уже может быть
+    # записан JS объявлений перед ней.
+    # problems - список, куда дописываются необъявленные имена
+    # (semantic.Unresolved) в порядке текста; они не мешают трансляции.
+    # С включёнными замерами (instrumentation) лексер, парсер и генератор
+    # публикуются как стадии внутри translate: лексер - внутри парсера,
+    # который запрашивает у него токены, со счётчиком tokens, у парсера -
+    # счётчик nodes.
+    target = io.StringIO() if out is None else out
+    tokens = Lexer(source).iter_tokens()
+    parts = None
+    if instrumentation.enabled:
+        parts = [instrumentation.part(name) for name in ('lexer', 'parser', 'generator')]
+        tokens = timed_tokens(tokens, parts[0])
+    parser = Parser(tokens)
+    declarations = parser.declarations()
+    if parts is not None:
+        declarations = timed(declarations, parts[1])
+    generator = CodeGenerator(typed=typed)
+    generator.set_output(target)
+    write = generator.write
+
+    # Куски верхнего уровня склеиваются через '\n' так же, как в visit_Program
+    # и visit_Namespace: импорт, класс или пустая строка за пустой namespace
+    pieces = 0
+    empty_namespace = False
+    try:
+        for node in declarations:
+            if parts is not None:
+                count_nodes(parts[1], node)
+            if node.type == 'Class':
+                empty_namespace = False
+            else:
+                if empty_namespace:
+                    if pieces:
+                        write('\n')
+                    pieces += 1
+                empty_namespace = node.type == 'Namespace'
+                if empty_namespace:
+                    continue
+            if pieces:
+                write('\n')
+            pieces += 1
+            if optimize:
+                optimizer.optimize(node)
+            if typed:
+                inference.annotate(node, problems)
+            elif problems is not None:
+                problems.extend(semantic.resolve(node))
+            if parts is None:
+                generator.emit(node, 0)
+                generator.flush()
+            else:
+                instrumentation.resume(parts[2])
+                try:
+                    generator.emit(node, 0)
+                    generator.flush()
+                finally:
+                    instrumentation.pause(parts[2])
+        if empty_namespace and pieces:
+            write('\n')
+    except SyntaxError as e:
+        raise SyntaxError(f"Синтаксическая ошибка: {e}")
+    finally:
+        if parts is not None:
+            for record in parts:
+                instrumentation.publish(record)
+
+    if generator.mainFlag:
+        write(f'\n{generator.nameMainClass}Main()')
+    generator.flush()
+    if out is None:
+        return target.getvalue()
+    return None